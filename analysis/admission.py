@@ -0,0 +1,175 @@
+# analysis/admission.py
+"""
+Request coalescing and admission control for the heavy parts of a query.
+
+``SingleFlight`` runs one computation per key at a time: callers that ask
+for a key while it is being computed wait for that computation and share
+its result (or exception). Cold dataset loads are coalesced per file, and
+identical uncached queries per response cache key.
+
+``AdmissionGate`` bounds the heavy analyses running at once (cold loads,
+scans and uncached computations; cache hits never need a slot). A few more
+may queue for a slot; when the queue is full, or a slot does not free up in
+time, ``admit`` raises ``executor.Saturated`` and the views answer 503 with
+Retry-After. Only the thread doing the work takes a slot, so requests
+waiting on a coalesced computation do not fill the queue.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .executor import Saturated
+
+DEFAULT_MAX_ACTIVE = 4
+DEFAULT_MAX_QUEUED = 16
+# seconds a queued analysis waits for a slot before giving up with 503
+DEFAULT_QUEUE_TIMEOUT = 10.0
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls per key (see module docstring)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """``(fn(), shared)``: ``shared`` is True when another caller's in-flight result was reused."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AdmissionGate:
+    """
+    At most ``max_active`` holders of ``admit()`` at once and ``max_queued``
+    waiting for up to ``timeout`` seconds. Re-entrant per thread.
+    """
+
+    def __init__(self, max_active: int = DEFAULT_MAX_ACTIVE, max_queued: int = DEFAULT_MAX_QUEUED,
+                 timeout: float = DEFAULT_QUEUE_TIMEOUT):
+        self.max_active = max(1, int(max_active))
+        self.max_queued = max(0, int(max_queued))
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._held = threading.local()
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        # moving average of how long a slot is held, for Retry-After
+        self._mean_seconds = 1.0
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue is likely drained (at least 1)."""
+        return max(1, math.ceil(self._mean_seconds * (self.queued + 1) / self.max_active))
+
+    def _reject(self) -> Saturated:
+        self.rejected += 1
+        return Saturated(self.retry_after())
+
+    @contextmanager
+    def admit(self):
+        """Hold a slot for the block; raises ``Saturated`` when none can be had."""
+        if getattr(self._held, "depth", 0):
+            self._held.depth += 1
+            try:
+                yield
+            finally:
+                self._held.depth -= 1
+            return
+        with self._cond:
+            if self.active >= self.max_active:
+                if self.queued >= self.max_queued:
+                    raise self._reject()
+                self.queued += 1
+                try:
+                    if not self._cond.wait_for(lambda: self.active < self.max_active, self.timeout):
+                        raise self._reject()
+                finally:
+                    self.queued -= 1
+            self.active += 1
+            self.admitted += 1
+        self._held.depth = 1
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._held.depth = 0
+            with self._cond:
+                self.active -= 1
+                self._mean_seconds = 0.8 * self._mean_seconds + 0.2 * (time.perf_counter() - t0)
+                self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "active": self.active,
+                "queued": self.queued,
+                "max_active": self.max_active,
+                "max_queued": self.max_queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+# uncached query computations, keyed by response cache key
+QUERY_FLIGHTS = SingleFlight()
+
+_admission_gate: Optional[AdmissionGate] = None
+_admission_gate_lock = threading.Lock()
+
+
+def get_admission_gate() -> AdmissionGate:
+    """
+    Return the process-wide gate for heavy analyses, sized from
+    ``ANALYSIS_MAX_ACTIVE_ANALYSES`` / ``ANALYSIS_MAX_QUEUED_ANALYSES`` /
+    ``ANALYSIS_ADMISSION_TIMEOUT``.
+    """
+    global _admission_gate
+    if _admission_gate is None:
+        with _admission_gate_lock:
+            if _admission_gate is None:
+                from django.conf import settings
+
+                _admission_gate = AdmissionGate(
+                    max_active=getattr(settings, "ANALYSIS_MAX_ACTIVE_ANALYSES", DEFAULT_MAX_ACTIVE),
+                    max_queued=getattr(settings, "ANALYSIS_MAX_QUEUED_ANALYSES", DEFAULT_MAX_QUEUED),
+                    timeout=getattr(settings, "ANALYSIS_ADMISSION_TIMEOUT", DEFAULT_QUEUE_TIMEOUT),
+                )
+    return _admission_gate
@@ -0,0 +1,311 @@
+# analysis/aggregates.py
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def _numeric(df: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
+    """Coerce ``cols`` of ``df`` to float in one pass (non-numeric -> NaN)."""
+    sub = df[cols]
+    if all(pd.api.types.is_numeric_dtype(t) for t in sub.dtypes):
+        # already coerced when the dataset was loaded
+        return sub.astype(float)
+    return sub.apply(pd.to_numeric, errors="coerce").astype(float)
+
+
+def yearly_price_demand(df_area: pd.DataFrame, price_cols: List[str], demand_col: Optional[str]) -> pd.DataFrame:
+    """
+    Per-year price and demand for the rows of one area, in a single groupby.
+
+    price:  row-wise mean across ``price_cols``, then the mean of those per year.
+    demand: mean of ``demand_col`` per year. Without a demand column, the mean of
+            ``total_units``, else the average of the per-column means of any
+            'sold'/'sales' columns that have data in that year.
+
+    Returns a frame indexed by year (ascending) with float ``price`` and
+    ``demand`` columns; rows without a year are ignored.
+    """
+    df_area = df_area[df_area["year"].notna()]
+    return _grouped_price_demand(df_area, [df_area["year"]], price_cols, demand_col)
+
+
+def yearly_price_demand_groups(df: pd.DataFrame, groups: List[np.ndarray], price_cols: List[str],
+                               demand_col: Optional[str]) -> List[pd.DataFrame]:
+    """
+    ``yearly_price_demand`` for several row groups of ``df`` in one groupby.
+
+    ``groups`` are row positions (e.g. one array per compared area). Each
+    row is taken once per group it belongs to and labelled with the group,
+    then everything is grouped by (group, year) in a single pass.
+    """
+    take = np.concatenate([np.asarray(g, dtype=np.int64) for g in groups] or [np.array([], dtype=np.int64)])
+    labels = np.repeat(np.arange(len(groups)), [len(g) for g in groups])
+    stacked = df.iloc[take].reset_index(drop=True)
+    keep = stacked["year"].notna().to_numpy()
+    stacked = stacked[keep]
+    grouped = _grouped_price_demand(
+        stacked, [pd.Series(labels[keep], index=stacked.index, name="_group"), stacked["year"]],
+        price_cols, demand_col,
+    )
+    empty = grouped.iloc[0:0].droplevel("_group")
+    parts = {g: part.droplevel("_group") for g, part in grouped.groupby(level="_group", sort=False)}
+    return [parts.get(i, empty) for i in range(len(groups))]
+
+
+def _grouped_price_demand(df_area: pd.DataFrame, keys, price_cols: List[str], demand_col: Optional[str]) -> pd.DataFrame:
+    measures = pd.DataFrame(index=df_area.index)
+
+    present = [c for c in price_cols or [] if c in df_area.columns]
+    if present:
+        measures["price"] = _numeric(df_area, present).mean(axis=1)
+    else:
+        measures["price"] = np.nan
+
+    sold_cols: List[str] = []
+    if demand_col and demand_col in df_area.columns:
+        measures["demand"] = pd.to_numeric(df_area[demand_col], errors="coerce")
+    elif "total_units" in df_area.columns:
+        measures["demand"] = pd.to_numeric(df_area["total_units"], errors="coerce")
+    else:
+        sold_cols = [c for c in df_area.columns if "sold" in c or "sales" in c]
+        if sold_cols:
+            measures = measures.join(_numeric(df_area, sold_cols).add_prefix("_sold_"))
+        else:
+            measures["demand"] = np.nan
+
+    grouped = measures.groupby(keys, sort=True).mean()
+    if sold_cols:
+        per_col = grouped[["_sold_" + c for c in sold_cols]]
+        grouped = grouped.drop(columns=per_col.columns)
+        # average of the per-column yearly means, ignoring columns with no data that year
+        grouped["demand"] = per_col.mean(axis=1)
+    return grouped[["price", "demand"]]
+
+
+def chart_from_yearly(yearly: pd.DataFrame, last_n_years: int = None) -> dict:
+    """Render a ``yearly_price_demand`` frame as the chart JSON used by the API."""
+    labels = [str(y) for y in yearly.index.tolist()]
+    price_series = [round(float(v), 2) if not pd.isna(v) else None for v in yearly["price"].tolist()]
+    demand_series = (
+        yearly["demand"]
+        .astype(float)
+        .round(2)
+        .where(lambda s: ~s.isna(), other=None)
+        .tolist()
+    )
+
+    if last_n_years and labels:
+        last_year = int(labels[-1])
+        cutoff = last_year - (last_n_years - 1)
+        keep = [i for i, y in enumerate(labels) if int(y) >= cutoff]
+        labels = [labels[i] for i in keep]
+        price_series = [price_series[i] for i in keep]
+        demand_series = [demand_series[i] for i in keep]
+
+    return {"labels": labels, "price": price_series, "demand": demand_series}
+
+
+# --------------------
+# Area x year cube
+# --------------------
+class AreaYearCube:
+    """
+    Precomputed per-(area, year) sums and counts of the price and demand measures.
+
+    Areas are the vocabulary ids of the dataset's ``AreaIndex``. Cells are
+    stored long-form, sorted by area then year, with CSR offsets per area, so
+    answering a lookup costs O(matched areas x years) regardless of how many
+    rows those areas have. Merging several matched areas adds sums and counts
+    (never averages of averages), so results equal a mean over the raw rows.
+
+    Measures:
+      - ``price``: row-wise mean across the price columns (what the chart uses)
+      - each price column on its own
+      - ``demand``: the demand column (or ``total_units``)
+    plus ``rows``: rows with a year in the cell.
+    """
+
+    def __init__(self, cell_area, cell_year, offsets, sums, counts, rows, price_cols, demand_col):
+        self.cell_area = cell_area
+        self.cell_year = cell_year
+        self.offsets = offsets
+        self.sums = sums
+        self.counts = counts
+        self.rows = rows
+        self.price_cols = price_cols
+        self.demand_col = demand_col
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, index, price_cols: List[str], demand_col: Optional[str]) -> "AreaYearCube":
+        n_areas = len(index.vocab)
+        # vocabulary id of every row (-1 for rows without an area)
+        row_area = np.full(len(df), -1, dtype=np.int64)
+        row_area[index.positions] = np.repeat(np.arange(n_areas), np.diff(index.offsets))
+        return cls._from_rows(df, row_area, n_areas, price_cols, demand_col)
+
+    @classmethod
+    def _from_rows(cls, df: pd.DataFrame, row_area: np.ndarray, n_areas: int, price_cols: List[str],
+                   demand_col: Optional[str]) -> "AreaYearCube":
+        year = df["year"]
+        keep = (row_area >= 0) & year.notna().to_numpy()
+        years = year.to_numpy(dtype="float64", na_value=np.nan)[keep].astype(np.int64)
+        areas = row_area[keep]
+
+        uniq_years, year_code = np.unique(years, return_inverse=True)
+        key = areas * max(len(uniq_years), 1) + year_code
+        cell_key, cell_of_row = np.unique(key, return_inverse=True)
+        n_cells = len(cell_key)
+        cell_area = cell_key // max(len(uniq_years), 1)
+        cell_year = uniq_years[cell_key % max(len(uniq_years), 1)] if n_cells else np.array([], dtype=np.int64)
+        offsets = np.searchsorted(cell_area, np.arange(n_areas + 1)).astype(np.int64)
+
+        measures = {}
+        present = [c for c in price_cols or [] if c in df.columns]
+        if present:
+            prices = _numeric(df, present)
+            measures["price"] = prices.mean(axis=1).to_numpy()
+            for c in present:
+                measures[c] = prices[c].to_numpy()
+        if demand_col and demand_col in df.columns:
+            measures["demand"] = pd.to_numeric(df[demand_col], errors="coerce").to_numpy(dtype=float)
+        elif "total_units" in df.columns:
+            measures["demand"] = pd.to_numeric(df["total_units"], errors="coerce").to_numpy(dtype=float)
+
+        sums, counts = {}, {}
+        for name, values in measures.items():
+            v = values[keep]
+            ok = ~np.isnan(v)
+            sums[name] = np.bincount(cell_of_row, weights=np.where(ok, v, 0.0), minlength=n_cells)
+            counts[name] = np.bincount(cell_of_row, weights=ok, minlength=n_cells).astype(np.int64)
+        rows = np.bincount(cell_of_row, minlength=n_cells).astype(np.int64)
+        return cls(cell_area, cell_year, offsets, sums, counts, rows, present, demand_col)
+
+    def extended(self, df: pd.DataFrame, row_area: np.ndarray, n_areas: int) -> "AreaYearCube":
+        """
+        The cube of this cube's rows plus ``df`` (appended rows; ``row_area``
+        their vocabulary ids, ``n_areas`` the grown vocabulary size).
+
+        Only the appended rows are aggregated; their cells are then merged
+        into the existing ones by adding sums and counts, so the cost depends
+        on the delta and the number of cells, not on the total row count.
+        """
+        delta = self._from_rows(df, row_area, n_areas, self.price_cols, self.demand_col)
+        years, year_code = np.unique(np.concatenate([self.cell_year, delta.cell_year]), return_inverse=True)
+        n_years = max(len(years), 1)
+        area = np.concatenate([self.cell_area, delta.cell_area])
+        cell_key, inv = np.unique(area * n_years + year_code, return_inverse=True)
+        n_cells = len(cell_key)
+        cell_area = cell_key // n_years
+        cell_year = years[cell_key % n_years] if n_cells else np.array([], dtype=np.int64)
+        offsets = np.searchsorted(cell_area, np.arange(n_areas + 1)).astype(np.int64)
+
+        def merged(old, new, dtype):
+            return np.bincount(inv, weights=np.concatenate([old, new]), minlength=n_cells).astype(dtype)
+
+        sums = {name: merged(self.sums[name], delta.sums[name], np.float64) for name in self.sums}
+        counts = {name: merged(self.counts[name], delta.counts[name], np.int64) for name in self.counts}
+        rows = merged(self.rows, delta.rows, np.int64)
+        return type(self)(cell_area, cell_year, offsets, sums, counts, rows, self.price_cols, self.demand_col)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.cell_area, self.cell_year, self.offsets, self.rows]
+        arrays += list(self.sums.values()) + list(self.counts.values())
+        return int(sum(a.nbytes for a in arrays))
+
+    def _cells(self, area_ids) -> np.ndarray:
+        if len(area_ids) == 1:
+            i = int(area_ids[0])
+            return np.arange(self.offsets[i], self.offsets[i + 1])
+        return np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in area_ids] or [np.array([], dtype=np.int64)])
+
+    def yearly(self, area_ids) -> pd.DataFrame:
+        """
+        Merge the cells of ``area_ids`` per year.
+
+        Returns a frame indexed by year with ``rows`` and, for every measure,
+        ``<measure>`` (mean) and ``<measure>_count`` columns.
+        """
+        return self.yearly_groups([area_ids])[0]
+
+    def yearly_groups(self, groups) -> List[pd.DataFrame]:
+        """``yearly`` for several groups of area ids, merged in one bincount pass."""
+        cells = [self._cells(ids) for ids in groups]
+        group = np.repeat(np.arange(len(groups)), [len(c) for c in cells])
+        cells = np.concatenate(cells) if cells else np.array([], dtype=np.int64)
+        years, year_code = np.unique(self.cell_year[cells], return_inverse=True)
+        n_years = max(len(years), 1)
+        keys, inv = np.unique(group * n_years + year_code, return_inverse=True)
+
+        merged = {"rows": np.bincount(inv, weights=self.rows[cells], minlength=len(keys)).astype(np.int64)}
+        for name in self.sums:
+            s = np.bincount(inv, weights=self.sums[name][cells], minlength=len(keys))
+            c = np.bincount(inv, weights=self.counts[name][cells], minlength=len(keys))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                merged[name] = np.where(c > 0, s / np.where(c > 0, c, 1), np.nan)
+            merged[name + "_count"] = c.astype(np.int64)
+
+        key_group = keys // n_years
+        bounds = np.searchsorted(key_group, np.arange(len(groups) + 1))
+        out = []
+        for g in range(len(groups)):
+            sl = slice(bounds[g], bounds[g + 1])
+            frame = pd.DataFrame(index=pd.Index(years[keys[sl] % n_years], name="year"))
+            for name, values in merged.items():
+                frame[name] = values[sl]
+            for name in ("price", "demand"):
+                if name not in frame.columns:
+                    frame[name] = np.nan
+                    frame[name + "_count"] = 0
+            out.append(frame)
+        return out
+
+
+# --------------------
+# Area x year matrix
+# --------------------
+class AreaYearMatrix:
+    """
+    Dense area x year view of an ``AreaYearCube``.
+
+    One row per area (vocabulary id) and one column per dataset year, holding
+    the cell's mean price and its demand sum / count (NaN / 0 where the area
+    has no rows that year). Questions across all areas, such as rankings, are
+    answered with whole-matrix NumPy operations instead of per-area lookups.
+    ``labels`` are display names (the first 'area' value of each area; None
+    for rows without an area).
+    """
+
+    def __init__(self, years: np.ndarray, price: np.ndarray, demand_sum: np.ndarray, demand_count: np.ndarray,
+                 labels: List[Optional[str]]):
+        self.years = years
+        self.price = price
+        self.demand_sum = demand_sum
+        self.demand_count = demand_count
+        self.labels = labels
+        self.labelled = np.array([label is not None for label in labels], dtype=bool)
+
+    @classmethod
+    def from_cube(cls, cube: AreaYearCube, n_areas: int, labels: List[Optional[str]]) -> "AreaYearMatrix":
+        years, col = np.unique(cube.cell_year, return_inverse=True)
+        shape = (n_areas, len(years))
+        price = np.full(shape, np.nan)
+        if "price" in cube.sums:
+            counts = cube.counts["price"]
+            ok = counts > 0
+            price[cube.cell_area[ok], col[ok]] = cube.sums["price"][ok] / counts[ok]
+        demand_sum = np.zeros(shape)
+        demand_count = np.zeros(shape, dtype=np.int64)
+        if "demand" in cube.sums:
+            demand_sum[cube.cell_area, col] = cube.sums["demand"]
+            demand_count[cube.cell_area, col] = cube.counts["demand"]
+        return cls(years.astype(np.int64), price, demand_sum, demand_count, labels)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.years.nbytes + self.price.nbytes + self.demand_sum.nbytes + self.demand_count.nbytes)
+
+    def columns(self, start: int, end: int) -> np.ndarray:
+        """Positions of the years ``start``..``end`` (inclusive) that the dataset has."""
+        return np.flatnonzero((self.years >= start) & (self.years <= end))
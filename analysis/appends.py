@@ -0,0 +1,249 @@
+# analysis/appends.py
+"""
+Incremental appends to a stored dataset.
+
+Files are never edited in place. The delta rows are stored content-addressed
+next to the uploads, and a small manifest (``<sha256>.append.json``) names the
+base file and the ordered delta files together with their digests. The
+manifest's hash is the new dataset id, so everything keyed on the old id
+(response cache entries, ETags, snapshots) stays valid.
+
+``append_rows`` is the fast path: it checks the delta against the cached
+frame's normalized schema and concatenates the columns. It then extends the
+area index and the area x year cube from the delta rows alone, publishes the
+snapshot and caches the result with those structures. ``read_appended_dataset``
+replays a manifest from the source files when no snapshot exists.
+"""
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .uploads import store_bytes
+
+MANIFEST_SUFFIX = ".append.json"
+MANIFEST_VERSION = 1
+
+_DATASET_ID = re.compile(r"^[0-9a-f]{64}$")
+
+
+class AppendError(ValueError):
+    """The delta does not fit the dataset (answered with a 400)."""
+
+
+def is_append_manifest(path) -> bool:
+    return str(path).lower().endswith(MANIFEST_SUFFIX)
+
+
+def read_append_manifest(path: str) -> Dict[str, Any]:
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def find_dataset(dataset_id: str, save_dir: str) -> Optional[str]:
+    """Path of an uploaded / appended dataset (``<id>.<ext>`` in ``save_dir``) or a DATASETS_DIR file with that digest."""
+    if not _DATASET_ID.match(dataset_id or ""):
+        return None
+    try:
+        names = sorted(os.listdir(save_dir))
+    except OSError:
+        names = []
+    for name in names:
+        if name.startswith(dataset_id + "."):
+            return os.path.join(save_dir, name)
+
+    from .cache import stat_digest
+    from .warmup import dataset_paths
+    for path in dataset_paths():
+        if stat_digest(path) == dataset_id:
+            return path
+    return None
+
+
+def store_delta_rows(rows: List[Dict[str, Any]], save_dir: str) -> Tuple[str, bool]:
+    """Store JSON rows as a content-addressed csv delta; returns ``(path, created)``."""
+    data = pd.DataFrame.from_records(rows).to_csv(index=False).encode()
+    path, _, created = store_bytes(data, ".csv", save_dir)
+    return path, created
+
+
+# --------------------
+# Validation and merge
+# --------------------
+def _is_number(dtype) -> bool:
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def delta_frame(df: pd.DataFrame, raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize delta rows like a dataset file and check them against ``df``:
+    known columns only, an area and a year on every row, and numbers where
+    ``df`` stores numbers. Raises ``AppendError``.
+    """
+    from .utils import normalize_dataset
+
+    if raw.empty:
+        raise AppendError("No rows to append.")
+    delta = normalize_dataset(raw.copy())
+    unknown = [str(c) for c in delta.columns if c not in df.columns]
+    if unknown:
+        raise AppendError(f"Unknown columns: {', '.join(unknown)}")
+
+    problems = []
+    missing = int(delta["area"].isna().sum())
+    if missing:
+        problems.append(f"{missing} row(s) without an area")
+    missing = int(delta["year"].isna().sum())
+    if missing:
+        problems.append(f"{missing} row(s) without a valid year")
+    for col in delta.columns:
+        if col != "year" and _is_number(df[col].dtype):
+            bad = int((pd.to_numeric(delta[col], errors="coerce").isna() & delta[col].notna()).sum())
+            if bad:
+                problems.append(f"{bad} non-numeric value(s) in '{col}'")
+    if problems:
+        raise AppendError("Invalid rows: " + "; ".join(problems) + ".")
+    return delta
+
+
+def _fit(values: pd.Series, dtype) -> pd.Series:
+    """``values`` cast to ``dtype`` when no value changes, else as they are (the concat then widens)."""
+    try:
+        cast = values.astype(dtype)
+    except (TypeError, ValueError, OverflowError):
+        return values
+    with np.errstate(invalid="ignore", over="ignore"):
+        same = np.array_equal(
+            cast.to_numpy(dtype="float64", na_value=np.nan), values.to_numpy(dtype="float64", na_value=np.nan),
+            equal_nan=True,
+        )
+    return cast if same else values
+
+
+def _append_column(old: pd.Series, new: pd.Series) -> pd.Series:
+    dtype = old.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        text = [None if pd.isna(v) else str(v) for v in new.astype(object)]
+        extra = [v for v in dict.fromkeys(text) if v is not None and v not in dtype.categories]
+        if extra:
+            old = old.cat.add_categories(extra)
+        new = pd.Series(pd.Categorical(text, dtype=old.dtype))
+    elif _is_number(dtype):
+        new = _fit(pd.to_numeric(new, errors="coerce"), dtype)
+    elif pd.api.types.is_datetime64_dtype(dtype):
+        new = pd.to_datetime(new, errors="coerce")
+    elif pd.api.types.is_string_dtype(dtype) and not pd.api.types.is_object_dtype(dtype):
+        new = new.astype(object).where(new.notna(), None).map(lambda v: v if v is None else str(v)).astype(dtype)
+    return pd.concat([old, new], ignore_index=True)
+
+
+def append_frames(df: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """``df`` followed by ``delta``'s rows, keeping ``df``'s columns and (where the values fit) its compact dtypes."""
+    n = len(delta)
+    columns = {}
+    for col in df.columns:
+        new = delta[col] if col in delta.columns else pd.Series([None] * n, dtype=object)
+        columns[col] = _append_column(df[col].reset_index(drop=True), new.reset_index(drop=True))
+    return pd.DataFrame(columns, columns=df.columns)
+
+
+# --------------------
+# Manifests
+# --------------------
+def write_append_manifest(base_path: str, base_digest: str, delta_path: str, delta_digest: str,
+                          save_dir: str) -> str:
+    """Store the manifest of ``base_path`` + delta (flattening earlier appends); returns its path."""
+    if is_append_manifest(base_path):
+        previous = read_append_manifest(base_path)
+        base, deltas = previous["base"], previous["deltas"]
+    else:
+        base, deltas = {"path": os.path.abspath(base_path), "digest": base_digest}, []
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "base": base,
+        "deltas": deltas + [{"path": os.path.abspath(delta_path), "digest": delta_digest}],
+    }
+    path, _, _ = store_bytes(json.dumps(manifest, indent=1, sort_keys=True).encode(), MANIFEST_SUFFIX, save_dir)
+    return path
+
+
+def read_appended_dataset(path: str) -> pd.DataFrame:
+    """Normalized frame of an append manifest, replayed from its base and delta files."""
+    from .cache import file_digest
+    from .utils import normalize_dataset, read_raw_dataset
+
+    manifest = read_append_manifest(path)
+    for part in [manifest["base"]] + manifest["deltas"]:
+        if file_digest(part["path"]) != part["digest"]:
+            raise ValueError(f"{part['path']} changed since rows were appended to it")
+    df = normalize_dataset(read_raw_dataset(manifest["base"]["path"]))
+    for part in manifest["deltas"]:
+        df = append_frames(df, delta_frame(df, read_raw_dataset(part["path"])))
+    return df
+
+
+# --------------------
+# Fast path
+# --------------------
+def append_rows(path: str, delta_path: str, save_dir: str) -> Dict[str, Any]:
+    """
+    Append the rows of the file ``delta_path`` to the dataset at ``path``.
+
+    Returns ``dataset_id`` / ``uploaded_path`` of the merged dataset, row
+    counts, the areas it introduced and per-stage timings (ms).
+    """
+    from .cache import file_digest, get_dataset_cache
+    from .resolver import build_area_resolver
+    from .shared import get_shared_store, source_info
+    from .utils import area_cube_for, area_index_for, get_dataset, read_raw_dataset, schema_for
+
+    timings: Dict[str, float] = {}
+
+    def stage(name, fn):
+        t0 = time.perf_counter()
+        out = fn()
+        timings[name] = round((time.perf_counter() - t0) * 1000, 3)
+        return out
+
+    entry = stage("load", lambda: get_dataset(path))
+    df = entry.df
+    delta = stage("validate", lambda: delta_frame(df, read_raw_dataset(delta_path)))
+    merged = stage("merge", lambda: append_frames(df, delta))
+    appended = merged.iloc[len(df):]
+
+    def extend():
+        index = area_index_for(df).extended(appended["_area_norm"])
+        cube = area_cube_for(df).extended(
+            appended, index.ids_of(appended["_area_norm"]), len(index.vocab),
+        )
+        return {
+            "schema": schema_for(df),
+            "area_index": index,
+            "area_cube": cube,
+            "area_resolver": build_area_resolver(index),
+        }
+
+    derived = stage("index", extend)
+    manifest = stage("manifest", lambda: write_append_manifest(
+        path, entry.digest, delta_path, file_digest(delta_path), save_dir,
+    ))
+    digest = file_digest(manifest)
+    published = stage("snapshot", lambda: get_shared_store().open(
+        digest, lambda: merged, source=source_info(manifest),
+    ))
+    stored = get_dataset_cache().put(manifest, published, derived=derived)
+
+    index = derived["area_index"]
+    return {
+        "dataset_id": stored.digest,
+        "uploaded_path": manifest,
+        "base_dataset_id": entry.digest,
+        "rows": int(len(merged)),
+        "appended_rows": int(len(appended)),
+        "new_areas": index.vocab[len(area_index_for(df).vocab):],
+        "timings": timings,
+    }
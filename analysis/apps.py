@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 class AnalysisConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analysis'
+
+    def ready(self):
+        """
+        Optionally warm the process up (``ANALYSIS_WARMUP``): ``True`` loads and
+        queries the datasets in DATASETS_DIR before the worker serves traffic,
+        ``"background"`` does it in a daemon thread. Management commands other
+        than runserver never warm up, and nothing here imports pandas unless
+        the warm-up actually runs.
+        """
+        mode = getattr(settings, 'ANALYSIS_WARMUP', False)
+        if not mode:
+            return
+        from .warmup import should_warm_up, start_warm_up
+        if should_warm_up():
+            start_warm_up(mode)
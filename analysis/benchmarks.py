@@ -0,0 +1,185 @@
+# analysis/benchmarks.py
+"""
+Benchmark suite for the chat query path.
+
+For each (rows, areas) case a synthetic dataset is generated and written to
+csv, then every operation below is timed ``repeat`` times:
+
+  - ``load_dataset.cold``      parse + normalize + compact + snapshot
+  - ``load_dataset.snapshot``  open an existing snapshot (empty process cache)
+  - ``load_dataset.cached``    in-process cache hit
+  - ``filter_by_area`` / ``chart_data_for_area`` / ``build_mock_summary``
+  - ``query_view``             POST to the query endpoint (response cache cleared)
+  - ``query_view.cached``      the same request answered from the response cache
+
+Results are plain JSON; ``compare_to_baseline`` flags operations whose median
+grew by more than a tolerance against a stored run.
+"""
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+RESULTS_VERSION = 1
+# operations faster than this are too noisy to call regressions on ratio alone
+DEFAULT_NOISE_FLOOR_MS = 1.0
+# keep even the largest cases resident while benchmarking
+_BENCH_CACHE_BYTES = 16 * 1024 ** 3
+
+
+def parse_sizes(spec: str) -> List[Tuple[int, int]]:
+    """``"10000x100,1000000x5000"`` -> ``[(10000, 100), (1000000, 5000)]``."""
+    sizes = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        rows, _, areas = part.strip().lower().partition("x")
+        sizes.append((int(float(rows)), int(float(areas or 100))))
+    return sizes
+
+
+def _timings(fn: Callable[[int], Any], repeat: int, setup: Callable[[], Any] = None) -> Dict[str, Any]:
+    runs = []
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn(i)
+        runs.append((time.perf_counter() - t0) * 1000)
+    return {
+        "runs": len(runs),
+        "min_ms": round(min(runs), 3),
+        "median_ms": round(statistics.median(runs), 3),
+        "max_ms": round(max(runs), 3),
+    }
+
+
+def run_case(rows: int, areas: int, repeat: int = 5, workdir: str = None, seed: int = 0) -> Dict[str, Any]:
+    """Generate one dataset and time every operation on it."""
+    from django.test import Client
+    from django.test.utils import override_settings
+    from django.urls import reverse
+
+    from .cache import get_dataset_cache, get_response_cache
+    from .synthetic import area_names, generate_dataset, write_dataset
+    from .utils import build_mock_summary, chart_data_for_area, filter_by_area, load_dataset
+
+    own_dir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="analysis-bench-")
+    snapshots = os.path.join(workdir, "snapshots")
+    path = os.path.join(workdir, f"synthetic_{rows}x{areas}_{seed}.csv")
+    cache = get_dataset_cache()
+    budget = cache.max_bytes
+    try:
+        t0 = time.perf_counter()
+        write_dataset(generate_dataset(rows, areas, seed=seed), path)
+        generate_ms = (time.perf_counter() - t0) * 1000
+
+        names = area_names(areas)
+        # a few localities spread over the vocabulary, as typed in chat
+        sample = [names[i].lower() for i in np.linspace(0, areas - 1, min(areas, 5)).astype(int)]
+
+        cache.max_bytes = max(budget, _BENCH_CACHE_BYTES)
+        with override_settings(ANALYSIS_SNAPSHOT_DIR=snapshots):
+            ops: Dict[str, Dict[str, Any]] = {}
+            ops["load_dataset.cold"] = _timings(
+                lambda i: load_dataset(path), max(1, min(repeat, 3)),
+                setup=lambda: (cache.clear(), shutil.rmtree(snapshots, ignore_errors=True)),
+            )
+            ops["load_dataset.snapshot"] = _timings(lambda i: load_dataset(path), repeat, setup=cache.clear)
+            ops["load_dataset.cached"] = _timings(lambda i: load_dataset(path), repeat)
+
+            df = load_dataset(path)
+            pick = lambda i: sample[i % len(sample)]  # noqa: E731
+            ops["filter_by_area"] = _timings(lambda i: filter_by_area(df, [pick(i)]), repeat)
+            ops["chart_data_for_area"] = _timings(lambda i: chart_data_for_area(df, pick(i)), repeat)
+            subsets = {a: filter_by_area(df, [a]) for a in sample}
+            ops["build_mock_summary"] = _timings(lambda i: build_mock_summary(subsets[pick(i)], pick(i)), repeat)
+
+            client = Client(HTTP_HOST="localhost")
+            responses = get_response_cache()
+
+            def query(i):
+                response = client.post(
+                    reverse("analysis-query"), {"query": f"Analyze {pick(i)}", "uploaded_path": path},
+                    content_type="application/json",
+                )
+                if response.status_code != 200:
+                    raise RuntimeError(f"query failed with {response.status_code}: {response.content[:200]!r}")
+
+            ops["query_view"] = _timings(query, repeat, setup=responses.clear if responses is not None else None)
+            query(0)
+            ops["query_view.cached"] = _timings(lambda i: query(0), repeat)
+
+        return {
+            "rows": rows,
+            "areas": areas,
+            "seed": seed,
+            "generate_ms": round(generate_ms, 3),
+            "dataset_bytes": int(df.memory_usage(index=True, deep=True).sum()),
+            "ops": ops,
+        }
+    finally:
+        cache.max_bytes = budget
+        cache.clear()
+        if own_dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_suite(sizes: List[Tuple[int, int]], repeat: int = 5, workdir: str = None, seed: int = 0,
+              progress: Callable[[str], None] = None) -> Dict[str, Any]:
+    cases = []
+    for rows, areas in sizes:
+        if progress is not None:
+            progress(f"case {rows} rows x {areas} areas")
+        cases.append(run_case(rows, areas, repeat=repeat, workdir=workdir, seed=seed))
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "cpus": os.cpu_count(),
+        },
+        "repeat": repeat,
+        "cases": cases,
+    }
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25,
+                        noise_floor_ms: float = DEFAULT_NOISE_FLOOR_MS) -> List[Dict[str, Any]]:
+    """
+    Operations whose median is more than ``tolerance`` (0.25 = 25%) slower
+    than in ``baseline`` and slower by at least ``noise_floor_ms``.
+    Cases or operations missing from the baseline are skipped.
+    """
+    def index(doc):
+        return {(c["rows"], c["areas"]): c["ops"] for c in doc.get("cases", [])}
+
+    base = index(baseline)
+    regressions = []
+    for key, ops in index(results).items():
+        for op, timing in ops.items():
+            before: Optional[Dict[str, Any]] = base.get(key, {}).get(op)
+            if before is None:
+                continue
+            now_ms, then_ms = timing["median_ms"], before["median_ms"]
+            if now_ms > then_ms * (1 + tolerance) and now_ms - then_ms >= noise_floor_ms:
+                regressions.append({
+                    "rows": key[0],
+                    "areas": key[1],
+                    "op": op,
+                    "baseline_ms": then_ms,
+                    "current_ms": now_ms,
+                    "ratio": round(now_ms / then_ms, 3) if then_ms else None,
+                })
+    return regressions
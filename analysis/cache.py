@@ -0,0 +1,497 @@
+# analysis/cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from .admission import SingleFlight
+
+if TYPE_CHECKING:  # pandas is only needed by the loaders; keep importing this module cheap
+    import pandas as pd
+
+# default memory budget for parsed datasets held in this process
+DEFAULT_DATASET_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+# --------------------
+# Fingerprinting
+# --------------------
+def file_digest(path: str) -> str:
+    """Return the sha256 hex digest of a file, read in fixed-size chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# (realpath, mtime_ns, size) -> digest, for files hashed outside the dataset cache
+DIGEST_MEMO_SIZE = 256
+_digests: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def stat_digest(path: str) -> str:
+    """
+    ``file_digest`` memoized on the file's stat signature (the key
+    ``DatasetCache`` uses), so an unchanged file is hashed only once.
+    """
+    real = os.path.realpath(path)
+    st = os.stat(real)
+    key = (real, st.st_mtime_ns, st.st_size)
+    with _digests_lock:
+        digest = _digests.get(key)
+        if digest is not None:
+            _digests.move_to_end(key)
+            return digest
+    digest = file_digest(real)
+    with _digests_lock:
+        _digests[key] = digest
+        while len(_digests) > DIGEST_MEMO_SIZE:
+            _digests.popitem(last=False)
+    return digest
+
+
+class DatasetFingerprint:
+    """Identity of a dataset file: where it lives, its stat signature and its content hash."""
+
+    __slots__ = ("path", "mtime_ns", "size", "digest")
+
+    def __init__(self, path: str, mtime_ns: int, size: int, digest: str):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"path": self.path, "mtime_ns": self.mtime_ns, "size": self.size, "digest": self.digest}
+
+    def __repr__(self) -> str:
+        return f"DatasetFingerprint({self.path!r}, digest={self.digest[:12]})"
+
+
+class CachedDataset:
+    """
+    A parsed dataset plus the fingerprint of the file it was loaded from.
+
+    Structures derived from the frame (indexes, aggregates, ...) are built at
+    most once per entry through ``derive`` and live as long as the entry does.
+    """
+
+    def __init__(self, df: "pd.DataFrame", fingerprint: DatasetFingerprint):
+        self.df = df
+        self.fingerprint = fingerprint
+        self.nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        self._derived: Dict[str, Any] = {}
+        self._derive_lock = threading.RLock()
+        self._on_resize: Optional[Callable[[int], None]] = None
+
+    @property
+    def digest(self) -> str:
+        return self.fingerprint.digest
+
+    def derive(self, name: str, builder: Callable[["pd.DataFrame"], Any]) -> Any:
+        """Return the derived structure ``name``, building it with ``builder(df)`` on first use."""
+        value = self._derived.get(name)
+        if value is not None:
+            return value
+        with self._derive_lock:
+            value = self._derived.get(name)
+            if value is None:
+                value = builder(self.df)
+                self._derived[name] = value
+                extra = int(getattr(value, "nbytes", 0) or 0)
+                self.nbytes += extra
+                if extra and self._on_resize is not None:
+                    self._on_resize(extra)
+        return value
+
+
+# --------------------
+# LRU cache
+# --------------------
+class DatasetCache:
+    """
+    Process-wide cache of parsed datasets with a memory budget in bytes.
+
+    Entries are keyed by the content hash of the source file, so the same
+    spreadsheet reached through different paths is parsed and held once.
+    A path is only re-hashed when its mtime or size changes; a plain hit
+    costs one ``os.stat`` and never reads the file. When a path's content
+    changes, the entry of its old content is dropped unless another path
+    still maps to it.
+
+    Concurrent misses for the same file are coalesced: one thread hashes
+    and loads it while the others wait for its entry (``coalesced`` counts them).
+
+    ``on_release(entry)`` is called (outside the lock) for every entry that
+    leaves the cache: evicted, replaced, cleared, or loaded twice by racing threads.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_DATASET_CACHE_MAX_BYTES,
+                 on_release: Optional[Callable[[CachedDataset], None]] = None):
+        self.max_bytes = int(max_bytes)
+        self.on_release = on_release
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedDataset]" = OrderedDict()
+        # realpath -> ((mtime_ns, size), digest)
+        self._paths: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        # id(entry.df) -> entry, so helpers handed a bare frame can find its derived structures
+        self._frames: Dict[int, CachedDataset] = {}
+        self._bytes = 0
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path: str, loader: Callable[[str, str], "pd.DataFrame"]) -> CachedDataset:
+        """Return the cached dataset for ``path``, calling ``loader(path, digest)`` on a miss."""
+        real = os.path.realpath(path)
+        st = os.stat(real)
+        sig = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            known = self._paths.get(real)
+            if known is not None and known[0] == sig:
+                entry = self._entries.get(known[1])
+                if entry is not None:
+                    self._entries.move_to_end(known[1])
+                    self.hits += 1
+                    return entry
+
+        # one load per file version; concurrent callers share its entry
+        entry, _ = self._flights.do((real, sig), lambda: self._load(real, sig, known, loader))
+        return entry
+
+    def _load(self, real: str, sig: Tuple[int, int], known, loader) -> CachedDataset:
+        # stat signature is new or the entry was evicted: hash the content
+        digest = file_digest(real)
+        released = []
+        with self._lock:
+            self._paths[real] = (sig, digest)
+            if known is not None and known[1] != digest and known[1] not in (d for _, d in self._paths.values()):
+                # the file was replaced and nothing else maps to its old content
+                released += self._drop_locked(known[1])
+            entry = self._entries.get(digest)
+            if entry is not None:
+                # same bytes under another path, or a touch without changes
+                self._entries.move_to_end(digest)
+                self.hits += 1
+            else:
+                self.misses += 1
+        self._release(released)
+        if entry is not None:
+            return entry
+
+        df = loader(real, digest)
+        return self._insert(CachedDataset(df, DatasetFingerprint(real, sig[0], sig[1], digest)))
+
+    def peek(self, path: str) -> Optional[CachedDataset]:
+        """The cached entry for ``path`` if its stat signature is known and unchanged; never hashes or loads."""
+        real = os.path.realpath(path)
+        try:
+            st = os.stat(real)
+        except OSError:
+            return None
+        with self._lock:
+            known = self._paths.get(real)
+            if known is None or known[0] != (st.st_mtime_ns, st.st_size):
+                return None
+            return self._entries.get(known[1])
+
+    def put(self, path: str, df: "pd.DataFrame", derived: Dict[str, Any] = None) -> CachedDataset:
+        """
+        Cache a frame built elsewhere (e.g. by an append) as the content of
+        ``path``, together with already-built derived structures.
+        """
+        real = os.path.realpath(path)
+        st = os.stat(real)
+        digest = file_digest(real)
+        entry = CachedDataset(df, DatasetFingerprint(real, st.st_mtime_ns, st.st_size, digest))
+        for name, value in (derived or {}).items():
+            entry._derived[name] = value
+            entry.nbytes += int(getattr(value, "nbytes", 0) or 0)
+        with self._lock:
+            self._paths[real] = ((st.st_mtime_ns, st.st_size), digest)
+        return self._insert(entry)
+
+    def _insert(self, entry: CachedDataset) -> CachedDataset:
+        digest = entry.digest
+        with self._lock:
+            existing = self._entries.get(digest)
+            if existing is None:
+                self._entries[digest] = entry
+                self._frames[id(entry.df)] = entry
+                self._bytes += entry.nbytes
+                entry._on_resize = self._grow
+                released = self._evict_locked()
+            else:
+                # another thread loaded it while we were parsing
+                self._entries.move_to_end(digest)
+                released = [entry]
+        self._release(released)
+        return existing if existing is not None else entry
+
+    def entry_for(self, df: "pd.DataFrame") -> Optional[CachedDataset]:
+        """Return the live cache entry whose frame is ``df`` (identity, not equality)."""
+        entry = self._frames.get(id(df))
+        if entry is not None and entry.df is df:
+            return entry
+        return None
+
+    def _grow(self, extra: int) -> None:
+        with self._lock:
+            self._bytes += extra
+            released = self._evict_locked()
+        self._release(released)
+
+    def _evict_locked(self) -> List[CachedDataset]:
+        released = []
+        while self._bytes > self.max_bytes and self._entries:
+            digest = next(iter(self._entries))
+            released += self._drop_locked(digest)
+            self.evictions += 1
+            for p in [p for p, (_, d) in self._paths.items() if d == digest]:
+                del self._paths[p]
+        return released
+
+    def _drop_locked(self, digest: str) -> List[CachedDataset]:
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return []
+        self._bytes -= entry.nbytes
+        self._frames.pop(id(entry.df), None)
+        entry._on_resize = None
+        return [entry]
+
+    def _release(self, entries: List[CachedDataset]) -> None:
+        if self.on_release is not None:
+            for entry in entries:
+                self.on_release(entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            released = list(self._entries.values())
+            self._entries.clear()
+            self._paths.clear()
+            self._frames.clear()
+            self._bytes = 0
+        self._release(released)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "coalesced": self._flights.coalesced,
+            }
+
+
+_dataset_cache: Optional[DatasetCache] = None
+_dataset_cache_lock = threading.Lock()
+
+
+def get_dataset_cache() -> DatasetCache:
+    """Return the shared dataset cache, sized from ``settings.ANALYSIS_DATASET_CACHE_MAX_BYTES``."""
+    global _dataset_cache
+    if _dataset_cache is None:
+        with _dataset_cache_lock:
+            if _dataset_cache is None:
+                from django.conf import settings
+
+                max_bytes = DEFAULT_DATASET_CACHE_MAX_BYTES
+                if settings.configured:
+                    max_bytes = getattr(settings, "ANALYSIS_DATASET_CACHE_MAX_BYTES", max_bytes)
+                _dataset_cache = DatasetCache(max_bytes, on_release=_release_shared)
+    return _dataset_cache
+
+
+def _release_shared(entry: CachedDataset) -> None:
+    """Drop this process's reference to the entry's shared snapshot (see ``analysis.shared``)."""
+    from .shared import get_shared_store
+    get_shared_store().release(entry.digest)
+
+
+def derived_for(df: "pd.DataFrame", name: str, builder: Callable[["pd.DataFrame"], Any]) -> Any:
+    """
+    Return the derived structure ``name`` for a cached frame, or None if ``df``
+    did not come from the dataset cache (callers then fall back to scanning).
+    """
+    entry = get_dataset_cache().entry_for(df)
+    if entry is None:
+        return None
+    return entry.derive(name, builder)
+
+
+# --------------------
+# Response cache
+# --------------------
+DEFAULT_RESPONSE_CACHE = {"BACKEND": "locmem", "MAX_ENTRIES": 1024}
+
+
+def response_cache_key(dataset_digest: str, parsed: Dict[str, Any], **extra: Any) -> str:
+    """
+    Cache key for a query result: the dataset content hash plus the parsed intent.
+
+    ``parsed`` is the (normalized) output of ``parse_query_text``, so differently
+    worded questions with the same intent, areas and window share one entry.
+    ``extra`` carries any other request options that change the payload.
+    """
+    raw = json.dumps({"dataset": dataset_digest, "parsed": parsed, "extra": extra}, sort_keys=True, default=str)
+    return "analysis:query:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag for a rendered response body."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class LocMemResponseCache:
+    """In-process LRU of rendered responses, bounded by entry count."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = int(max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Tuple[str, bytes]) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "locmem",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class DjangoResponseCache:
+    """
+    Rendered responses stored in one of Django's configured caches (shared across workers).
+
+    The alias may be shared with sessions and other apps, so entries live
+    under a ``KEY_PREFIX`` namespace and are stored with Django's key
+    ``version`` set to a generation counter kept in the same cache.
+    ``clear()`` bumps the generation: every worker stops seeing the old
+    entries at once, and they expire on their own timeout.
+    """
+
+    KEY_PREFIX = "analysis:response:"
+    GENERATION_KEY = "analysis:response-generation"
+
+    def __init__(self, alias: str = "default", timeout: Optional[int] = 300):
+        self.alias = alias
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def _cache(self):
+        from django.core.cache import caches
+
+        return caches[self.alias]
+
+    def _generation(self) -> int:
+        cache = self._cache
+        generation = cache.get(self.GENERATION_KEY)
+        if generation is None:
+            # seeded from the clock so a counter evicted from the cache never
+            # comes back as a generation whose entries are still stored
+            cache.add(self.GENERATION_KEY, time.time_ns(), None)
+            generation = cache.get(self.GENERATION_KEY, time.time_ns())
+        return generation
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        value = self._cache.get(self.KEY_PREFIX + key, version=self._generation())
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return tuple(value)
+
+    def set(self, key: str, value: Tuple[str, bytes]) -> None:
+        self._cache.set(self.KEY_PREFIX + key, value, self.timeout, version=self._generation())
+
+    def clear(self) -> None:
+        """Invalidate this cache's entries only; other keys in the alias are left alone."""
+        try:
+            self._cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            self._generation()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "django", "alias": self.alias, "hits": self.hits, "misses": self.misses,
+            "generation": self._generation(),
+        }
+
+
+_response_cache: Any = None
+_response_cache_lock = threading.Lock()
+
+
+def _build_response_cache(config: Optional[Dict[str, Any]]) -> Any:
+    if not config or not config.get("BACKEND"):
+        return None
+    backend = config["BACKEND"]
+    if backend == "locmem":
+        return LocMemResponseCache(config.get("MAX_ENTRIES", 1024))
+    if backend == "django":
+        return DjangoResponseCache(config.get("ALIAS", "default"), config.get("TIMEOUT", 300))
+    from django.utils.module_loading import import_string
+
+    options = {k.lower(): v for k, v in config.items() if k != "BACKEND"}
+    return import_string(backend)(**options)
+
+
+def get_response_cache() -> Any:
+    """
+    Return the query response cache configured by ``settings.ANALYSIS_RESPONSE_CACHE``.
+
+    ``BACKEND`` is ``"locmem"``, ``"django"`` or a dotted path to a class with
+    ``get``/``set``/``stats``; a falsy setting disables response caching (None).
+    """
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                from django.conf import settings
+
+                config = getattr(settings, "ANALYSIS_RESPONSE_CACHE", DEFAULT_RESPONSE_CACHE)
+                _response_cache = _build_response_cache(config) or False
+    return _response_cache or None
@@ -0,0 +1,82 @@
+# analysis/compact.py
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+# text columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+# columns that are always categorical (looked up and grouped, never edited)
+CATEGORY_COLUMNS = ("area", "_area_norm")
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _is_text(s: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(s.dtype) or pd.api.types.is_string_dtype(s.dtype)
+
+
+def _compact_float(s: pd.Series) -> pd.Series:
+    """float32 when every value round-trips exactly, else unchanged."""
+    values = s.to_numpy()
+    narrow = values.astype(np.float32)
+    with np.errstate(over="ignore", invalid="ignore"):
+        if np.array_equal(narrow.astype(values.dtype), values, equal_nan=True):
+            return pd.Series(narrow, index=s.index, name=s.name)
+    return s
+
+
+def _compact_column(s: pd.Series) -> pd.Series:
+    dtype = s.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return s
+    if _is_text(s):
+        if s.name in CATEGORY_COLUMNS or s.nunique(dropna=True) <= CATEGORY_MAX_UNIQUE_RATIO * len(s):
+            return s.astype("category")
+        return s
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        if pd.api.types.is_integer_dtype(dtype):
+            return pd.to_numeric(s, downcast="integer")
+        return s
+    if pd.api.types.is_bool_dtype(dtype):
+        return s
+    if pd.api.types.is_integer_dtype(dtype):
+        return pd.to_numeric(s, downcast="integer")
+    if pd.api.types.is_float_dtype(dtype):
+        return _compact_float(s) if dtype == np.float64 else s
+    return s
+
+
+def compact_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Re-encode a normalized dataset with the smallest lossless dtypes.
+
+    - ``area`` / ``_area_norm`` and low-cardinality text: ``category``
+    - ``year`` and other integers: smallest (nullable) integer type
+    - float64 columns: float32 when every value survives the round trip
+
+    Values are unchanged (JSON output is identical); only the layout shrinks.
+    Measures stored as text stay text, so tables show them as uploaded; the
+    analytics coerce them to numbers where they compute.
+    Returns ``(df, report)`` with bytes before/after and the changed dtypes.
+    """
+    before = frame_nbytes(df)
+    columns = {}
+    changed: Dict[str, Dict[str, str]] = {}
+    for col in df.columns:
+        s = df[col]
+        out = _compact_column(s)
+        if out.dtype != s.dtype:
+            changed[str(col)] = {"from": str(s.dtype), "to": str(out.dtype)}
+        columns[col] = out
+    compact = pd.DataFrame(columns, index=df.index, columns=df.columns)
+    after = frame_nbytes(compact)
+    report = {
+        "bytes_before": before,
+        "bytes_after": after,
+        "ratio": round(after / before, 3) if before else 1.0,
+        "columns": changed,
+    }
+    return compact, report
@@ -0,0 +1,83 @@
+# analysis/executor.py
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+DEFAULT_ASYNC_WORKERS = 4
+DEFAULT_ASYNC_MAX_PENDING = 32
+
+
+class Saturated(Exception):
+    """Raised by ``BoundedExecutor.submit`` when the pool and its queue are full."""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("executor saturated")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a cap on queued work.
+
+    At most ``max_workers`` calls run at once and ``max_pending`` more may
+    wait; beyond that ``submit`` fails fast with ``Saturated`` instead of
+    letting the queue (and client latency) grow without bound.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_ASYNC_WORKERS, max_pending: int = DEFAULT_ASYNC_MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-query")
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.in_flight = 0
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_pending:
+                raise Saturated()
+            self.in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    async def run(self, fn, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Await ``fn(*args, **kwargs)`` on the pool.
+
+        Raises ``Saturated`` immediately when full and ``asyncio.TimeoutError``
+        after ``timeout`` seconds. A timed-out call cannot be interrupted: it
+        keeps its slot until it returns, which is what bounds the pool.
+        """
+        future = asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    def stats(self):
+        return {"in_flight": self.in_flight, "max_workers": self.max_workers, "max_pending": self.max_pending}
+
+
+_query_executor: Optional[BoundedExecutor] = None
+_query_executor_lock = threading.Lock()
+
+
+def get_query_executor() -> BoundedExecutor:
+    """Return the process-wide query executor, sized from ``ANALYSIS_ASYNC_WORKERS`` / ``ANALYSIS_ASYNC_MAX_PENDING``."""
+    global _query_executor
+    if _query_executor is None:
+        with _query_executor_lock:
+            if _query_executor is None:
+                from django.conf import settings
+
+                _query_executor = BoundedExecutor(
+                    max_workers=getattr(settings, "ANALYSIS_ASYNC_WORKERS", DEFAULT_ASYNC_WORKERS),
+                    max_pending=getattr(settings, "ANALYSIS_ASYNC_MAX_PENDING", DEFAULT_ASYNC_MAX_PENDING),
+                )
+    return _query_executor
@@ -0,0 +1,143 @@
+# analysis/index.py
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# how many distinct lookup strings each index remembers
+_LOOKUP_MEMO_SIZE = 1024
+
+
+class AreaIndex:
+    """
+    Inverted index from normalized area text to row positions.
+
+    The ``_area_norm`` column is factorized into a vocabulary of distinct
+    areas; the row positions of each area are stored contiguously (CSR
+    style) in one integer array. Substring lookups scan the vocabulary, not
+    the rows, so filtering costs O(vocabulary + matched rows).
+    """
+
+    def __init__(self, area_norm: pd.Series):
+        codes, uniques = pd.factorize(area_norm.to_numpy(), use_na_sentinel=True)
+        codes = np.asarray(codes, dtype=np.int64)
+        self.n_rows = len(codes)
+        self.vocab: List[str] = [str(u) for u in uniques]
+        self._vocab_arr = np.asarray(self.vocab, dtype=str) if self.vocab else np.array([], dtype="U1")
+
+        valid = codes >= 0
+        # stable sort keeps each area's rows in their original order
+        order = np.argsort(codes, kind="stable")
+        self.positions = order[len(codes) - int(valid.sum()):].astype(np.int64)
+        counts = np.bincount(codes[valid], minlength=len(self.vocab))
+        self.offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+
+        self._memo: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self._ids: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def _from_parts(cls, vocab: List[str], positions: np.ndarray, offsets: np.ndarray, n_rows: int) -> "AreaIndex":
+        index = cls.__new__(cls)
+        index.n_rows = n_rows
+        index.vocab = vocab
+        index._vocab_arr = np.asarray(vocab, dtype=str) if vocab else np.array([], dtype="U1")
+        index.positions = positions
+        index.offsets = offsets
+        index._memo = OrderedDict()
+        index._memo_lock = threading.Lock()
+        index._ids = None
+        return index
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.positions.nbytes + self.offsets.nbytes + self._vocab_arr.nbytes)
+
+    def ids_of(self, area_norm: pd.Series) -> np.ndarray:
+        """Vocabulary id of every value (exact text; -1 for missing or unknown areas)."""
+        if self._ids is None:
+            self._ids = {a: i for i, a in enumerate(self.vocab)}
+        codes, uniques = pd.factorize(area_norm.to_numpy(), use_na_sentinel=True)
+        lookup = np.asarray([self._ids.get(str(u), -1) for u in uniques] + [-1], dtype=np.int64)
+        return lookup[codes]
+
+    def extended(self, area_norm: pd.Series) -> "AreaIndex":
+        """
+        The index of this index's rows followed by ``area_norm`` (appended rows).
+
+        Equal to rebuilding over the concatenated column: existing areas keep
+        their ids and new ones are added in order of first appearance. Only
+        the appended rows are factorized and sorted; existing postings are
+        moved in one vectorized copy.
+        """
+        codes, uniques = pd.factorize(area_norm.to_numpy(), use_na_sentinel=True)
+        ids = dict(self._ids) if self._ids is not None else {a: i for i, a in enumerate(self.vocab)}
+        new_areas = [a for a in dict.fromkeys(str(u) for u in uniques) if a not in ids]
+        ids.update((a, len(self.vocab) + k) for k, a in enumerate(new_areas))
+        vocab = self.vocab + new_areas
+        codes = np.asarray([ids[str(u)] for u in uniques] + [-1], dtype=np.int64)[codes]
+
+        n_areas, n_old = len(vocab), len(self.vocab)
+        old_counts = np.zeros(n_areas, dtype=np.int64)
+        old_counts[:n_old] = np.diff(self.offsets)
+        valid = codes >= 0
+        new_counts = np.bincount(codes[valid], minlength=n_areas)
+
+        offsets = np.zeros(n_areas + 1, dtype=np.int64)
+        np.cumsum(old_counts + new_counts, out=offsets[1:])
+        positions = np.empty(int(offsets[-1]), dtype=np.int64)
+        # existing postings: each area's block shifts by the appended rows of the areas before it
+        shift = offsets[:n_old] - self.offsets[:n_old]
+        positions[np.arange(len(self.positions)) + np.repeat(shift, old_counts[:n_old])] = self.positions
+        # appended rows go after each area's existing rows, in row order
+        order = np.argsort(codes[valid], kind="stable")
+        sorted_codes = codes[valid][order]
+        rank = np.arange(len(sorted_codes)) - np.searchsorted(sorted_codes, sorted_codes)
+        positions[offsets[sorted_codes] + old_counts[sorted_codes] + rank] = (np.flatnonzero(valid) + self.n_rows)[order]
+
+        index = self._from_parts(vocab, positions, offsets, self.n_rows + len(codes))
+        index._ids = ids
+        return index
+
+    def match(self, needle: str) -> np.ndarray:
+        """Vocabulary ids whose text contains ``needle`` (same rule as ``str.contains``)."""
+        with self._memo_lock:
+            ids = self._memo.get(needle)
+            if ids is not None:
+                self._memo.move_to_end(needle)
+                return ids
+        if len(self._vocab_arr):
+            ids = np.flatnonzero(np.char.find(self._vocab_arr, needle) >= 0)
+        else:
+            ids = np.array([], dtype=np.int64)
+        with self._memo_lock:
+            self._memo[needle] = ids
+            if len(self._memo) > _LOOKUP_MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return ids
+
+    def match_any(self, needles: Iterable[str]) -> np.ndarray:
+        ids = [self.match(n) for n in needles]
+        if not ids:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(ids))
+
+    def rows_for_ids(self, ids: np.ndarray) -> np.ndarray:
+        """Sorted row positions of all rows whose area is one of ``ids``."""
+        if len(ids) == 0:
+            return np.array([], dtype=np.int64)
+        if len(ids) == 1:
+            i = int(ids[0])
+            return self.positions[self.offsets[i]:self.offsets[i + 1]]
+        parts = [self.positions[self.offsets[i]:self.offsets[i + 1]] for i in ids]
+        return np.sort(np.concatenate(parts), kind="stable")
+
+    def rows(self, needles: Iterable[str]) -> np.ndarray:
+        return self.rows_for_ids(self.match_any(needles))
+
+
+def build_area_index(df: pd.DataFrame) -> AreaIndex:
+    return AreaIndex(df["_area_norm"])
@@ -0,0 +1,228 @@
+# analysis/jobs.py
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INGEST_WORKERS = 2
+DEFAULT_JOB_HISTORY = 500
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# ordered ingestion stages; progress is reported as completed / total
+INGEST_STAGES = ("parse", "normalize", "validate", "compact", "snapshot", "load", "index")
+
+# job status files live in <snapshot root>/jobs/<job_id>.json
+JOBS_DIR = "jobs"
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class IngestJob:
+    """Status of one background ingestion of an uploaded dataset."""
+
+    def __init__(self, path: str, dataset_id: str):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.dataset_id = dataset_id
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.rows: Optional[int] = None
+        self.memory: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def progress(self) -> float:
+        if self.status == SUCCEEDED:
+            return 1.0
+        return round(len(self.timings) / len(INGEST_STAGES), 3)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "dataset_id": self.dataset_id,
+            "uploaded_path": self.path,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "rows": self.rows,
+            "memory": self.memory,
+            "timings_ms": {k: round(v * 1000, 2) for k, v in self.timings.items()},
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# --------------------
+# Status files
+# --------------------
+def job_status_path(job_id: str, root: str = None) -> str:
+    from .snapshot import default_snapshot_root
+    return os.path.join(root or default_snapshot_root(), JOBS_DIR, f"{job_id}.json")
+
+
+def save_job_status(job: IngestJob, root: str = None) -> None:
+    """Write the job's status file (atomically) so every worker process can answer for it."""
+    path = job_status_path(job.id, root)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".job-")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(job.as_dict(), fh)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning("could not write status of ingest job %s: %s", job.id, e)
+
+
+def load_job_status(job_id: str, root: str = None) -> Optional[Dict[str, Any]]:
+    """The last status written for ``job_id`` by any process, or None."""
+    if not _JOB_ID.match(job_id or ""):
+        return None
+    try:
+        with open(job_status_path(job_id, root)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_job_status(job_id: str, root: str = None) -> None:
+    try:
+        os.remove(job_status_path(job_id, root))
+    except OSError:
+        pass
+
+
+def run_ingest(job: IngestJob, on_stage: Optional[Callable[[IngestJob], None]] = None) -> None:
+    """
+    Parse, normalize, validate, compact and snapshot a dataset, then warm the
+    cache and its indexes. ``on_stage(job)`` is called as each stage starts.
+    """
+    from .shared import source_info
+    from .snapshot import write_snapshot
+    from .utils import compact_dataset, get_dataset, normalize_dataset, prepare_dataset, read_raw_dataset
+
+    def stage(name, fn):
+        job.stage = name
+        if on_stage is not None:
+            on_stage(job)
+        t0 = time.perf_counter()
+        out = fn()
+        job.timings[name] = time.perf_counter() - t0
+        return out
+
+    raw = stage("parse", lambda: read_raw_dataset(job.path))
+    df = stage("normalize", lambda: normalize_dataset(raw))
+
+    def validate():
+        if df.empty:
+            raise ValueError("dataset has no rows")
+        if df["area"].isna().all():
+            raise ValueError("no area/location column found")
+
+    stage("validate", validate)
+    job.rows = int(len(df))
+    df, job.memory = stage("compact", lambda: compact_dataset(df, source=job.path))
+    stage("snapshot", lambda: write_snapshot(df, job.dataset_id, source=source_info(job.path)))
+    entry = stage("load", lambda: get_dataset(job.path, prepare=False))
+    stage("index", lambda: prepare_dataset(entry))
+
+
+class IngestQueue:
+    """
+    Bounded worker pool plus a registry of ingestion jobs.
+
+    At most one job per dataset id is live: re-submitting a dataset that is
+    queued, running or already ingested returns the existing job. The
+    registry is per process; every status change is also written to a
+    status file (``load_job_status``), so a status request that lands on
+    another worker process is still answered. Deduplication of live jobs
+    stays per process.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_INGEST_WORKERS, history: int = DEFAULT_JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-ingest")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._by_dataset: Dict[str, str] = {}
+        self.history = history
+
+    def submit(self, path: str, dataset_id: str, on_failure=None) -> IngestJob:
+        with self._lock:
+            existing = self._jobs.get(self._by_dataset.get(dataset_id, ""))
+            if existing is not None and existing.status != FAILED:
+                return existing
+            job = IngestJob(path, dataset_id)
+            self._jobs[job.id] = job
+            self._by_dataset[dataset_id] = job.id
+            expired = []
+            while len(self._jobs) > self.history:
+                old_id, old = self._jobs.popitem(last=False)
+                expired.append(old_id)
+                if self._by_dataset.get(old.dataset_id) == old_id:
+                    del self._by_dataset[old.dataset_id]
+        for old_id in expired:
+            remove_job_status(old_id)
+        save_job_status(job)
+        self._executor.submit(self._run, job, on_failure)
+        return job
+
+    def _run(self, job: IngestJob, on_failure) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            run_ingest(job, on_stage=save_job_status)
+        except Exception as e:
+            job.status = FAILED
+            job.error = f"{job.stage}: {e}"
+            if on_failure is not None:
+                on_failure(job)
+        else:
+            job.status = SUCCEEDED
+            job.stage = None
+        finally:
+            job.finished_at = time.time()
+            save_job_status(job)
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting jobs; with ``wait``, block until running ones (and their status files) are done."""
+        self._executor.shutdown(wait=wait)
+
+
+_ingest_queue: Optional[IngestQueue] = None
+_ingest_queue_lock = threading.Lock()
+
+
+def get_ingest_queue() -> IngestQueue:
+    """Return the process-wide ingestion queue, sized from ``settings.ANALYSIS_INGEST_WORKERS``."""
+    global _ingest_queue
+    if _ingest_queue is None:
+        with _ingest_queue_lock:
+            if _ingest_queue is None:
+                from django.conf import settings
+
+                _ingest_queue = IngestQueue(
+                    max_workers=getattr(settings, "ANALYSIS_INGEST_WORKERS", DEFAULT_INGEST_WORKERS),
+                    history=getattr(settings, "ANALYSIS_INGEST_JOB_HISTORY", DEFAULT_JOB_HISTORY),
+                )
+    return _ingest_queue
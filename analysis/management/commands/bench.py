@@ -0,0 +1,54 @@
+# analysis/management/commands/bench.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analysis.benchmarks import compare_to_baseline, parse_sizes, run_suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Time dataset loading, filtering, charts, summaries and the query endpoint on "
+        "synthetic Pune-style datasets; optionally flag regressions against a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000x100,100000x1000",
+                            help="comma separated ROWSxAREAS cases, e.g. 10000x100,10000000x50000")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--workdir", help="keep generated datasets and snapshots here")
+        parser.add_argument("--output", help="write the results JSON to this file")
+        parser.add_argument("--baseline", help="results JSON of a previous run to compare against")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="allowed slowdown of a median before it counts as a regression")
+
+    def handle(self, *args, **options):
+        sizes = parse_sizes(options["sizes"])
+        if not sizes:
+            raise CommandError("No benchmark sizes given.")
+        results = run_suite(sizes, repeat=options["repeat"], workdir=options["workdir"], seed=options["seed"],
+                            progress=lambda msg: self.stderr.write(msg))
+
+        for case in results["cases"]:
+            self.stdout.write(f"{case['rows']} rows x {case['areas']} areas ({case['dataset_bytes']} bytes in memory)")
+            for op, t in case["ops"].items():
+                self.stdout.write(f"  {op:<24}{t['median_ms']:>12.3f} ms  (min {t['min_ms']:.3f}, n={t['runs']})")
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(results, fh, indent=1)
+            self.stdout.write(f"results written to {options['output']}")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as fh:
+                baseline = json.load(fh)
+            regressions = compare_to_baseline(results, baseline, tolerance=options["tolerance"])
+            for r in regressions:
+                self.stdout.write(
+                    f"REGRESSION {r['rows']}x{r['areas']} {r['op']}: "
+                    f"{r['baseline_ms']:.3f} -> {r['current_ms']:.3f} ms (x{r['ratio']})"
+                )
+            if regressions:
+                raise CommandError(f"{len(regressions)} operation(s) slower than the baseline.")
+            self.stdout.write("no regressions against the baseline")
@@ -0,0 +1,95 @@
+# analysis/management/commands/bench_parser.py
+import re
+import time
+from typing import Any, Dict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analysis.parser import MAX_QUERY_CHARS, SAMPLE_QUERIES, _parse_normalized, normalize_query, parse_query
+
+_LEGACY_COMPARE_SEPARATORS = re.compile(r"\s*,\s*(?:(?:and|with|vs\.?|versus)\s+)?|\s+(?:and|with|vs\.?|versus)\s+")
+_LEGACY_COMPARE_AREA = re.compile(r"[a-z0-9][a-z0-9\s]*")
+
+
+def legacy_parse_query_text(q: str) -> Dict[str, Any]:
+    """The regex parser that ``analysis.parser`` replaced; reference for output and timing."""
+    qlow = (q or "").lower()
+    qlow = re.sub(r"\s+", " ", qlow).strip()
+
+    cmp_match = re.search(
+        r"compare\s+([a-z0-9\s,.]+?)"
+        r"(?:\s+(?:demand|price|growth|trend|trends).*)?$",
+        qlow,
+    )
+    if cmp_match:
+        parts = [p.strip() for p in _LEGACY_COMPARE_SEPARATORS.split(cmp_match.group(1))]
+        if len(parts) >= 2 and all(_LEGACY_COMPARE_AREA.fullmatch(p) for p in parts):
+            return {"intent": "compare", "areas": parts}
+
+    growth_match = re.search(
+        r"price growth for\s+([a-z0-9\s]+)\s+"
+        r"(?:over the last|in the last)\s+"
+        r"(\d+)\s+years?",
+        qlow,
+    )
+    if growth_match:
+        return {"intent": "growth", "areas": [growth_match.group(1).strip()], "last_n_years": int(growth_match.group(2))}
+
+    analyze_match = re.search(r"analyz(?:e|is)\s+([a-z0-9\s]+)", qlow) or re.search(
+        r"analysis of\s+([a-z0-9\s]+)", qlow
+    )
+    if analyze_match:
+        return {"intent": "analyze", "areas": [analyze_match.group(1).strip()]}
+
+    words = re.findall(r"[a-z0-9]+", qlow)
+    if words:
+        return {"intent": "analyze", "areas": [" ".join(words[-1:])]}
+    return {"intent": "analyze", "areas": []}
+
+
+def pathological_inputs(size: int) -> Dict[str, str]:
+    """Inputs that make the legacy regexes backtrack (quadratic in ``size``)."""
+    return {
+        "repeated compare, no match": "compare " * (size // 8) + "!",
+        "compare, long body": "compare " + "aundh " * (size // 6) + "?",
+        "repeated growth prefix": "price growth for " * (size // 17) + "x",
+        "growth, no period": "price growth for " + "a " * (size // 2) + "over the last x",
+        "repeated analyze": "analyze ! " * (size // 10),
+        "long plain text": "wakad " * (size // 6),
+    }
+
+
+def _time(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+class Command(BaseCommand):
+    help = "Check the query parser against the sample corpus and time it on pathological inputs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="500,2000,8000", help="comma separated input lengths")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        mismatches = [q for q in SAMPLE_QUERIES if parse_query(q) != legacy_parse_query_text(q)]
+        if mismatches:
+            raise CommandError(f"parser output differs from the legacy parser for: {mismatches}")
+        self.stdout.write(f"corpus: {len(SAMPLE_QUERIES)} sample queries parse identically")
+
+        sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+        self.stdout.write(f"{'input':<28}{'chars':>8}{'legacy ms':>12}{'uncapped ms':>13}{'capped ms':>11}")
+        for size in sizes:
+            for name, text in pathological_inputs(size).items():
+                legacy = _time(legacy_parse_query_text, text, options["repeat"])
+                # the tokenizer on the full text (no cap, no memo) shows the linear scaling
+                uncapped = _time(lambda t: _parse_normalized.__wrapped__(" ".join(t.lower().split())), text, options["repeat"])
+                capped = _time(lambda t: _parse_normalized.__wrapped__(normalize_query(t)), text, options["repeat"])
+                self.stdout.write(
+                    f"{name:<28}{len(text):>8}{legacy * 1000:>12.3f}{uncapped * 1000:>13.3f}{capped * 1000:>11.3f}"
+                )
+        self.stdout.write(f"input cap: {MAX_QUERY_CHARS} chars")
@@ -0,0 +1,189 @@
+# analysis/metrics.py
+"""
+In-process timing instrumentation and Prometheus text exposition.
+
+``timed("stage")`` (context manager or decorator) measures a hot-path
+stage. Every measurement goes into the ``analysis_stage_seconds`` histogram;
+inside ``collect_timings()`` it is also recorded for the current request,
+which the query views turn into a ``Server-Timing`` header. Stages may
+nest (e.g. ``filter`` inside ``chart``), so they need not add up to ``total``.
+"""
+import contextvars
+import functools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# histogram buckets in seconds (upper bounds; +Inf is implicit)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_request_timings: contextvars.ContextVar[Optional["OrderedDict[str, float]"]] = contextvars.ContextVar(
+    "analysis_request_timings", default=None
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set (Prometheus semantics)."""
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label key -> [bucket counts..., +Inf count], sum
+        self._series: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(c), t[0]) for k, (c, t) in self._series.items()}
+        for key in sorted(series):
+            counts, total = series[key]
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', repr(bound))])} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+STAGE_SECONDS = Histogram("analysis_stage_seconds", "Time spent in each stage of the query path.")
+
+
+def record(stage: str, seconds: float) -> None:
+    """Add one measurement to the stage histogram and the current request's timings."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+class timed:
+    """Time a block (``with timed("chart"):``) or every call of a function (``@timed("chart")``)."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self._t0)
+        return False
+
+    def __call__(self, fn: Callable) -> Callable:
+        stage = self.stage
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - t0)
+
+        return wrapper
+
+
+@contextmanager
+def collect_timings():
+    """Collect the stage timings recorded in this context (thread / task) into an ordered dict."""
+    timings: "OrderedDict[str, float]" = OrderedDict()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """``Server-Timing`` value, durations in milliseconds: ``load;dur=1.234, parse;dur=0.051``."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in timings.items())
+
+
+def _samples(name: str, help: str, kind: str, samples: Iterable[Tuple[LabelKey, float]]) -> List[str]:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{_format_labels(key)} {value}" for key, value in samples]
+    return lines
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    from .admission import QUERY_FLIGHTS, get_admission_gate
+    from .cache import get_dataset_cache, get_response_cache
+    from .parser import _parse_normalized
+
+    lines = STAGE_SECONDS.render()
+
+    datasets = get_dataset_cache().stats()
+    for field, kind, help in (
+        ("hits", "counter", "Dataset cache hits."),
+        ("misses", "counter", "Dataset cache misses (file parsed or snapshot opened)."),
+        ("evictions", "counter", "Datasets evicted to stay within the memory budget."),
+        ("coalesced", "counter", "Dataset loads that waited for the same file's in-flight load."),
+        ("entries", "gauge", "Datasets currently cached."),
+        ("bytes", "gauge", "Bytes held by cached datasets and their derived structures."),
+    ):
+        suffix = "_total" if kind == "counter" else ""
+        lines += _samples(f"analysis_dataset_cache_{field}{suffix}", help, kind, [((), datasets[field])])
+
+    lines += _samples("analysis_query_coalesced_total", "Queries that waited for an identical in-flight query.",
+                      "counter", [((), QUERY_FLIGHTS.coalesced)])
+    gate = get_admission_gate().stats()
+    for field, kind, help in (
+        ("admitted", "counter", "Heavy analyses (cold loads, uncached queries) admitted."),
+        ("rejected", "counter", "Heavy analyses refused with 503 by admission control."),
+        ("active", "gauge", "Heavy analyses running."),
+        ("queued", "gauge", "Heavy analyses waiting for a slot."),
+    ):
+        suffix = "_total" if kind == "counter" else ""
+        lines += _samples(f"analysis_admission_{field}{suffix}", help, kind, [((), gate[field])])
+
+    responses = get_response_cache()
+    if responses is not None:
+        stats = responses.stats()
+        backend = (("backend", str(stats.get("backend", ""))),)
+        for field in ("hits", "misses"):
+            lines += _samples(f"analysis_response_cache_{field}_total", f"Response cache {field}.", "counter",
+                            [(backend, stats[field])])
+
+    info = _parse_normalized.cache_info()
+    lines += _samples("analysis_parser_memo_hits_total", "Parsed-intent memo hits.", "counter", [((), info.hits)])
+    lines += _samples("analysis_parser_memo_misses_total", "Parsed-intent memo misses.", "counter", [((), info.misses)])
+    return "\n".join(lines) + "\n"
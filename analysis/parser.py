@@ -0,0 +1,259 @@
+# analysis/parser.py
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+# hard cap on the query text that is parsed; longer input is truncated
+MAX_QUERY_CHARS = 500
+# how many distinct normalized queries are memoized
+_PARSE_MEMO_SIZE = 4096
+
+# documented sample queries (README, parse_query_text docstring, chat placeholder)
+SAMPLE_QUERIES = (
+    "Analyze Wakad",
+    "Give me analysis of Wakad",
+    "Compare Ambegaon Budruk and Aundh demand trends",
+    "Compare Aundh with Wakad",
+    "Compare Aundh vs Wakad",
+    "Compare Aundh, Wakad, Baner and Hinjewadi",
+    "Show price growth for Akurdi over the last 3 years",
+)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_ALNUM_PREFIX = re.compile(r"[a-z0-9]*")
+_COMPARE_BODY = re.compile(r"[a-z0-9,.]+")
+_COMPARE_STOP = ("demand", "price", "growth", "trend")
+_CONNECTORS = ("and", "with", "vs", "vs.", "versus")
+# ranking questions: "top 10 areas by demand in 2023", "which areas had the highest price growth ..."
+_RANK_NOUNS = ("areas", "localities", "locations", "neighbourhoods", "neighborhoods", "places", "regions")
+_RANK_ORDER = {
+    "top": "desc", "highest": "desc", "most": "desc", "best": "desc", "fastest": "desc",
+    "biggest": "desc", "largest": "desc", "growing": "desc",
+    "bottom": "asc", "lowest": "asc", "least": "asc", "worst": "asc", "slowest": "asc", "smallest": "asc",
+}
+_RANK_GROWTH = ("growth", "growing", "cagr", "appreciation", "appreciating", "increase")
+_RANK_DEMAND = ("demand", "sales", "sold", "selling", "units")
+# "which localities behave like baner", "areas similar to aundh": analyze the named area
+_SIMILAR_CUES = ("behave", "behaves", "behaving", "perform", "performs", "trend", "trends", "move", "moves") + _RANK_NOUNS
+DEFAULT_RANK_LIMIT = 10
+MAX_RANK_LIMIT = 100
+
+
+def normalize_query(q: Optional[str]) -> str:
+    """Lower-case, collapse whitespace and apply the length cap."""
+    return " ".join((q or "")[:MAX_QUERY_CHARS].lower().split())
+
+
+def parse_query(q: Optional[str]) -> Dict[str, Any]:
+    """
+    Parse chat text into ``{"intent", "areas"[, "last_n_years"]}``.
+
+    The text is normalized and split into tokens once; each intent rule is a
+    single left-to-right pass over the tokens, so parsing is linear in the
+    (capped) input length. Results are memoized per normalized text.
+    """
+    parsed = _parse_normalized(normalize_query(q))
+    return dict(parsed, areas=list(parsed["areas"]))
+
+
+@lru_cache(maxsize=_PARSE_MEMO_SIZE)
+def _parse_normalized(text: str) -> Dict[str, Any]:
+    tokens = text.split(" ") if text else []
+    # rank matches loose word combinations, so it only applies once no rule
+    # that names an area has matched ("analyze wakad, the best area")
+    return (
+        _parse_compare(tokens)
+        or _parse_similar(tokens)
+        or _parse_growth(tokens)
+        or _parse_analyze(tokens)
+        or _parse_rank(text)
+        or _parse_fallback(text)
+    )
+
+
+def _is_area_phrase(words: str) -> bool:
+    """False for an empty phrase or one that is itself a ranking question ("the top 5 areas")."""
+    return bool(words) and _parse_rank(words) is None
+
+
+def _parse_compare(tokens: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    ``compare <areas> [demand|price|growth|trend ...]`` with areas separated
+    by commas and/or ``and`` / ``with`` / ``vs`` / ``versus``.
+    """
+    i = 0
+    while i < len(tokens):
+        if not tokens[i].endswith("compare") or i + 1 >= len(tokens):
+            i += 1
+            continue
+        # body: tokens up to the first trailing keyword (never the first token)
+        j = i + 1
+        while j < len(tokens) and _COMPARE_BODY.fullmatch(tokens[j]):
+            if j > i + 1 and tokens[j].startswith(_COMPARE_STOP):
+                break
+            j += 1
+        if j < len(tokens) and not (j > i + 1 and tokens[j].startswith(_COMPARE_STOP)):
+            # a character outside the body alphabet before any keyword: try a later "compare"
+            i = j if j > i else i + 1
+            continue
+        areas = _split_areas(tokens[i + 1:j])
+        if areas is None or len(areas) < 2:
+            return None
+        return {"intent": "compare", "areas": areas}
+    return None
+
+
+def _split_areas(body: List[str]) -> Optional[List[str]]:
+    """Split compare body tokens into area names; None if any name is malformed."""
+    areas: List[List[str]] = [[]]
+    after_comma = False
+    for k, tok in enumerate(body):
+        pieces = tok.split(",")
+        for n, piece in enumerate(pieces):
+            if n:
+                areas.append([])
+                after_comma = True
+            if not piece:
+                continue
+            # a connector is a separator only between words (or right after a comma)
+            followed_by_space = n == len(pieces) - 1 and k + 1 < len(body)
+            if piece in _CONNECTORS and followed_by_space and (after_comma or (n == 0 and areas[-1])):
+                if not after_comma:
+                    areas.append([])
+                after_comma = False
+                continue
+            areas[-1].append(piece)
+            after_comma = False
+    names = [" ".join(a) for a in areas]
+    if any(not n or "." in n for n in names):
+        return None
+    return names
+
+
+def _parse_rank(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Questions about all areas at once: an area noun ("areas", "localities",
+    ...) plus an order word ("top", "highest", "lowest", ...). The metric is
+    year-over-year change ("yoy", "year over year"), price growth (CAGR) or
+    average demand; "top 5" / "5 areas" set the limit, "last 3 years" or a
+    year ("in 2023") the period. One pass over the words.
+    """
+    words = _WORD.findall(text)
+    order = limit = last_n = year = None
+    noun = yoy = growth = demand = False
+    for k, w in enumerate(words):
+        nxt = words[k + 1] if k + 1 < len(words) else ""
+        if w in _RANK_NOUNS:
+            noun = True
+        elif w in _RANK_ORDER and order is None:
+            order = _RANK_ORDER[w]
+            if w in ("top", "bottom") and nxt.isdecimal():
+                limit = int(nxt)
+        if w == "yoy" or (w == "year" and nxt in ("over", "on") and words[k + 2:k + 3] == ["year"]):
+            yoy = True
+        growth = growth or w in _RANK_GROWTH
+        demand = demand or w in _RANK_DEMAND
+        if w.isdecimal():
+            if nxt in _RANK_NOUNS and limit is None:
+                limit = int(w)
+            elif k and words[k - 1] in ("last", "past") and nxt.startswith("year"):
+                last_n = int(w)
+            elif len(w) == 4 and 1900 <= int(w) <= 2100:
+                year = int(w)
+    if not noun or order is None:
+        return None
+    metric = "yoy" if yoy else "cagr" if growth else "demand" if demand else "cagr"
+    return {
+        "intent": "rank",
+        "areas": [],
+        "metric": metric,
+        "order": order,
+        "limit": min(max(limit or DEFAULT_RANK_LIMIT, 1), MAX_RANK_LIMIT),
+        "last_n_years": last_n or None,
+        "year": year,
+    }
+
+
+def _parse_similar(tokens: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    ``<cue> like <area>`` / ``similar to <area>`` asks for areas resembling
+    one area; it is answered like ``analyze <area>``, whose response lists
+    the most similar areas.
+    """
+    for i, tok in enumerate(tokens[:-1]):
+        if (tok == "like" and i and tokens[i - 1] in _SIMILAR_CUES) or (tok == "similar" and tokens[i + 1] == "to"):
+            area = _leading_words(tokens, i + (1 if tok == "like" else 2))
+            if _is_area_phrase(area):
+                return {"intent": "analyze", "areas": [area]}
+    return None
+
+
+def _parse_growth(tokens: List[str]) -> Optional[Dict[str, Any]]:
+    """``price growth for <area> over|in the last <n> year(s)`` (the last such phrase wins)."""
+    n_tok = len(tokens)
+    # one backward pass: end of the plain-word run at each token, and the last
+    # period phrase ("over the last 3 years") starting at or before each token
+    run_end = [n_tok] * (n_tok + 1)
+    for k in range(n_tok - 1, -1, -1):
+        run_end[k] = run_end[k + 1] if _WORD.fullmatch(tokens[k]) else k
+    last_period = [-1] * (n_tok + 1)
+    for m in range(n_tok + 1):
+        is_period = (m + 4 < n_tok and tokens[m] in ("over", "in") and tokens[m + 1] == "the"
+                     and tokens[m + 2] == "last" and tokens[m + 3].isdecimal()
+                     and tokens[m + 4].startswith("year"))
+        last_period[m] = m if is_period else (last_period[m - 1] if m else -1)
+
+    for i in range(n_tok - 2):
+        if not (tokens[i].endswith("price") and tokens[i + 1] == "growth" and tokens[i + 2] == "for"):
+            continue
+        start = i + 3
+        # the area may only span plain words; the period phrase must start inside that run
+        found = last_period[min(run_end[start], n_tok)] if start <= n_tok else -1
+        area = " ".join(tokens[start:found]) if found > start else ""
+        if _is_area_phrase(area):
+            return {
+                "intent": "growth",
+                "areas": [area],
+                "last_n_years": int(tokens[found + 3]),
+            }
+    return None
+
+
+def _parse_analyze(tokens: List[str]) -> Optional[Dict[str, Any]]:
+    """``analyze <area>`` / ``analyzis <area>``, else ``analysis of <area>``."""
+    for keyword_at in (_analyze_starts(tokens), _analysis_of_starts(tokens)):
+        for start in keyword_at:
+            area = _leading_words(tokens, start)
+            if _is_area_phrase(area):
+                return {"intent": "analyze", "areas": [area]}
+    return None
+
+
+def _analyze_starts(tokens: List[str]):
+    for i, tok in enumerate(tokens[:-1]):
+        if tok.endswith("analyze") or tok.endswith("analyzis"):
+            yield i + 1
+
+
+def _analysis_of_starts(tokens: List[str]):
+    for i, tok in enumerate(tokens[:-2]):
+        if tok.endswith("analysis") and tokens[i + 1] == "of":
+            yield i + 2
+
+
+def _leading_words(tokens: List[str], start: int) -> str:
+    """Plain words from ``start`` up to the first other character (which may end a token early)."""
+    words = []
+    for tok in tokens[start:]:
+        prefix = _ALNUM_PREFIX.match(tok).group()
+        if prefix:
+            words.append(prefix)
+        if len(prefix) < len(tok):
+            break
+    return " ".join(words)
+
+
+def _parse_fallback(text: str) -> Dict[str, Any]:
+    """Assume analyze, with the last word as the area."""
+    words = _WORD.findall(text)
+    return {"intent": "analyze", "areas": words[-1:]}
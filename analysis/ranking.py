@@ -0,0 +1,179 @@
+# analysis/ranking.py
+"""
+Cross-area rankings ("top growing areas", "top 10 areas by demand in 2023").
+
+Every area is scored at once from the dataset's ``AreaYearMatrix`` (area x
+year NumPy arrays derived from the aggregate cube), and only the top N are
+sorted (``np.argpartition``), so a ranking costs a few array passes over
+areas x years no matter how many rows or localities the dataset has.
+
+Metrics:
+  - ``cagr``: compound annual growth of the yearly mean price between an
+    area's first and last year with a price in the period
+  - ``yoy``: change of the yearly mean price from the year before an
+    area's last year with a price in the period (both years needed)
+  - ``demand``: mean demand over the period's rows
+"""
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .aggregates import AreaYearMatrix
+from .metrics import timed
+from .parser import DEFAULT_RANK_LIMIT, MAX_RANK_LIMIT
+
+RANK_METRICS = ("cagr", "yoy", "demand")
+RANK_ORDERS = ("desc", "asc")
+METRIC_LABELS = {"cagr": "price growth (CAGR)", "yoy": "year-over-year price change", "demand": "average demand"}
+# years a metric needs at least (growth is measured between two years)
+_MIN_SPAN = {"cagr": 2, "yoy": 2, "demand": 1}
+
+
+def ranking_params(data: Dict[str, Any]) -> Dict[str, Any]:
+    """A parsed ``rank`` intent from request fields (metric, order, limit, last_n_years, year); raises ValueError."""
+    metric = data.get("metric") or "cagr"
+    if metric not in RANK_METRICS:
+        raise ValueError(f"'metric' must be one of: {', '.join(RANK_METRICS)}.")
+    order = data.get("order") or "desc"
+    if order not in RANK_ORDERS:
+        raise ValueError("'order' must be 'desc' or 'asc'.")
+
+    def integer(name, default, low, high):
+        value = data.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{name}' must be an integer.")
+        if not low <= value <= high:
+            raise ValueError(f"'{name}' must be between {low} and {high}.")
+        return value
+
+    return {
+        "intent": "rank",
+        "areas": [],
+        "metric": metric,
+        "order": order,
+        "limit": integer("limit", DEFAULT_RANK_LIMIT, 1, MAX_RANK_LIMIT),
+        "last_n_years": integer("last_n_years", None, 1, 100),
+        "year": integer("year", None, 1900, 2100),
+    }
+
+
+def period(matrix: AreaYearMatrix, metric: str, last_n_years: int = None, year: int = None) -> Tuple[int, int]:
+    """
+    ``(first, last)`` year of the ranked period: the last ``last_n_years``
+    up to ``year`` (default: the dataset's latest year). A year alone means
+    that year (demand) or that year against the one before (growth).
+    """
+    end = year if year is not None else int(matrix.years[-1])
+    if last_n_years:
+        return end - last_n_years + 1, end
+    if year is not None:
+        return end - _MIN_SPAN[metric] + 1, end
+    return int(matrix.years[0]), end
+
+
+def _last_valid(valid: np.ndarray) -> np.ndarray:
+    """Column of each row's last True (undefined for rows without one)."""
+    return valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+
+
+def _growth(matrix: AreaYearMatrix, cols: np.ndarray, metric: str):
+    """Growth per area between two years of the period, plus the start / end column of each area."""
+    price = matrix.price[:, cols]
+    valid = ~np.isnan(price) & (price > 0)
+    n = price.shape[0]
+    values = np.full(n, np.nan)
+    if not price.shape[1]:
+        return values, np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    end = _last_valid(valid)
+    if metric == "cagr":
+        start = np.argmax(valid, axis=1)
+    else:
+        before = valid.copy()
+        before[np.arange(n), end] = False
+        start = _last_valid(before)
+        valid = valid & before.any(axis=1)[:, None]
+    years = matrix.years[cols]
+    span = years[end] - years[start]
+    ok = valid.any(axis=1) & ((span > 0) if metric == "cagr" else (span == 1))
+    rows = np.flatnonzero(ok)
+    ratio = price[rows, end[rows]] / price[rows, start[rows]]
+    if metric == "cagr":
+        values[rows] = ratio ** (1.0 / span[rows]) - 1.0
+    else:
+        values[rows] = ratio - 1.0
+    return values, cols[start], cols[end]
+
+
+def top_n(values: np.ndarray, n: int, descending: bool = True) -> np.ndarray:
+    """Positions of the ``n`` best non-NaN values, best first (ties: lower position first)."""
+    candidates = np.flatnonzero(~np.isnan(values))
+    key = -values[candidates] if descending else values[candidates]
+    if n < len(candidates):
+        part = np.argpartition(key, n - 1)[:n]
+        candidates, key = candidates[part], key[part]
+    return candidates[np.lexsort((candidates, key))]
+
+
+@timed("rank")
+def rank_areas(matrix: AreaYearMatrix, metric: str = "cagr", order: str = "desc", limit: int = DEFAULT_RANK_LIMIT,
+               last_n_years: int = None, year: int = None) -> Dict[str, Any]:
+    """The ranking payload: period, the top ``limit`` areas with their scores and a one-line summary."""
+    payload: Dict[str, Any] = {"type": "ranking", "metric": metric, "order": order, "limit": limit}
+    if not len(matrix.years):
+        payload.update(years=None, ranked_areas=0, results=[],
+                       summary=f"No yearly data to rank areas by {METRIC_LABELS[metric]}.")
+        return payload
+    first, last = period(matrix, metric, last_n_years, year)
+    cols = matrix.columns(first, last)
+
+    if metric == "demand":
+        total = matrix.demand_sum[:, cols].sum(axis=1)
+        count = matrix.demand_count[:, cols].sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = np.where(count > 0, total / np.where(count > 0, count, 1), np.nan)
+    else:
+        values, start, end = _growth(matrix, cols, metric)
+    values = np.where(matrix.labelled, values, np.nan)
+
+    results: List[Dict[str, Any]] = []
+    for rank, i in enumerate(top_n(values, limit, descending=order == "desc"), start=1):
+        row: Dict[str, Any] = {"rank": rank, "area": matrix.labels[i]}
+        if metric == "demand":
+            row.update(value=round(float(values[i]), 2), rows=int(count[i]))
+        else:
+            row.update(
+                value=round(float(values[i]) * 100, 2),
+                from_year=int(matrix.years[start[i]]), to_year=int(matrix.years[end[i]]),
+                from_price=round(float(matrix.price[i, start[i]]), 2),
+                to_price=round(float(matrix.price[i, end[i]]), 2),
+            )
+        results.append(row)
+
+    payload.update(years=[first, last], ranked_areas=int((~np.isnan(values)).sum()), results=results,
+                   summary=_summary(metric, order, first, last, results))
+    return payload
+
+
+def _summary(metric: str, order: str, first: int, last: int, results: List[Dict[str, Any]]) -> str:
+    label = METRIC_LABELS[metric]
+    span = str(last) if first == last else f"{first}-{last}"
+    if not results:
+        return f"No area has enough data to rank by {label} for {span}."
+    unit = "" if metric == "demand" else "%"
+    listed = ", ".join(f"{r['area']} ({r['value']:,.2f}{unit})" for r in results)
+    which = "Top" if order == "desc" else "Bottom"
+    return f"{which} {len(results)} areas by {label} for {span}: {listed}."
+
+
+def ranking_payload(df, parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """``rank_areas`` for a parsed ``rank`` intent over a dataset frame."""
+    from .utils import area_matrix_for
+
+    return rank_areas(
+        area_matrix_for(df), parsed.get("metric") or "cagr", parsed.get("order") or "desc",
+        parsed.get("limit") or DEFAULT_RANK_LIMIT, parsed.get("last_n_years"), parsed.get("year"),
+    )
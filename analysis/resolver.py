@@ -0,0 +1,160 @@
+# analysis/resolver.py
+import threading
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, Dict, List
+
+import numpy as np
+
+# minimum similarity (0-1) for a fuzzy match to be accepted
+DEFAULT_MIN_CONFIDENCE = 0.6
+# trigram-ranked candidates re-scored with an edit-based similarity
+_FUZZY_CANDIDATES = 10
+# how many resolved phrases each resolver remembers
+_RESOLVE_MEMO_SIZE = 4096
+# matched areas listed per phrase in a resolution (the count is always reported)
+_LISTED_MATCHES = 20
+
+
+def trigrams(text: str) -> List[str]:
+    """Distinct character trigrams of ``text`` padded with a space on each side."""
+    padded = f" {text} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class TrigramIndex:
+    """
+    Inverted index from character trigrams to vocabulary ids.
+
+    Postings are stored CSR style (one id array + offsets per trigram), so a
+    lookup touches only the postings of the query's own trigrams and scores
+    every candidate with one ``bincount``.
+    """
+
+    def __init__(self, vocab: List[str]):
+        grams_per_term = [trigrams(term) for term in vocab]
+        self.term_sizes = np.array([len(g) for g in grams_per_term], dtype=np.int64)
+        flat = [g for grams in grams_per_term for g in grams]
+        owner = np.repeat(np.arange(len(vocab), dtype=np.int64), self.term_sizes)
+
+        gram_ids: Dict[str, int] = {}
+        codes = np.fromiter((gram_ids.setdefault(g, len(gram_ids)) for g in flat), dtype=np.int64, count=len(flat))
+        self._gram_ids = gram_ids
+        order = np.argsort(codes, kind="stable")
+        self.postings = owner[order]
+        self.offsets = np.zeros(len(gram_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(gram_ids)), out=self.offsets[1:])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.postings.nbytes + self.offsets.nbytes + self.term_sizes.nbytes)
+
+    def similarity(self, text: str) -> np.ndarray:
+        """Dice similarity of ``text`` to every vocabulary term (0 when no trigram is shared)."""
+        grams = trigrams(text)
+        scores = np.zeros(len(self.term_sizes), dtype=float)
+        ids = [self._gram_ids[g] for g in grams if g in self._gram_ids]
+        if not ids:
+            return scores
+        hits = np.concatenate([self.postings[self.offsets[i]:self.offsets[i + 1]] for i in ids])
+        shared = np.bincount(hits, minlength=len(self.term_sizes))
+        return 2.0 * shared / (len(grams) + self.term_sizes)
+
+    def containing_candidates(self, text: str):
+        """
+        Ids of terms that may contain ``text`` as a substring: those holding
+        every trigram of ``text``. None when ``text`` is shorter than a trigram.
+        """
+        grams = {text[i:i + 3] for i in range(len(text) - 2)}
+        if not grams:
+            return None
+        if any(g not in self._gram_ids for g in grams):
+            return np.array([], dtype=np.int64)
+        hits = np.concatenate([self.postings[self.offsets[self._gram_ids[g]]:self.offsets[self._gram_ids[g] + 1]]
+                               for g in grams])
+        return np.flatnonzero(np.bincount(hits, minlength=len(self.term_sizes)) == len(grams))
+
+
+class AreaResolver:
+    """
+    Map area phrases from a query onto the dataset's area vocabulary.
+
+    A phrase that is a substring of some area resolves exactly (confidence
+    1.0) and is left as typed, so filtering behaves as before. Otherwise the
+    areas sharing the most trigrams are re-scored with an edit-based ratio
+    and the best is used when it scores at least ``min_confidence``
+    ("wakkad" -> "wakad", "ambegaon bk" -> "ambegaon budruk", "akrudi" -> "akurdi").
+    Both steps only touch the postings of the phrase's trigrams, and results
+    are memoized per phrase (LRU).
+    """
+
+    def __init__(self, index, min_confidence: float = DEFAULT_MIN_CONFIDENCE):
+        self.index = index
+        self.min_confidence = min_confidence
+        self.trigrams = TrigramIndex(index.vocab)
+        self._memo: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    def resolve(self, phrase: str) -> Dict[str, Any]:
+        """
+        Resolve one normalized area phrase.
+
+        Returns ``{"query", "area", "matches", "match_count", "confidence",
+        "method"}`` where ``area`` is the text to filter on, ``matches`` (the
+        first few of) the vocabulary areas it selects and ``method`` one of
+        ``exact`` / ``fuzzy`` / ``none``.
+        """
+        with self._memo_lock:
+            hit = self._memo.get(phrase)
+            if hit is not None:
+                self._memo.move_to_end(phrase)
+                return hit
+        result = self._resolve(phrase)
+        with self._memo_lock:
+            self._memo[phrase] = result
+            if len(self._memo) > _RESOLVE_MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return result
+
+    def _resolve(self, phrase: str) -> Dict[str, Any]:
+        ids = self._containing(phrase)
+        if len(ids):
+            return self._result(phrase, phrase, ids, 1.0, "exact")
+        scores = self.trigrams.similarity(phrase)
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > _FUZZY_CANDIDATES:
+            top = np.argpartition(scores[candidates], -_FUZZY_CANDIDATES)[-_FUZZY_CANDIDATES:]
+            candidates = np.sort(candidates[top])
+        best, confidence = -1, 0.0
+        for i in candidates:
+            ratio = SequenceMatcher(None, phrase, self.index.vocab[i], autojunk=False).ratio()
+            if ratio > confidence:
+                best, confidence = int(i), ratio
+        if best < 0 or confidence < self.min_confidence:
+            return self._result(phrase, phrase, ids, 0.0, "none")
+        area = self.index.vocab[best]
+        return self._result(phrase, area, self._containing(area), round(confidence, 3), "fuzzy")
+
+    def _containing(self, phrase: str) -> np.ndarray:
+        """Same ids as ``AreaIndex.match`` (substring rule), narrowed by trigrams first."""
+        candidates = self.trigrams.containing_candidates(phrase)
+        if candidates is None:
+            return self.index.match(phrase)
+        vocab = self.index.vocab
+        return np.array([i for i in candidates if phrase in vocab[i]], dtype=np.int64)
+
+    def _result(self, phrase, area, ids, confidence, method) -> Dict[str, Any]:
+        return {
+            "query": phrase,
+            "area": area,
+            "matches": [self.index.vocab[i] for i in ids[:_LISTED_MATCHES]],
+            "match_count": int(len(ids)),
+            "confidence": confidence,
+            "method": method,
+        }
+
+
+def build_area_resolver(index) -> AreaResolver:
+    from django.conf import settings
+
+    return AreaResolver(index, getattr(settings, "ANALYSIS_AREA_MIN_CONFIDENCE", DEFAULT_MIN_CONFIDENCE))
@@ -0,0 +1,226 @@
+# analysis/shared.py
+"""
+Cross-process dataset store on top of the columnar snapshots.
+
+The first process that needs a dataset publishes it: holding an exclusive
+file lock it parses the source and writes the snapshot, while processes
+waiting on the lock (or arriving later) attach to the published files
+instead of parsing again. Attaching memory-maps the columns read-only, so N
+gunicorn workers share one copy of the numeric and categorical data through
+the page cache (point ANALYSIS_SNAPSHOT_DIR at a tmpfs such as /dev/shm to
+keep it in RAM).
+
+Every attached process holds a reference file ``refs/<host>-<pid>`` in the
+snapshot directory until the dataset leaves its cache (evicted, replaced or
+cleared) or the process exits. A snapshot whose source file changed or
+disappeared is deleted once no live process references it; references left
+behind by dead processes on this host are ignored.
+"""
+import atexit
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from .snapshot import MANIFEST_NAME, default_snapshot_root, read_snapshot, snapshot_dir, write_snapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishing is not serialized across processes
+    fcntl = None
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+REFS_DIR = "refs"
+_HOST = socket.gethostname()
+
+
+def source_info(path: str) -> Dict[str, Any]:
+    """What a snapshot records about its source file, to notice when the file is replaced."""
+    st = os.stat(path)
+    return {"path": path, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def _ref_name(pid: int = None) -> str:
+    return f"{_HOST}-{pid or os.getpid()}"
+
+
+def _ref_alive(name: str) -> bool:
+    host, _, pid = name.rpartition("-")
+    if host != _HOST or not pid.isdigit() or os.name == "nt":
+        # another machine sharing the directory, or no cheap liveness check: assume alive
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _publish_lock(root: str, digest: str):
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, f".{digest}.lock"), "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+class SharedDatasetStore:
+    """Publish / attach / release datasets in the snapshot directory, with per-process references."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # digest -> [snapshot dir, number of live frames in this process]
+        self._held: Dict[str, List[Any]] = {}
+
+    def open(self, digest: str, build: Callable[[], "pd.DataFrame"], source: Dict[str, Any] = None,
+             root: str = None) -> "pd.DataFrame":
+        """
+        Attach to the snapshot ``digest``, publishing it from ``build()`` first
+        if no process has yet. The caller owns one reference (see ``release``).
+        """
+        root = root or default_snapshot_root()
+        df = read_snapshot(digest, root)
+        if df is None:
+            built = None
+            try:
+                with _publish_lock(root, digest):
+                    df = read_snapshot(digest, root)
+                    if df is None:
+                        built = build()
+                        write_snapshot(built, digest, root, source=source)
+                        df = read_snapshot(digest, root)
+            except OSError as e:
+                # snapshots are an optimisation; a read-only media dir must not break queries
+                logger.warning("could not publish snapshot %s: %s", digest[:12], e)
+                return built if built is not None else build()
+            self.retain(digest, root)
+            # a new version of a source supersedes its old snapshot
+            self.collect(root)
+            return df
+        self.retain(digest, root)
+        return df
+
+    def retain(self, digest: str, root: str = None) -> None:
+        path = snapshot_dir(digest, root)
+        with self._lock:
+            held = self._held.setdefault(digest, [path, 0])
+            held[1] += 1
+            if held[1] == 1:
+                try:
+                    os.makedirs(os.path.join(path, REFS_DIR), exist_ok=True)
+                    open(os.path.join(path, REFS_DIR, _ref_name()), "w").close()
+                except OSError:
+                    pass
+
+    def release(self, digest: str) -> None:
+        """Drop one reference; the last one removes this process's ref file and collects the snapshot if stale."""
+        with self._lock:
+            held = self._held.get(digest)
+            if held is None:
+                return
+            held[1] -= 1
+            if held[1] > 0:
+                return
+            del self._held[digest]
+            path = held[0]
+            try:
+                os.remove(os.path.join(path, REFS_DIR, _ref_name()))
+            except OSError:
+                pass
+        self._collect_one(path)
+
+    def release_all(self) -> None:
+        for digest in list(self._held):
+            while digest in self._held:
+                self.release(digest)
+
+    def refcount(self, digest: str, root: str = None) -> int:
+        """Live processes (this one included) attached to a snapshot."""
+        return len(self._live_refs(snapshot_dir(digest, root)))
+
+    def _live_refs(self, path: str) -> List[str]:
+        refs = os.path.join(path, REFS_DIR)
+        try:
+            names = os.listdir(refs)
+        except OSError:
+            return []
+        live = []
+        for name in names:
+            if _ref_alive(name):
+                live.append(name)
+            else:
+                try:
+                    os.remove(os.path.join(refs, name))
+                except OSError:
+                    pass
+        return live
+
+    @staticmethod
+    def is_stale(path: str) -> bool:
+        """True when the snapshot's source file is gone or no longer matches what was snapshotted."""
+        try:
+            with open(os.path.join(path, MANIFEST_NAME)) as fh:
+                source = json.load(fh).get("source") or {}
+        except (OSError, ValueError):
+            return False
+        src = source.get("path")
+        if not src:
+            return False
+        try:
+            st = os.stat(src)
+        except OSError:
+            return True
+        if "mtime_ns" not in source:
+            return False
+        return (st.st_mtime_ns, st.st_size) != (source["mtime_ns"], source.get("size"))
+
+    def _collect_one(self, path: str) -> bool:
+        if not os.path.isdir(path) or not self.is_stale(path) or self._live_refs(path):
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info("removed replaced snapshot %s", path)
+        return True
+
+    def collect(self, root: str = None) -> List[str]:
+        """Delete every stale snapshot under ``root`` that no live process references."""
+        root = root or default_snapshot_root()
+        try:
+            names = os.listdir(root)
+        except OSError:
+            return []
+        removed = []
+        for name in names:
+            path = os.path.join(root, name)
+            if not name.startswith(".") and self._collect_one(path):
+                removed.append(path)
+        return removed
+
+
+_shared_store: Optional[SharedDatasetStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_shared_store() -> SharedDatasetStore:
+    """Return the process-wide store; its references are dropped at interpreter exit."""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = SharedDatasetStore()
+                atexit.register(_shared_store.release_all)
+    return _shared_store
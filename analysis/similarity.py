@@ -0,0 +1,107 @@
+# analysis/similarity.py
+"""
+"Areas that behave like X": nearest neighbours of an area's price and demand
+trajectories.
+
+Every area's yearly price and demand series (the ones ``chart_data_for_area``
+plots) is z-scored over the years it has data, missing years count as
+average (0), and the two blocks are concatenated and scaled to unit length.
+The dot product of two such vectors is a cosine similarity that behaves like
+a correlation of the trajectories: level differences do not matter, shape
+does. The vectors of all areas form one float32 matrix, built once per
+dataset, so a lookup is a single matrix-vector product plus a partial sort.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import AreaYearMatrix
+from .metrics import timed
+from .ranking import top_n
+
+# neighbours returned with a single-area response (ANALYSIS_SIMILAR_AREAS overrides)
+DEFAULT_SIMILAR_AREAS = 5
+
+
+def _zscores(series: np.ndarray) -> np.ndarray:
+    """Row-wise z-scores over the non-NaN entries, NaN -> 0; rows with < 2 values or no variance are all 0."""
+    valid = ~np.isnan(series)
+    count = valid.sum(axis=1, keepdims=True)
+    filled = np.where(valid, series, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = filled.sum(axis=1, keepdims=True) / count
+        centered = np.where(valid, series - mean, 0.0)
+        std = np.sqrt((centered ** 2).sum(axis=1, keepdims=True) / count)
+        z = np.where((count >= 2) & (std > 0), centered / std, 0.0)
+    return np.nan_to_num(z)
+
+
+def trajectory_vectors(price: np.ndarray, demand: np.ndarray) -> np.ndarray:
+    """Unit-length trajectory vectors for rows of per-year price / demand (NaN = no data); zero rows stay 0."""
+    z = np.hstack([_zscores(price), _zscores(demand)])
+    norm = np.linalg.norm(z, axis=1, keepdims=True)
+    return np.divide(z, norm, out=np.zeros_like(z), where=norm > 0)
+
+
+class AreaSimilarity:
+    """Trajectory vectors of every area of a dataset (see module docstring)."""
+
+    def __init__(self, matrix: AreaYearMatrix):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            demand = np.where(matrix.demand_count > 0, matrix.demand_sum / np.maximum(matrix.demand_count, 1), np.nan)
+        self.years = matrix.years
+        self.labels = matrix.labels
+        self.vectors = trajectory_vectors(matrix.price, demand).astype(np.float32)
+        # areas that can be recommended: a name and some trajectory to compare
+        self.usable = matrix.labelled & self.vectors.any(axis=1)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.vectors.nbytes + self.usable.nbytes)
+
+    def vector(self, yearly: pd.DataFrame) -> np.ndarray:
+        """The trajectory vector of a ``chart``-style yearly frame (``price`` / ``demand`` per year)."""
+        price = np.full((1, len(self.years)), np.nan)
+        demand = np.full((1, len(self.years)), np.nan)
+        cols = np.searchsorted(self.years, np.asarray(yearly.index, dtype=np.int64))
+        price[0, cols] = yearly["price"].to_numpy(dtype=float)
+        demand[0, cols] = yearly["demand"].to_numpy(dtype=float)
+        return trajectory_vectors(price, demand)[0].astype(np.float32)
+
+    def nearest(self, target: np.ndarray, k: int, exclude: np.ndarray = None) -> List[Dict[str, Any]]:
+        """Top ``k`` usable areas by cosine similarity to ``target``, skipping the ids in ``exclude``."""
+        if not target.any() or k <= 0:
+            return []
+        scores = (self.vectors @ target).astype(np.float64)
+        usable = self.usable.copy()
+        if exclude is not None and len(exclude):
+            usable[exclude] = False
+        scores[~usable] = np.nan
+        return [
+            {"area": self.labels[i], "score": round(float(scores[i]), 3)}
+            for i in top_n(scores, k, descending=True)
+        ]
+
+
+@timed("similar")
+def similar_areas(df: pd.DataFrame, area: str, k: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    The ``k`` areas whose trajectories are closest to ``area``'s (all rows
+    matching it, merged like the chart). None for frames that are not a
+    cached dataset: similarity needs every area of the dataset.
+    """
+    from django.conf import settings
+
+    from .utils import area_cube_for, area_index_for, area_similarity_for, normalize_area_text
+
+    if k is None:
+        k = getattr(settings, 'ANALYSIS_SIMILAR_AREAS', DEFAULT_SIMILAR_AREAS)
+    similarity = area_similarity_for(df)
+    if similarity is None or not k:
+        return None
+    ids = area_index_for(df).match(normalize_area_text(area))
+    yearly = area_cube_for(df).yearly(ids)
+    if yearly.empty:
+        return []
+    return similarity.nearest(similarity.vector(yearly), k, exclude=ids)
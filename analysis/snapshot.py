@@ -0,0 +1,185 @@
+# analysis/snapshot.py
+"""
+Columnar snapshots of normalized datasets.
+
+A snapshot is a directory holding one NumPy ``.npy`` file per column plus a
+``manifest.json`` describing the schema. It is written once per source file
+(keyed by the file's content hash) and read back with ``mmap_mode='r'``, so
+numeric columns are paged in from disk on demand instead of being re-parsed
+from xlsx/csv.
+
+Column kinds:
+  - ``numeric``:  plain NumPy values
+  - ``masked``:   pandas nullable extension arrays (Int64, Float64, boolean),
+                  stored as values + mask
+  - ``datetime``: datetime64 values stored as int64 ticks
+  - ``string``:   dictionary-encoded: int32 codes (-1 = missing) + categories;
+                  categorical columns keep their own codes and stay categorical
+                  (zero-copy: only plain text columns are materialized per process)
+"""
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 3: measures stored as text are no longer coerced to numbers
+SNAPSHOT_VERSION = 3
+MANIFEST_NAME = "manifest.json"
+
+
+def default_snapshot_root() -> str:
+    """Return ``settings.ANALYSIS_SNAPSHOT_DIR`` (or ``<MEDIA_ROOT>/snapshots``)."""
+    from django.conf import settings
+
+    root = getattr(settings, "ANALYSIS_SNAPSHOT_DIR", None)
+    if root:
+        return str(root)
+    media = getattr(settings, "MEDIA_ROOT", None) or os.path.join(settings.BASE_DIR, "uploaded_files")
+    return os.path.join(str(media), "snapshots")
+
+
+def snapshot_dir(digest: str, root: str = None) -> str:
+    return os.path.join(root or default_snapshot_root(), digest)
+
+
+def has_snapshot(digest: str, root: str = None) -> bool:
+    return os.path.exists(os.path.join(snapshot_dir(digest, root), MANIFEST_NAME))
+
+
+# --------------------
+# Writing
+# --------------------
+def _encode_column(s: pd.Series, stem: str, dest: str) -> Dict[str, Any]:
+    """Write one column under ``dest`` and return its manifest entry."""
+    meta: Dict[str, Any] = {"name": s.name}
+    dtype = s.dtype
+
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype) and hasattr(s.array, "_mask"):
+        meta.update(kind="masked", dtype=str(dtype), values=f"{stem}.values.npy", mask=f"{stem}.mask.npy")
+        np.save(os.path.join(dest, meta["values"]), np.asarray(s.array._data))
+        np.save(os.path.join(dest, meta["mask"]), np.asarray(s.array._mask))
+        return meta
+
+    if pd.api.types.is_datetime64_dtype(dtype):
+        meta.update(kind="datetime", dtype=str(dtype), values=f"{stem}.values.npy")
+        np.save(os.path.join(dest, meta["values"]), s.to_numpy().view("int64"))
+        return meta
+
+    if pd.api.types.is_numeric_dtype(dtype) and not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        meta.update(kind="numeric", dtype=str(dtype), values=f"{stem}.values.npy")
+        np.save(os.path.join(dest, meta["values"]), s.to_numpy())
+        return meta
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = np.asarray([str(c) for c in dtype.categories], dtype=str) if len(dtype.categories) else np.array([], dtype="U1")
+        meta.update(kind="string", dtype="category", codes=f"{stem}.codes.npy", categories=f"{stem}.categories.npy")
+        # pandas' own code width (int8/int16/...), so readers can wrap the mapped codes without a copy
+        np.save(os.path.join(dest, meta["codes"]), s.cat.codes.to_numpy())
+        np.save(os.path.join(dest, meta["categories"]), categories)
+        return meta
+
+    # everything else (str / object) is dictionary-encoded as text
+    notna = s.notna().to_numpy()
+    text = s.astype(object).where(notna, None)
+    codes, uniques = pd.factorize(text.to_numpy(), use_na_sentinel=True)
+    categories = np.asarray([str(u) for u in uniques], dtype=str) if len(uniques) else np.array([], dtype="U1")
+    meta.update(kind="string", dtype=str(dtype), codes=f"{stem}.codes.npy", categories=f"{stem}.categories.npy")
+    np.save(os.path.join(dest, meta["codes"]), codes.astype(np.int32))
+    np.save(os.path.join(dest, meta["categories"]), categories)
+    return meta
+
+
+def write_snapshot(df: pd.DataFrame, digest: str, root: str = None, source: Dict[str, Any] = None) -> str:
+    """
+    Write ``df`` as a columnar snapshot for the source with content hash ``digest``.
+
+    The snapshot is assembled in a temporary directory and renamed into place,
+    so readers never observe a half-written snapshot. Returns the snapshot dir.
+    """
+    final = snapshot_dir(digest, root)
+    if read_manifest(digest, root) is not None:
+        return final
+    if os.path.exists(final):
+        # written by an older snapshot version: replace it
+        shutil.rmtree(final, ignore_errors=True)
+    parent = os.path.dirname(final)
+    os.makedirs(parent, exist_ok=True)
+
+    tmp = tempfile.mkdtemp(prefix=f".{digest[:12]}-", dir=parent)
+    try:
+        columns: List[Dict[str, Any]] = []
+        for i, col in enumerate(df.columns):
+            columns.append(_encode_column(df[col].reset_index(drop=True), f"{i:04d}", tmp))
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "digest": digest,
+            "rows": int(len(df)),
+            "columns": columns,
+            "source": source or {},
+        }
+        with open(os.path.join(tmp, MANIFEST_NAME), "w") as fh:
+            json.dump(manifest, fh, indent=1)
+        try:
+            os.rename(tmp, final)
+        except OSError:
+            # another process published the same snapshot first
+            if read_manifest(digest, root) is None:
+                raise
+            shutil.rmtree(tmp, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return final
+
+
+# --------------------
+# Reading
+# --------------------
+def _decode_column(meta: Dict[str, Any], src: str) -> Any:
+    kind = meta["kind"]
+    if kind == "numeric":
+        return np.load(os.path.join(src, meta["values"]), mmap_mode="r")
+    if kind == "masked":
+        values = np.load(os.path.join(src, meta["values"]), mmap_mode="r")
+        mask = np.load(os.path.join(src, meta["mask"]), mmap_mode="r")
+        dtype = pd.api.types.pandas_dtype(meta["dtype"])
+        return dtype.construct_array_type()(values, mask)
+    if kind == "datetime":
+        values = np.load(os.path.join(src, meta["values"]), mmap_mode="r")
+        return values.view(meta["dtype"])
+    codes = np.load(os.path.join(src, meta["codes"]), mmap_mode="r")
+    categories = np.load(os.path.join(src, meta["categories"]))
+    if meta["dtype"] == "category":
+        dtype = pd.CategoricalDtype(pd.Index(categories.astype(object)))
+        return pd.Categorical.from_codes(np.asarray(codes), dtype=dtype, validate=False)
+    # string: materialize the text values (codes/categories stay small)
+    values = np.empty(len(codes), dtype=object)
+    valid = codes >= 0
+    values[valid] = categories.astype(object)[codes[valid]]
+    values[~valid] = np.nan
+    return pd.array(values, dtype=meta["dtype"]) if meta["dtype"] != "object" else values
+
+
+def read_manifest(digest: str, root: str = None) -> Optional[Dict[str, Any]]:
+    path = os.path.join(snapshot_dir(digest, root), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        manifest = json.load(fh)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        return None
+    return manifest
+
+
+def read_snapshot(digest: str, root: str = None) -> Optional[pd.DataFrame]:
+    """Open a snapshot memory-mapped; returns None if there is no usable snapshot."""
+    manifest = read_manifest(digest, root)
+    if manifest is None:
+        return None
+    src = snapshot_dir(digest, root)
+    data = {meta["name"]: _decode_column(meta, src) for meta in manifest["columns"]}
+    return pd.DataFrame(data, columns=[m["name"] for m in manifest["columns"]], copy=False)
@@ -0,0 +1,236 @@
+# analysis/streaming.py
+"""
+Streaming loader for large csv/xlsx sources, with projection and predicate
+pushdown.
+
+The normalized schema is resolved from the header row alone (same column
+normalization and area/year candidates as ``normalize_dataset``), so only the
+columns a query needs are parsed: area, year, the price/demand measures and
+any requested table columns. CSV files are read in chunks and xlsx sheets
+row by row through openpyxl's read-only mode. Each chunk is normalized and
+only rows whose area matches one of the query's areas are kept, so peak
+memory is one chunk plus the matching rows, not the whole file.
+
+Opt in with ``ANALYSIS_STREAMING_MIN_BYTES``: query requests for files at
+least that large which are neither cached in this process nor snapshotted
+are answered by scanning (``streamed_dataset``). Everything else loads the
+whole frame through ``get_dataset`` as before.
+"""
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .cache import get_dataset_cache, stat_digest
+from .index import AreaIndex
+from .metrics import timed
+from .resolver import build_area_resolver
+from .snapshot import has_snapshot
+from .utils import DatasetSchema, normalize_area_text, normalize_dataset, resolve_areas_with
+
+# rows parsed per chunk
+DEFAULT_CHUNK_ROWS = 50_000
+STREAMING_EXTENSIONS = (".csv", ".xlsx")
+
+
+# --------------------
+# Header and projection
+# --------------------
+def _excel_cell(value):
+    """A cell value as ``pd.read_excel`` (openpyxl engine) hands it to the parser."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def read_header(path: str) -> List[str]:
+    """Column names of a csv/xlsx file exactly as pandas names them (``Unnamed: 3``, ``rate.1``)."""
+    if str(path).lower().endswith(".csv"):
+        return [str(c) for c in pd.read_csv(path, nrows=0).columns]
+    from openpyxl import load_workbook
+    from pandas.io.parsers import TextParser
+
+    book = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        first = next(book.worksheets[0].iter_rows(values_only=True), None)
+    finally:
+        book.close()
+    if first is None:
+        return []
+    row = [_excel_cell(v) for v in first]
+    while row and row[-1] == "":
+        row.pop()
+    return [str(c) for c in TextParser([row], header=0).read().columns]
+
+
+def normalized_names(header: List[str]) -> Dict[str, str]:
+    """Original column name -> column name in the normalized frame ('area', 'year', ...)."""
+    # normalize_dataset renames in place and only appends columns, so positions line up
+    normalized = normalize_dataset(pd.DataFrame(columns=header))
+    return dict(zip(header, normalized.columns[:len(header)]))
+
+
+def projection(header: List[str], columns: Optional[List[str]] = None) -> List[int]:
+    """
+    Positions of the header columns to read: area, year and the schema's
+    measure columns, plus the normalized ``columns`` (None: every column).
+    """
+    if columns is None:
+        return list(range(len(header)))
+    names = normalized_names(header)
+    schema = DatasetSchema.detect(pd.DataFrame(columns=list(names.values())))
+    wanted = {"area", "year"} | set(schema.measure_cols) | set(columns)
+    return [i for i, c in enumerate(header) if names[c] in wanted]
+
+
+# --------------------
+# Chunked readers
+# --------------------
+def _csv_chunks(path: str, usecols: List[int], chunksize: int) -> Iterator[pd.DataFrame]:
+    with pd.read_csv(path, usecols=usecols, chunksize=chunksize) as reader:
+        yield from reader
+
+
+def _xlsx_chunks(path: str, usecols: List[int], names: List[str], chunksize: int) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+    from pandas.io.parsers import TextParser
+
+    book = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        rows = book.worksheets[0].iter_rows(values_only=True)
+        next(rows, None)  # header
+        batch: List[list] = []
+        for row in rows:
+            # pandas drops rows that are empty across the whole sheet, not just the projection
+            if all(v is None for v in row):
+                continue
+            batch.append([_excel_cell(row[i]) if i < len(row) else "" for i in usecols])
+            if len(batch) >= chunksize:
+                yield TextParser([names] + batch, header=0, skip_blank_lines=False).read()
+                batch = []
+        if batch:
+            yield TextParser([names] + batch, header=0, skip_blank_lines=False).read()
+    finally:
+        book.close()
+
+
+def iter_raw_chunks(path: str, usecols: List[int], header: List[str] = None,
+                    chunksize: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """The ``usecols`` columns of a csv/xlsx file in frames of at most ``chunksize`` rows (original names)."""
+    if str(path).lower().endswith(".csv"):
+        return _csv_chunks(path, usecols, chunksize)
+    header = header if header is not None else read_header(path)
+    return _xlsx_chunks(path, usecols, [header[i] for i in usecols], chunksize)
+
+
+# --------------------
+# Scans
+# --------------------
+def _matching(chunk: pd.DataFrame, needles: List[str]) -> pd.Series:
+    """Rows whose normalized area contains any needle (the ``AreaIndex.match`` rule)."""
+    norm = chunk["_area_norm"]
+    mask = pd.Series(False, index=chunk.index)
+    for needle in needles:
+        mask |= norm.str.contains(needle, regex=False, na=False)
+    return mask
+
+
+def _empty_frame(header: List[str], usecols: List[int]) -> pd.DataFrame:
+    return normalize_dataset(pd.DataFrame(columns=[header[i] for i in usecols]))
+
+
+def scan_dataset(path: str, areas: Optional[Iterable[str]] = None, columns: Optional[List[str]] = None,
+                 chunksize: int = DEFAULT_CHUNK_ROWS, vocabulary: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Normalized frame of the rows of ``path`` matching ``areas`` (None: every row).
+
+    ``columns`` are the normalized columns to keep besides the ones the
+    analytics read (None: all). Dtypes are those a whole-file read would
+    infer, so the frame renders like the matching rows of ``load_dataset``.
+    When given, ``vocabulary`` is filled with every normalized area of the
+    file in order of first appearance (the area index's vocabulary).
+    """
+    header = read_header(path)
+    usecols = projection(header, columns)
+    needles = None if areas is None else [normalize_area_text(a) for a in areas]
+    if needles == [] and vocabulary is None:
+        return _empty_frame(header, usecols)
+    seen: Dict[str, None] = {}
+    # zero-row slices of every chunk: concatenated, they carry the whole file's dtypes
+    template: Optional[pd.DataFrame] = None
+    kept: List[pd.DataFrame] = []
+    with timed("scan"):
+        for raw in iter_raw_chunks(path, usecols, header, chunksize):
+            chunk = normalize_dataset(raw)
+            template = chunk.iloc[:0] if template is None else pd.concat([template, chunk.iloc[:0]])
+            if vocabulary is not None:
+                seen.update(dict.fromkeys(chunk["_area_norm"].unique().tolist()))
+            if needles is not None:
+                chunk = chunk[_matching(chunk, needles)]
+            if len(chunk):
+                kept.append(chunk)
+    if vocabulary is not None:
+        vocabulary[:] = list(seen)
+    if template is None:
+        return _empty_frame(header, usecols)
+    return pd.concat([template] + kept, ignore_index=True)
+
+
+class StreamedDataset:
+    """
+    A large dataset file that is queried by scanning instead of loading it
+    whole. ``columns`` are the normalized frame's columns; ``digest`` is the
+    content hash (the response cache key, as for cached datasets).
+    """
+
+    def __init__(self, path: str, digest: str, columns: List[str]):
+        self.path = path
+        self.digest = digest
+        self.columns = columns
+
+    def query_frame(self, parsed: Dict, columns: Optional[List[str]] = None,
+                    chunksize: int = DEFAULT_CHUNK_ROWS) -> Tuple[pd.DataFrame, Dict, Optional[List[Dict]]]:
+        """
+        Rows for a parsed query, with its areas resolved like ``resolve_query_areas``.
+
+        Returns ``(frame, parsed, resolutions)``. The first pass keeps the rows
+        of the areas as typed and collects the area vocabulary; only when a
+        misspelled area is mapped onto another one is the file scanned again.
+        """
+        if parsed.get("intent") == "rank":
+            # rankings read every row, but only the area, year and measure columns
+            return scan_dataset(self.path, None, [], chunksize), parsed, None
+        areas = parsed.get("areas") or []
+        if not areas:
+            return scan_dataset(self.path, [], columns, chunksize), parsed, None
+        vocabulary: List[str] = []
+        frame = scan_dataset(self.path, areas, columns, chunksize, vocabulary=vocabulary)
+        resolver = build_area_resolver(AreaIndex(pd.Series(vocabulary, dtype=object)))
+        resolved, resolutions = resolve_areas_with(resolver, parsed)
+        if [normalize_area_text(a) for a in resolved["areas"]] != [normalize_area_text(a) for a in areas]:
+            frame = scan_dataset(self.path, resolved["areas"], columns, chunksize)
+        return frame, resolved, resolutions
+
+
+def streamed_dataset(path: str) -> Optional[StreamedDataset]:
+    """
+    A ``StreamedDataset`` when the streaming mode applies to ``path``, else
+    None: the mode is off, the file is small or not csv/xlsx, or it is
+    already cached in this process or snapshotted (attaching is cheaper).
+    """
+    from django.conf import settings
+
+    min_bytes = getattr(settings, 'ANALYSIS_STREAMING_MIN_BYTES', None)
+    if not min_bytes or not str(path).lower().endswith(STREAMING_EXTENSIONS) or not os.path.isfile(path):
+        return None
+    if os.path.getsize(path) < min_bytes or get_dataset_cache().peek(path) is not None:
+        return None
+    # hashing reads the whole file: only once per version of it
+    digest = stat_digest(path)
+    if has_snapshot(digest):
+        return None
+    header = read_header(path)
+    columns = list(normalize_dataset(pd.DataFrame(columns=header)).columns)
+    return StreamedDataset(path, digest, columns)
@@ -0,0 +1,138 @@
+# analysis/synthetic.py
+"""
+Synthetic datasets shaped like ``datasets/realestate_data.xlsx``.
+
+Same source column headers (so they go through the normal normalization),
+Pune-style locality names, one row per (area, year) draw with per-area
+price levels and growth, plus a sprinkling of missing values. Used by the
+benchmark suite; scales from thousands to millions of rows.
+"""
+import os
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# column headers of the sample workbook, in order
+SOURCE_COLUMNS = [
+    "final location", "year", "city", "loc_lat", "loc_lng",
+    "total_sales - igr", "total sold - igr", "flat_sold - igr", "office_sold - igr",
+    "others_sold - igr", "shop_sold - igr", "commercial_sold - igr", "other_sold - igr",
+    "residential_sold - igr",
+    "flat - weighted average rate", "office - weighted average rate",
+    "others - weighted average rate", "shop - weighted average rate",
+    "flat - most prevailing rate - range", "office - most prevailing rate - range",
+    "others - most prevailing rate - range", "shop - most prevailing rate - range",
+    "total units", "total carpet area supplied (sqft)",
+    "flat total", "shop total", "office total", "others total",
+]
+
+_LOCALITIES = [
+    "Akurdi", "Ambegaon", "Aundh", "Balewadi", "Baner", "Bavdhan", "Bhosari", "Bibwewadi",
+    "Chakan", "Charholi", "Chikhali", "Chinchwad", "Dhanori", "Dhayari", "Hadapsar", "Hinjewadi",
+    "Kalyani Nagar", "Karve Nagar", "Katraj", "Kharadi", "Kondhwa", "Koregaon Park", "Lohegaon",
+    "Magarpatta", "Mahalunge", "Moshi", "Mundhwa", "Narhe", "Pashan", "Pimple Gurav",
+    "Pimple Saudagar", "Pimpri", "Punawale", "Ravet", "Sus", "Tathawade", "Thergaon", "Undri",
+    "Viman Nagar", "Wagholi", "Wakad", "Wanowrie", "Warje", "Yerwada",
+]
+_SUFFIXES = ["", " Budruk", " Khurd", " Gaon", " Road", " Annex", " East", " West", " Phase 2", " Phase 3"]
+
+# rate columns: (header, typical level relative to flats)
+_RATE_COLUMNS = [
+    ("flat - weighted average rate", 1.0),
+    ("office - weighted average rate", 1.45),
+    ("others - weighted average rate", 1.2),
+    ("shop - weighted average rate", 1.6),
+]
+
+
+def area_names(n: int) -> List[str]:
+    """``n`` distinct Pune-style locality names ("Wakad", "Ambegaon Budruk", "Baner Road 12", ...)."""
+    names = [loc + suffix for suffix in _SUFFIXES for loc in _LOCALITIES]
+    if n <= len(names):
+        return names[:n]
+    out = list(names)
+    k = 2
+    while len(out) < n:
+        out.extend(f"{name} {k}" for name in names[: n - len(out)])
+        k += 1
+    return out
+
+
+def generate_dataset(rows: int, areas: int, years: Tuple[int, int] = (2015, 2024), seed: int = 0,
+                     missing: float = 0.02) -> pd.DataFrame:
+    """
+    A frame with the sample workbook's columns: ``rows`` rows spread over
+    ``areas`` localities and the inclusive ``years`` range.
+
+    ``missing`` is the share of blank cells in the rate and sold columns.
+    """
+    rng = np.random.default_rng(seed)
+    names = np.asarray(area_names(areas), dtype=object)
+    n_years = years[1] - years[0] + 1
+
+    area = rng.integers(0, areas, rows)
+    year = years[0] + rng.integers(0, n_years, rows)
+    t = (year - years[0]).astype(float)
+
+    base_rate = rng.uniform(4500, 12000, areas)[area]
+    growth = rng.uniform(0.0, 0.09, areas)[area]
+    demand_level = rng.lognormal(6.5, 0.6, areas)[area]
+
+    def noisy(level, spread):
+        return level * rng.normal(1.0, spread, rows)
+
+    flat_rate = noisy(base_rate * (1 + growth) ** t, 0.06)
+    sold = np.maximum(noisy(demand_level, 0.25), 1).round().astype(np.int64)
+    flat_sold = (sold * rng.uniform(0.7, 0.9, rows)).astype(np.int64)
+    office_sold = (sold * rng.uniform(0.02, 0.08, rows)).astype(np.int64)
+    shop_sold = (sold * rng.uniform(0.02, 0.1, rows)).astype(np.int64)
+    others_sold = np.maximum(sold - flat_sold - office_sold - shop_sold, 0)
+    units = np.maximum(noisy(demand_level * 0.9, 0.35), 1).round().astype(np.int64)
+    flat_units = (units * rng.uniform(0.8, 0.98, rows)).astype(np.int64)
+    shop_units = (units - flat_units) // 2
+
+    data = {
+        "final location": names[area],
+        "year": year,
+        "city": np.full(rows, "Pune", dtype=object),
+        "loc_lat": rng.uniform(18.40, 18.70, areas)[area],
+        "loc_lng": rng.uniform(73.70, 74.00, areas)[area],
+        "total_sales - igr": (sold * flat_rate * rng.uniform(800, 1200, rows)).round(2),
+        "total sold - igr": sold,
+        "flat_sold - igr": flat_sold,
+        "office_sold - igr": office_sold,
+        "others_sold - igr": others_sold,
+        "shop_sold - igr": shop_sold,
+        "commercial_sold - igr": office_sold + shop_sold,
+        "other_sold - igr": rng.integers(0, 30, rows).astype(float),
+        "residential_sold - igr": flat_sold + others_sold // 2,
+    }
+    for header, level in _RATE_COLUMNS:
+        data[header] = flat_rate * level * rng.normal(1.0, 0.05, rows)
+    for header, level in _RATE_COLUMNS:
+        low = (flat_rate * level * 1.1).astype(np.int64)
+        data[header.replace("weighted average rate", "most prevailing rate - range")] = (
+            pd.Series(low).astype(str) + "-" + pd.Series((low * 1.1).astype(np.int64)).astype(str)
+        ).to_numpy(dtype=object)
+    data.update({
+        "total units": units,
+        "total carpet area supplied (sqft)": (units * rng.uniform(550, 900, rows)).round(5),
+        "flat total": flat_units,
+        "shop total": shop_units,
+        "office total": units - flat_units - shop_units,
+        "others total": rng.integers(0, 3, rows),
+    })
+    df = pd.DataFrame(data, columns=SOURCE_COLUMNS)
+
+    if missing:
+        for header in [h for h, _ in _RATE_COLUMNS] + ["other_sold - igr"]:
+            df.loc[rng.random(rows) < missing, header] = np.nan
+    return df
+
+
+def write_dataset(df: pd.DataFrame, path: str) -> str:
+    """Write a generated frame as csv (xlsx caps out at ~1M rows); returns ``path``."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    df.to_csv(path, index=False)
+    return path
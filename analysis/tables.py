@@ -0,0 +1,119 @@
+# analysis/tables.py
+import base64
+import binascii
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+TABLE_FORMATS = ("records", "columnar")
+
+
+class TableOptions:
+    """
+    Pagination / projection / encoding options for the table part of a response.
+
+    - ``columns``: keep only these columns (in this order); None = all
+    - ``cursor``:  opaque position returned as ``next_cursor`` by a previous page
+    - ``limit``:   rows per page (defaults to the endpoint's usual table size)
+    - ``format``:  ``records`` (list of row objects, missing values as '') or
+                   ``columnar`` (column names once + one array per column, missing as null)
+    """
+
+    def __init__(self, columns: Optional[List[str]] = None, offset: int = 0,
+                 limit: Optional[int] = None, fmt: str = "records"):
+        self.columns = columns
+        self.offset = offset
+        self.limit = limit
+        self.format = fmt
+
+    @classmethod
+    def from_data(cls, data: Optional[Dict[str, Any]], max_limit: int) -> "TableOptions":
+        """Build options from a request dict; raises ValueError on bad input."""
+        data = data or {}
+        columns = data.get("columns")
+        if isinstance(columns, str):
+            columns = [c.strip() for c in columns.split(",") if c.strip()]
+        if columns is not None and (not isinstance(columns, list) or not all(isinstance(c, str) for c in columns)):
+            raise ValueError("'columns' must be a list of column names.")
+
+        limit = data.get("limit")
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                raise ValueError("'limit' must be an integer.")
+            if not 1 <= limit <= max_limit:
+                raise ValueError(f"'limit' must be between 1 and {max_limit}.")
+
+        fmt = data.get("format") or "records"
+        if fmt not in TABLE_FORMATS:
+            raise ValueError(f"'format' must be one of {', '.join(TABLE_FORMATS)}.")
+
+        offset = decode_cursor(data["cursor"]) if data.get("cursor") else 0
+        return cls(columns or None, offset, limit, fmt)
+
+    def cache_key(self) -> Dict[str, Any]:
+        return {"columns": self.columns, "offset": self.offset, "limit": self.limit, "format": self.format}
+
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(f"o:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(str(cursor) + "=" * (-len(str(cursor)) % 4)).decode()
+        kind, _, value = raw.partition(":")
+        offset = int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid table cursor.")
+    if kind != "o" or offset < 0:
+        raise ValueError("Invalid table cursor.")
+    return offset
+
+
+def column_values(s: pd.Series, missing: Any) -> List[Any]:
+    """Native Python values of a column with missing entries replaced by ``missing``."""
+    values = s.tolist()
+    mask = s.isna().to_numpy()
+    if mask.any():
+        for i in np.flatnonzero(mask):
+            values[i] = missing
+    return values
+
+
+def encode_table(page: pd.DataFrame, fmt: str = "records") -> Any:
+    """
+    Serialize a page of rows column by column (no per-cell pandas boxing).
+
+    ``records`` matches ``page.fillna('').to_dict(orient='records')``;
+    ``columnar`` is ``{"columns": [...], "data": [[...], ...]}`` with null for missing.
+    """
+    names = [str(c) for c in page.columns]
+    if fmt == "columnar":
+        return {"columns": names, "data": [column_values(page[c], None) for c in page.columns]}
+    cols = [column_values(page[c], "") for c in page.columns]
+    return [dict(zip(names, row)) for row in zip(*cols)]
+
+
+def table_page(df: pd.DataFrame, rows: np.ndarray, options: TableOptions, default_limit: int):
+    """
+    Slice the matched ``rows`` (positions into ``df``) to one page and encode it.
+
+    Returns ``(table, page_info)``; only the page's rows and projected columns
+    are materialized.
+    """
+    limit = options.limit or default_limit
+    start = min(options.offset, len(rows))
+    stop = min(start + limit, len(rows))
+    page = df.iloc[rows[start:stop]]
+    if options.columns is not None:
+        page = page[options.columns]
+    info = {
+        "total_rows": int(len(rows)),
+        "offset": start,
+        "limit": limit,
+        "next_cursor": encode_cursor(stop) if stop < len(rows) else None,
+    }
+    return encode_table(page, options.format), info
@@ -1,4 +1,1166 @@
-from django.test import TestCase
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
-# Add tests later as needed.
+from analysis import cache as analysis_cache
+from analysis.admission import AdmissionGate, get_admission_gate
+from analysis.appends import find_dataset
+from analysis.benchmarks import compare_to_baseline, run_case
+from analysis.cache import DatasetCache, DjangoResponseCache, derived_for, get_dataset_cache, get_response_cache
+from analysis.executor import BoundedExecutor, Saturated
+from analysis.index import AreaIndex
+from analysis.jobs import IngestQueue, job_status_path
+from analysis.management.commands.bench_parser import legacy_parse_query_text, pathological_inputs
+from analysis.parser import MAX_QUERY_CHARS, SAMPLE_QUERIES
+from analysis.ranking import rank_areas
+from analysis.similarity import trajectory_vectors
+from analysis.resolver import AreaResolver
+from analysis.shared import REFS_DIR, _ref_name, get_shared_store
+from analysis.snapshot import snapshot_dir
+from analysis.streaming import scan_dataset, streamed_dataset
+from analysis.synthetic import area_names, generate_dataset
+from analysis.tables import TableOptions, decode_cursor, encode_cursor, encode_table, table_page
+from analysis.uploads import ContentAddressedUploadHandler, store_bytes
+from analysis.utils import (
+    area_matrix_for, area_rows, build_mock_summary, chart_data_for_area, compact_dataset, compare_areas,
+    detect_demand_column, detect_price_column, ensure_year_col, filter_by_area, get_dataset, load_dataset,
+    normalize_dataset, parse_query_text, read_raw_dataset, summary_for_area, SAMPLE_EXCEL_PATH,
+)
+from analysis.warmup import dataset_paths, should_warm_up, warm_up
+
+
+def _scan_filter(df, areas):
+    """Reference implementation: the original full-scan substring filter."""
+    mask = pd.Series(False, index=df.index)
+    for area in areas:
+        a = re.sub(r"\s+", " ", str(area).strip().lower())
+        mask = mask | df["_area_norm"].str.contains(re.escape(a), na=False)
+    return df[mask]
+
+
+class SnapshotTestCase(TestCase):
+    """Keeps the snapshots written by dataset loads in a temporary ANALYSIS_SNAPSHOT_DIR."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(ANALYSIS_SNAPSHOT_DIR=os.path.join(self.tmp.name, "snapshots"))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(get_dataset_cache().clear)
+
+
+class DatasetCacheTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.loads = []
+
+    def write(self, name, rows):
+        path = os.path.join(self.tmp.name, name)
+        pd.DataFrame({"area": [f"{name}-{i}" for i in range(rows)], "year": range(rows)}).to_csv(path, index=False)
+        return path
+
+    def loader(self, path, digest):
+        self.loads.append(path)
+        return pd.read_csv(path)
+
+    def test_lru_eviction_by_byte_budget_and_counters(self):
+        a, b, c = (self.write(n, 200) for n in ("a.csv", "b.csv", "c.csv"))
+        size = DatasetCache().get(a, self.loader).nbytes
+        cache = DatasetCache(max_bytes=int(size * 2.5))
+        released = []
+        cache.on_release = released.append
+        first = cache.get(a, self.loader)
+        cache.get(b, self.loader)
+        self.assertIs(cache.get(a, self.loader), first)  # hit, and a becomes most recent
+        cache.get(c, self.loader)  # over budget: b is the least recently used
+        self.assertEqual([e.fingerprint.path for e in released], [os.path.realpath(b)])
+        self.assertEqual(cache.stats(), {"entries": 2, "bytes": 2 * size, "max_bytes": int(size * 2.5),
+                                         "hits": 1, "misses": 3, "evictions": 1, "coalesced": 0})
+        cache.get(b, self.loader)  # evicted entries load again
+        self.assertEqual(cache.stats()["misses"], 4)
+        self.assertEqual(len(self.loads), 1 + 4)
+
+    def test_rehash_only_when_mtime_or_size_changes(self):
+        path = self.write("data.csv", 50)
+        cache = DatasetCache()
+        with mock.patch("analysis.cache.file_digest", wraps=analysis_cache.file_digest) as digest:
+            old = cache.get(path, self.loader)
+            self.assertIs(cache.get(path, self.loader), old)
+            self.assertEqual(digest.call_count, 1)
+
+            # same bytes, new mtime: re-hashed, but the entry is reused
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+            self.assertIs(cache.get(path, self.loader), old)
+            self.assertEqual(digest.call_count, 2)
+
+            # new content: re-hashed and re-loaded, the old entry is dropped
+            self.write("data.csv", 60)
+            new = cache.get(path, self.loader)
+            self.assertEqual(digest.call_count, 3)
+        self.assertIsNot(new, old)
+        self.assertEqual(len(new.df), 60)
+        self.assertEqual(len(self.loads), 2)
+        self.assertEqual(cache.stats()["entries"], 1)
+
+    def test_derived_structures_live_as_long_as_their_entry(self):
+        a, b = self.write("a.csv", 200), self.write("b.csv", 200)
+        size = DatasetCache().get(a, self.loader).nbytes
+        cache = DatasetCache(max_bytes=int(size * 1.5))
+        builds = []
+
+        def build(df):
+            builds.append(len(df))
+            return np.arange(100)
+
+        with mock.patch("analysis.cache.get_dataset_cache", return_value=cache):
+            df = cache.get(a, self.loader).df
+            index = derived_for(df, "index", build)
+            self.assertIs(derived_for(df, "index", build), index)
+            self.assertEqual(len(builds), 1)
+            self.assertEqual(cache.stats()["bytes"], size + index.nbytes)
+            self.assertIsNone(derived_for(pd.DataFrame(df), "index", build))  # not a cached frame
+
+            cache.get(b, self.loader)  # evicts a together with its derived structures
+            self.assertIsNone(cache.entry_for(df))
+            self.assertIsNone(derived_for(df, "index", build))
+            self.assertEqual(cache.stats()["bytes"], size)
+            self.assertEqual(len(builds), 1)
+
+
+class AreaIndexTests(TestCase):
+    def setUp(self):
+        names = ["wakad", "aundh", "aundh road", "baner", None, "ambegaon budruk", "wakad", "nan"]
+        self.df = pd.DataFrame({
+            "_area_norm": pd.Series(names * 3, dtype=object),
+            "v": np.arange(len(names) * 3),
+        })
+        self.index = AreaIndex(self.df["_area_norm"])
+
+    def test_matches_full_scan(self):
+        for areas in (["wakad"], ["aundh"], ["AUNDH  Road"], ["an"], ["a.d"], [""], ["zzz"], ["baner", "wakad"]):
+            expected = _scan_filter(self.df, areas)
+            rows = self.index.rows(re.sub(r"\s+", " ", a.strip().lower()) for a in areas)
+            got = self.df.iloc[rows]
+            self.assertEqual(got.index.tolist(), expected.index.tolist(), areas)
+
+
+def _legacy_chart_data_for_area(df, area, last_n_years=None):
+    """Reference implementation: chart_data_for_area before the single-groupby rewrite."""
+    df = ensure_year_col(df)
+    price_cols = detect_price_column(df)
+    demand_col = detect_demand_column(df)
+
+    df_area = filter_by_area(df, [area])
+    df_area = df_area[df_area["year"].notna()]
+    if df_area.empty:
+        return {"labels": [], "price": [], "demand": []}
+
+    def price_agg(group):
+        if not price_cols:
+            return np.nan
+        vals = [pd.to_numeric(group[pc], errors="coerce") for pc in price_cols if pc in group.columns]
+        if not vals:
+            return np.nan
+        return pd.concat(vals, axis=1).mean(axis=1).mean()
+
+    grouped = df_area.groupby("year").agg({demand_col: "mean"}).reset_index().sort_values("year")
+    price_series = []
+    for _, row in grouped.iterrows():
+        price_year = price_agg(df_area[df_area["year"] == row["year"]])
+        price_series.append(round(float(price_year), 2) if not pd.isna(price_year) else None)
+    demand_series = (
+        grouped[demand_col].astype(float).round(2).where(lambda s: ~s.isna(), other=None).tolist()
+    )
+
+    labels = grouped["year"].astype(str).tolist()
+    if last_n_years and labels:
+        cutoff = int(labels[-1]) - (last_n_years - 1)
+        keep = [i for i, y in enumerate(labels) if int(y) >= cutoff]
+        labels = [labels[i] for i in keep]
+        price_series = [price_series[i] for i in keep]
+        demand_series = [demand_series[i] for i in keep]
+    return {"labels": labels, "price": price_series, "demand": demand_series}
+
+
+def _synthetic_frame(seed=0, n=600):
+    rng = np.random.default_rng(seed)
+    areas = np.array(["wakad", "aundh", "aundh road", "baner", "pimple saudagar"])
+    df = pd.DataFrame({
+        "area": rng.choice(areas, n),
+        "year": rng.choice([2018, 2019, 2020, 2021, 2022, None], n),
+        "flat___weighted_average_rate": rng.normal(8000, 900, n),
+        "flat_office___weighted_average_rate": rng.normal(11000, 1500, n),
+        "total_sold___igr": rng.integers(0, 900, n).astype(float),
+    })
+    df.loc[rng.random(n) < 0.15, "flat___weighted_average_rate"] = np.nan
+    df.loc[rng.random(n) < 0.1, "total_sold___igr"] = np.nan
+    df["_area_norm"] = df["area"].str.lower()
+    return df
+
+
+class ChartDataDifferentialTests(SnapshotTestCase):
+    def assert_same_chart(self, df, area, last_n=None):
+        expected = _legacy_chart_data_for_area(df.copy(), area, last_n)
+        got = chart_data_for_area(df.copy(), area, last_n_years=last_n)
+        self.assertEqual(got, expected, (area, last_n))
+
+    def test_sample_dataset(self):
+        df = load_dataset()
+        for area in ("wakad", "aundh", "akurdi", "ambegaon budruk", "a", "nowhere"):
+            for last_n in (None, 1, 3, 10):
+                self.assert_same_chart(df, area, last_n)
+
+    def test_synthetic_multi_row_years(self):
+        for seed in range(5):
+            df = _synthetic_frame(seed)
+            for area in ("wakad", "aundh", "a", "pimple"):
+                for last_n in (None, 2):
+                    self.assert_same_chart(df, area, last_n)
+
+
+class AreaYearCubeTests(TestCase):
+    """Cube-backed answers for a cached dataset must match the row-scanning paths."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(ANALYSIS_SNAPSHOT_DIR=os.path.join(self.tmp.name, "snapshots"))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_cube_matches_raw_frame(self):
+        for seed in range(3):
+            raw = _synthetic_frame(seed)
+            path = os.path.join(self.tmp.name, f"synthetic_{seed}.csv")
+            raw.drop(columns=["_area_norm"]).to_csv(path, index=False)
+            cached = load_dataset(path)
+            adhoc = ensure_year_col(raw.copy())
+            # "aundh" also matches "aundh road": the cube must merge sums/counts, not means
+            for area in ("wakad", "aundh", "a", "pimple", "nowhere"):
+                for last_n in (None, 3):
+                    self.assertEqual(
+                        chart_data_for_area(cached, area, last_n_years=last_n),
+                        chart_data_for_area(adhoc.copy(), area, last_n_years=last_n),
+                    )
+                self.assertEqual(
+                    summary_for_area(cached, area),
+                    build_mock_summary(filter_by_area(adhoc.copy(), [area]), area),
+                )
+
+
+class CompareAreasTests(TestCase):
+    """The grouped N-way compare must equal computing each area on its own."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(ANALYSIS_SNAPSHOT_DIR=os.path.join(self.tmp.name, "snapshots"))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_parse_n_way_compare(self):
+        self.assertEqual(
+            parse_query_text("Compare Aundh, Wakad, Baner and Hinjewadi demand trends"),
+            {"intent": "compare", "areas": ["aundh", "wakad", "baner", "hinjewadi"]},
+        )
+        self.assertEqual(parse_query_text("Compare Aundh vs Wakad")["areas"], ["aundh", "wakad"])
+
+    def test_matches_per_area(self):
+        areas = ["wakad", "aundh", "aundh road", "a", "nowhere"]
+        raw = _synthetic_frame(1)
+        path = os.path.join(self.tmp.name, "synthetic.csv")
+        raw.drop(columns=["_area_norm"]).to_csv(path, index=False)
+        for df in (load_dataset(path), ensure_year_col(raw.copy())):
+            for last_n in (None, 2):
+                got = compare_areas(df, areas, last_n_years=last_n)
+                for area in areas:
+                    self.assertEqual(got[area]["chart"], chart_data_for_area(df, area, last_n_years=last_n))
+                    self.assertEqual(got[area]["summary"], summary_for_area(df, area))
+                    self.assertEqual(got[area]["rows"].tolist(), area_rows(df, [area]).tolist())
+
+
+class QueryParserTests(TestCase):
+    def test_sample_corpus_matches_legacy_parser(self):
+        for query in SAMPLE_QUERIES + ("What does the data say about Aundh?", "analyze a", ""):
+            self.assertEqual(parse_query_text(query), legacy_parse_query_text(query), query)
+
+    def test_random_token_soup_matches_legacy_parser(self):
+        rng = np.random.default_rng(0)
+        vocab = ["compare", "and", "vs.", "with", ",", "a,", "aundh", "wakad", "price", "growth", "for",
+                 "over", "in", "the", "last", "3", "years", "demand", "analyze", "analysis", "of", "?", "x!y"]
+        for _ in range(3000):
+            query = " ".join(rng.choice(vocab, rng.integers(0, 10)))
+            self.assertEqual(parse_query_text(query), legacy_parse_query_text(query), query)
+
+    def test_pathological_input_is_capped(self):
+        for text in pathological_inputs(200_000).values():
+            parsed = parse_query_text(text)
+            self.assertIn(parsed["intent"], ("compare", "growth", "analyze"))
+        self.assertEqual(parse_query_text("analyze " + "a" * (MAX_QUERY_CHARS * 2))["areas"],
+                         ["a" * (MAX_QUERY_CHARS - len("analyze "))])
+
+
+class AreaResolverTests(SnapshotTestCase):
+    def setUp(self):
+        super().setUp()
+        names = ["wakad", "aundh", "aundh road", "ambegaon budruk", "akurdi", "pimple saudagar", None]
+        self.index = AreaIndex(pd.Series(names * 2, dtype=object))
+        self.resolver = AreaResolver(self.index)
+
+    def test_substring_phrases_resolve_exactly(self):
+        for phrase in ("aundh", "a", "ud", "pimple s", "zzz"):
+            got = self.resolver.resolve(phrase)
+            self.assertEqual(got["match_count"], len(self.index.match(phrase)), phrase)
+            if got["match_count"]:
+                self.assertEqual((got["area"], got["method"], got["confidence"]), (phrase, "exact", 1.0))
+
+    def test_misspellings_map_to_closest_area(self):
+        for phrase, area in (("wakkad", "wakad"), ("ambegaon bk", "ambegaon budruk"), ("akrudi", "akurdi"),
+                             ("pimple saudgar", "pimple saudagar")):
+            got = self.resolver.resolve(phrase)
+            self.assertEqual((got["area"], got["method"]), (area, "fuzzy"), phrase)
+            self.assertTrue(0.6 <= got["confidence"] < 1.0)
+        self.assertEqual(self.resolver.resolve("hinjewadi")["method"], "none")
+
+    def test_query_reports_resolution(self):
+        response = self.client.post(
+            reverse("analysis-query"), {"query": "Analyze Wakkad"}, content_type="application/json",
+        )
+        data = response.json()
+        self.assertEqual(data["area"], "wakad")
+        self.assertEqual(data["resolution"][0]["query"], "wakkad")
+        self.assertEqual(data["resolution"][0]["method"], "fuzzy")
+
+
+class CompactDatasetTests(TestCase):
+    def test_compact_layout_keeps_values(self):
+        raw = _synthetic_frame(2, n=2000).drop(columns=["_area_norm"])
+        raw["total_units"] = np.arange(len(raw)) % 300
+        raw["units_text"] = (np.arange(len(raw)) % 7).astype(str)
+        df = normalize_dataset(raw)
+        compact, report = compact_dataset(df)
+
+        self.assertLess(report["bytes_after"], report["bytes_before"])
+        self.assertEqual(str(compact["_area_norm"].dtype), "category")
+        self.assertEqual(str(compact["year"].dtype), "Int16")
+        self.assertEqual(str(compact["total_units"].dtype), "int16")
+        # random rates do not survive float32, so they stay float64
+        self.assertEqual(compact["flat___weighted_average_rate"].dtype, np.float64)
+        for col in df.columns:
+            pd.testing.assert_series_equal(compact[col].astype(object), df[col].astype(object), check_dtype=False)
+
+
+    def test_text_measures_keep_their_values(self):
+        numeric = normalize_dataset(_synthetic_frame(4).drop(columns=["_area_norm"]))
+        text = numeric.copy()
+        text["total_sold___igr"] = [None if pd.isna(v) else f"{v:g}" for v in numeric["total_sold___igr"]]
+        compact, _ = compact_dataset(text)
+        # tables show the values as stored; the analytics still see numbers
+        rows = np.arange(len(text))
+        options = TableOptions()
+        self.assertEqual(table_page(compact, rows, options, len(rows)), table_page(text, rows, options, len(rows)))
+        self.assertIsInstance(table_page(compact, rows, options, 1)[0][0]["total_sold___igr"], str)
+        for area in ("wakad", "aundh"):
+            self.assertEqual(chart_data_for_area(compact, area), chart_data_for_area(numeric, area))
+
+class BenchmarkSuiteTests(SnapshotTestCase):
+    def test_generator_matches_sample_schema(self):
+        sample = normalize_dataset(read_raw_dataset(SAMPLE_EXCEL_PATH))
+        synthetic = normalize_dataset(generate_dataset(500, 60, seed=3))
+        self.assertEqual(list(synthetic.columns), list(sample.columns))
+        self.assertEqual(detect_price_column(synthetic), detect_price_column(sample))
+        self.assertEqual(detect_demand_column(synthetic), detect_demand_column(sample))
+        self.assertEqual(synthetic["_area_norm"].nunique(), 60)
+        self.assertEqual(len(set(area_names(50_000))), 50_000)
+
+    def test_run_case_and_baseline_comparison(self):
+        results = {"cases": [run_case(400, 8, repeat=1)]}
+        ops = results["cases"][0]["ops"]
+        self.assertIn("query_view", ops)
+        self.assertEqual(compare_to_baseline(results, results), [])
+
+        slower = {"cases": [dict(results["cases"][0], ops={
+            op: dict(t, median_ms=t["median_ms"] * 2 + 5) for op, t in ops.items()
+        })]}
+        flagged = compare_to_baseline(slower, results, tolerance=0.25)
+        self.assertEqual({r["op"] for r in flagged}, set(ops))
+
+
+class QueryResponseCacheTests(SnapshotTestCase):
+    def post(self, query, **extra):
+        return self.client.post(
+            reverse("analysis-query"), {"query": query, "use_preloaded": True},
+            content_type="application/json", **extra,
+        )
+
+    def test_same_intent_shares_entry_and_revalidates(self):
+        first = self.post("Analyze Wakad")
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+
+        reworded = self.post("analysis of   WAKAD")
+        self.assertEqual(reworded["ETag"], etag)
+        self.assertEqual(reworded.content, first.content)
+
+        not_modified = self.post("Analyze Wakad", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+        self.assertEqual(not_modified["ETag"], etag)
+
+        other = self.post("Analyze Aundh", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(other.status_code, 200)
+
+
+@override_settings(CACHES={"default": {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "analysis-response-tests",
+}})
+class DjangoResponseCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+
+        self.shared = caches["default"]
+        self.shared.clear()
+        self.addCleanup(self.shared.clear)
+
+    def test_clear_leaves_other_keys_in_the_alias(self):
+        responses = DjangoResponseCache("default")
+        self.shared.set("session:abc", "keep me", None)
+        responses.set("k", ("etag", b"body"))
+        self.assertEqual(responses.get("k"), ("etag", b"body"))
+        self.assertIsNone(self.shared.get("k"))
+
+        responses.clear()
+        self.assertIsNone(responses.get("k"))
+        self.assertEqual(self.shared.get("session:abc"), "keep me")
+
+        # another worker's instance sees the same generation
+        other = DjangoResponseCache("default")
+        other.set("k", ("etag2", b"new"))
+        self.assertEqual(responses.get("k"), ("etag2", b"new"))
+        self.assertEqual(responses.stats()["hits"], 2)
+
+    def test_evicted_generation_does_not_revive_cleared_entries(self):
+        responses = DjangoResponseCache("default")
+        responses.set("k", ("etag", b"body"))
+        self.shared.delete(DjangoResponseCache.GENERATION_KEY)
+        responses.clear()
+        self.assertIsNone(responses.get("k"))
+
+
+class AsyncQueryViewTests(SnapshotTestCase):
+    async def test_matches_sync_view(self):
+        body = {"query": "Compare Wakad and Aundh", "use_preloaded": True}
+        sync = await self.async_client.post(reverse("analysis-query"), body, content_type="application/json")
+        got = await self.async_client.post(reverse("analysis-query-async"), body, content_type="application/json")
+        self.assertEqual(got.status_code, 200)
+        self.assertEqual(got.content, sync.content)
+        self.assertEqual(got["ETag"], sync["ETag"])
+
+    async def test_saturated_pool_answers_503(self):
+        executor = BoundedExecutor(max_workers=1, max_pending=0)
+        release = threading.Event()
+        executor.submit(release.wait)
+        self.addCleanup(release.set)
+        with mock.patch("analysis.views.get_query_executor", return_value=executor):
+            got = await self.async_client.post(
+                reverse("analysis-query-async"), {"query": "Analyze Wakad"}, content_type="application/json",
+            )
+        self.assertEqual(got.status_code, 503)
+        self.assertIn("Retry-After", got)
+
+
+class TablePageTests(SnapshotTestCase):
+    def setUp(self):
+        super().setUp()
+        self.df = pd.DataFrame({
+            "area": ["Wakad", "Aundh", None, "Baner", "Wakad"],
+            "year": [2020, 2021, 2022, 2023, 2024],
+            "rate": [100.5, np.nan, 120.0, 130.25, np.nan],
+        })
+        self.rows = np.array([4, 0, 1, 3, 2])
+
+    def test_records_match_fillna_to_dict(self):
+        self.assertEqual(encode_table(self.df), self.df.fillna("").to_dict(orient="records"))
+
+    def test_pages_chain_through_cursors(self):
+        full, _ = table_page(self.df, self.rows, TableOptions(), 100)
+        pages, cursor = [], None
+        while True:
+            options = TableOptions.from_data({"cursor": cursor, "limit": 2}, 100)
+            table, info = table_page(self.df, self.rows, options, 100)
+            pages.append(table)
+            cursor = info["next_cursor"]
+            if cursor is None:
+                break
+            self.assertEqual(decode_cursor(cursor), info["offset"] + 2)
+        self.assertEqual([len(p) for p in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), full)
+        self.assertEqual(info["total_rows"], 5)
+
+    def test_cursor_round_trip_and_rejection(self):
+        for offset in (0, 1, 999_999):
+            self.assertEqual(decode_cursor(encode_cursor(offset)), offset)
+        for bad in ("", "not-a-cursor", encode_cursor(3).replace("o", "x"), "bzotMQ"):
+            with self.assertRaises(ValueError):
+                decode_cursor(bad)
+
+    def test_projection_and_columnar_format(self):
+        options = TableOptions(columns=["year", "area"], fmt="columnar")
+        table, _ = table_page(self.df, self.rows, options, 100)
+        self.assertEqual(table["columns"], ["year", "area"])
+        self.assertEqual(table["data"], [[2024, 2020, 2021, 2023, 2022], ["Wakad", "Wakad", "Aundh", "Baner", None]])
+        records, _ = table_page(self.df, self.rows[:2], TableOptions(columns=["rate"]), 100)
+        self.assertEqual(records, [{"rate": ""}, {"rate": 100.5}])
+
+    def test_query_endpoint_pages_and_validates_table_options(self):
+        url = reverse("analysis-query")
+        full = self.client.post(url, {"query": "Analyze Wakad"}, content_type="application/json").json()
+        rows, cursor = [], None
+        while True:
+            got = self.client.post(url, {"query": "Analyze Wakad", "table": {"limit": 2, "cursor": cursor}},
+                                   content_type="application/json").json()
+            rows += got["table"]
+            cursor = got["table_page"]["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(rows, full["table"])
+        for table in ({"cursor": "garbage"}, {"limit": 0}, {"limit": "ten"}, {"format": "csv"},
+                      {"columns": ["no such column"]}, "records"):
+            got = self.client.post(url, {"query": "Analyze Wakad", "table": table}, content_type="application/json")
+            self.assertEqual(got.status_code, 400, table)
+            self.assertIn("error", got.json())
+        got = self.client.post(url + "?table_format=columnar&columns=year", {"query": "Analyze Wakad"},
+                               content_type="application/json")
+        self.assertEqual(got.json()["table"]["columns"], ["year"])
+
+
+def wait_for_job(client, status_url, timeout=30):
+    """Poll an ingestion job until it succeeds or fails; returns its last status payload."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(status_url).json()
+        if job["status"] in ("succeeded", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+class UploadTestCase(TestCase):
+    """Uploads into a temporary MEDIA_ROOT / snapshot directory."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.media = os.path.join(self.tmp.name, "media")
+        override = override_settings(MEDIA_ROOT=self.media,
+                                     ANALYSIS_SNAPSHOT_DIR=os.path.join(self.tmp.name, "snapshots"))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(get_dataset_cache().clear)
+        # a fresh job registry, so jobs for the same bytes in earlier tests are not reused;
+        # drained before the temporary directory goes, as jobs write their status files last
+        queue = IngestQueue()
+        self.addCleanup(queue.shutdown)
+        patch = mock.patch("analysis.views.get_ingest_queue", return_value=queue)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.csv = generate_dataset(200, 5, seed=6).to_csv(index=False).encode()
+
+    def upload(self, data, name="data.csv"):
+        return self.client.post(reverse("analysis-upload"), {"file": SimpleUploadedFile(name, data)})
+
+    def leftovers(self):
+        return [n for n in os.listdir(self.media) if n.startswith(".upload-")] if os.path.isdir(self.media) else []
+
+
+class UploadTests(UploadTestCase):
+    def test_same_bytes_are_stored_once(self):
+        first = self.upload(self.csv)
+        self.assertEqual(first.status_code, 202, first.content)
+        self.assertFalse(first.json()["deduplicated"])
+        self.assertEqual(wait_for_job(self.client, first.json()["status_url"])["status"], "succeeded")
+
+        again = self.upload(self.csv, name="renamed.CSV")
+        self.assertEqual(again.status_code, 200)
+        self.assertTrue(again.json()["deduplicated"])
+        self.assertEqual(again.json()["uploaded_path"], first.json()["uploaded_path"])
+        self.assertEqual(again.json()["dataset_id"], first.json()["dataset_id"])
+        self.assertEqual(os.path.basename(first.json()["uploaded_path"]), first.json()["dataset_id"] + ".csv")
+        self.assertEqual(os.listdir(self.media), [first.json()["dataset_id"] + ".csv"])
+
+    def test_oversized_uploads_answer_413_without_leftovers(self):
+        # declared body far above the limit: refused before reading it
+        with override_settings(ANALYSIS_MAX_UPLOAD_BYTES=1000):
+            got = self.upload(b"x" * 200_000)
+        self.assertEqual(got.status_code, 413)
+        self.assertEqual(self.leftovers(), [])
+        # body within the Content-Length slack: refused while streaming, temp file removed
+        with override_settings(ANALYSIS_MAX_UPLOAD_BYTES=len(self.csv) - 1):
+            got = self.upload(self.csv)
+        self.assertEqual(got.status_code, 413)
+        self.assertEqual(self.leftovers(), [])
+        self.assertEqual(os.listdir(self.media), [])
+
+    def test_interrupted_upload_removes_temp_file(self):
+        handler = ContentAddressedUploadHandler(save_dir=self.media, max_bytes=1000)
+        with self.assertRaises(StopFutureHandlers):
+            handler.new_file("file", "data.csv", "text/csv", 500)
+        handler.receive_data_chunk(b"area,year\n", 0)
+        self.assertEqual(len(self.leftovers()), 1)
+        handler.upload_interrupted()
+        self.assertEqual(self.leftovers(), [])
+
+
+    def test_only_the_file_field_is_spooled(self):
+        url = reverse("analysis-upload")
+        extra = SimpleUploadedFile("notes.txt", b"not a dataset")
+        got = self.client.post(url, {"other": extra, "file": SimpleUploadedFile("data.csv", self.csv)})
+        self.assertEqual(got.status_code, 202, got.content)
+        wait_for_job(self.client, got.json()["status_url"])
+        self.assertEqual(os.listdir(self.media), [got.json()["dataset_id"] + ".csv"])
+
+        misnamed = self.client.post(url, {"dataset": SimpleUploadedFile("data.csv", b"area,year\n")})
+        self.assertEqual(misnamed.status_code, 400)
+        self.assertEqual(self.leftovers(), [])
+
+class IngestJobTests(UploadTestCase):
+    def test_job_status_is_served_from_any_process(self):
+        first = self.upload(self.csv).json()
+        job = wait_for_job(self.client, first["status_url"])
+        self.assertEqual(job["status"], "succeeded", job)
+        self.assertEqual(job["progress"], 1.0)
+        self.assertEqual(job["job_id"], first["job_id"])
+        self.assertEqual(list(job["timings_ms"]), ["parse", "normalize", "validate", "compact", "snapshot", "load", "index"])
+        self.assertTrue(os.path.exists(job_status_path(first["job_id"])))
+
+        # another worker process: its own (empty) registry, same status files
+        with mock.patch("analysis.views.get_ingest_queue", return_value=IngestQueue()):
+            elsewhere = self.client.get(first["status_url"])
+            self.assertEqual(elsewhere.status_code, 200)
+            self.assertEqual(elsewhere.json(), job)
+            self.assertEqual(self.client.get(reverse("analysis-job", args=["0" * 32])).status_code, 404)
+            self.assertEqual(self.client.get(reverse("analysis-job", args=["..%2Fsecret"])).status_code, 404)
+
+    def test_failed_stage_cleans_up_and_allows_retry(self):
+        bad = self.upload(b"final location,year\n").json()
+        job = wait_for_job(self.client, bad["status_url"])
+        self.assertEqual(job["status"], "failed")
+        self.assertTrue(job["error"].startswith("validate:"), job["error"])
+        self.assertIsNotNone(job["finished_at"])
+        # the rejected upload and any snapshot of it are gone; the failure stays visible
+        self.assertFalse(os.path.exists(bad["uploaded_path"]))
+        self.assertFalse(os.path.exists(snapshot_dir(bad["dataset_id"])))
+        self.assertEqual(self.leftovers(), [])
+        self.assertEqual(self.client.get(bad["status_url"]).json()["status"], "failed")
+
+        retry = self.upload(b"final location,year\n")
+        self.assertEqual(retry.status_code, 202)
+        self.assertNotEqual(retry.json()["job_id"], bad["job_id"])
+        wait_for_job(self.client, retry.json()["status_url"])
+
+
+class BatchQueryViewTests(SnapshotTestCase):
+    def test_batch_answers_match_single_queries(self):
+        queries = ["Analyze Wakad", "Compare Aundh and Wakad"]
+        got = self.client.post(reverse("analysis-batch"), {"queries": queries}, content_type="application/json")
+        self.assertEqual(got.status_code, 200, got.content)
+        for query, result in zip(queries, got.json()["results"]):
+            single = self.client.post(reverse("analysis-query"), {"query": query}, content_type="application/json")
+            self.assertEqual(result, {"query": query, "status": 200, **single.json()})
+
+    def test_mixed_batch_keeps_order_and_loads_dataset_once(self):
+        import analysis.utils
+
+        long_query = "Analyze Wakad " + "x" * MAX_QUERY_CHARS
+        queries = ["Analyze Wakad", "", "Compare Aundh and Wakad", long_query]
+        with mock.patch("analysis.utils.get_dataset", wraps=analysis.utils.get_dataset) as spy, \
+                mock.patch("analysis.utils.parse_query_text", wraps=analysis.utils.parse_query_text) as parse:
+            got = self.client.post(reverse("analysis-batch"), {"queries": queries}, content_type="application/json")
+        self.assertEqual(spy.call_count, 1)
+        # rejected items are never parsed
+        self.assertEqual([c.args[0] for c in parse.call_args_list], [queries[0], queries[2]])
+        self.assertEqual(got.status_code, 200, got.content)
+        results = got.json()["results"]
+        self.assertEqual([r["query"] for r in results], queries)
+        self.assertEqual([r["status"] for r in results], [200, 400, 200, 400])
+        self.assertEqual(results[0]["type"], "single")
+        self.assertEqual(results[0]["area"], "wakad")
+        self.assertEqual(results[1]["error"], "No query provided.")
+        self.assertEqual(results[2]["type"], "compare")
+        self.assertEqual(list(results[2]["results"]), ["aundh", "wakad"])
+        self.assertIn("too long", results[3]["error"])
+        self.assertNotIn("type", results[3])
+
+    def test_rejects_bad_query_lists(self):
+        url = reverse("analysis-batch")
+        for body in ({}, {"queries": []}, {"queries": "Analyze Wakad"}):
+            got = self.client.post(url, body, content_type="application/json")
+            self.assertEqual(got.status_code, 400)
+        with override_settings(ANALYSIS_BATCH_MAX_QUERIES=2):
+            got = self.client.post(url, {"queries": ["a", "b", "c"]}, content_type="application/json")
+        self.assertEqual(got.status_code, 400)
+
+
+class MetricsTests(SnapshotTestCase):
+    def test_server_timing_and_prometheus_exposition(self):
+        got = self.client.post(reverse("analysis-query"), {"query": "Analyze Wakad"}, content_type="application/json")
+        self.assertEqual(got.status_code, 200)
+        stages = dict(part.split(";dur=") for part in got["Server-Timing"].split(", "))
+        for stage in ("load", "parse", "total"):
+            self.assertIn(stage, stages)
+            self.assertGreaterEqual(float(stages[stage]), 0)
+
+        text = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn("# TYPE analysis_stage_seconds histogram", text)
+        self.assertRegex(text, r'analysis_stage_seconds_bucket\{stage="total",le="\+Inf"\} [1-9]')
+        self.assertIn("analysis_dataset_cache_hits_total", text)
+        self.assertIn("analysis_parser_memo_misses_total", text)
+
+
+class WarmupTests(TestCase):
+    def test_only_server_processes_warm_up(self):
+        self.assertFalse(should_warm_up(["manage.py", "migrate"], {}))
+        self.assertFalse(should_warm_up(["manage.py", "runserver"], {}))
+        self.assertTrue(should_warm_up(["manage.py", "runserver"], {"RUN_MAIN": "true"}))
+        self.assertTrue(should_warm_up(["/venv/bin/gunicorn", "realestate_chatbot.wsgi"], {}))
+
+    def test_warm_up_loads_and_queries_datasets_dir(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "synthetic.csv")
+            generate_dataset(500, 4, seed=5).to_csv(path, index=False)
+            with override_settings(DATASETS_DIR=tmp, ANALYSIS_SNAPSHOT_DIR=os.path.join(tmp, "snapshots")):
+                self.assertEqual(dataset_paths(), [path])
+                [report] = warm_up()
+        self.assertNotIn("error", report)
+        self.assertEqual(len(report["queries"]), 3)
+        self.assertTrue(all(q["status"] == 200 for q in report["queries"].values()))
+
+
+class SharedDatasetStoreTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.join(self.tmp.name, "snapshots")
+        override = override_settings(ANALYSIS_SNAPSHOT_DIR=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.path = os.path.join(self.tmp.name, "synthetic.csv")
+        generate_dataset(2000, 20, seed=11).to_csv(self.path, index=False)
+        self.cache = get_dataset_cache()
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+
+    def test_columns_are_mapped_and_referenced_while_cached(self):
+        entry = get_dataset(self.path)
+
+        def mapped(a):
+            while a is not None and not isinstance(a, np.memmap):
+                a = getattr(a, "base", None)
+            return a is not None
+
+        self.assertTrue(mapped(entry.df["total_units"].to_numpy()))
+        self.assertTrue(mapped(entry.df["area"].array.codes))
+        store = get_shared_store()
+        self.assertEqual(store.refcount(entry.digest), 1)
+        self.cache.clear()
+        self.assertEqual(store.refcount(entry.digest), 0)
+
+    def test_replaced_snapshot_is_removed_once_unreferenced(self):
+        old = get_dataset(self.path).digest
+        # another live process on this host still has the old version attached
+        foreign = os.path.join(snapshot_dir(old), REFS_DIR, _ref_name(os.getppid()))
+        open(foreign, "w").close()
+
+        generate_dataset(500, 5, seed=12).to_csv(self.path, index=False)
+        new = get_dataset(self.path).digest
+        self.assertNotEqual(old, new)
+        self.assertTrue(os.path.isdir(snapshot_dir(old)))
+
+        os.remove(foreign)
+        self.assertEqual(get_shared_store().collect(), [snapshot_dir(old)])
+        self.assertTrue(os.path.isdir(snapshot_dir(new)))
+
+
+class AppendRowsTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(MEDIA_ROOT=self.tmp.name, ANALYSIS_SNAPSHOT_DIR=os.path.join(self.tmp.name, "snapshots"))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(get_dataset_cache().clear)
+        self.base = generate_dataset(3000, 30, seed=21)
+        # stored like an upload: <sha256>.csv in MEDIA_ROOT
+        self.path, self.dataset_id, _ = store_bytes(self.base.to_csv(index=False).encode(), ".csv", self.tmp.name)
+
+    def test_index_extension_equals_rebuild(self):
+        rng = np.random.default_rng(3)
+        names = np.array(["a", "b", "c", "d", None], dtype=object)
+        for _ in range(50):
+            old = pd.Series(names[rng.integers(0, 3, rng.integers(0, 40))])
+            new = pd.Series(names[rng.integers(0, 5, rng.integers(0, 20))])
+            got = AreaIndex(old).extended(new)
+            want = AreaIndex(pd.concat([old, new], ignore_index=True))
+            self.assertEqual(got.vocab, want.vocab)
+            np.testing.assert_array_equal(got.offsets, want.offsets)
+            np.testing.assert_array_equal(got.positions, want.positions)
+
+    def test_append_matches_full_rebuild(self):
+        delta = generate_dataset(200, 5, years=(2025, 2025), seed=22)
+        delta.loc[:4, "final location"] = "Brand New Nagar"
+        rows = json.loads(delta.to_json(orient="records", double_precision=15))
+        got = self.client.post(reverse("analysis-append", args=[self.dataset_id]), {"rows": rows},
+                               content_type="application/json")
+        self.assertEqual(got.status_code, 201, got.content)
+        report = got.json()
+        self.assertEqual((report["rows"], report["appended_rows"]), (3200, 200))
+        self.assertEqual(report["new_areas"], ["brand new nagar"])
+
+        full = os.path.join(self.tmp.name, "full.csv")
+        pd.concat([self.base, delta], ignore_index=True).to_csv(full, index=False)
+        for query in ("Analyze Akurdi", "Compare Aundh and Wakad", "Analyze Brand New Nagar"):
+            answers = [
+                self.client.post(reverse("analysis-query"), {"query": query, "uploaded_path": p},
+                                 content_type="application/json").json()
+                for p in (report["uploaded_path"], full)
+            ]
+            for a in answers:
+                a.pop("table_page", None)
+            self.assertEqual(answers[0], answers[1], query)
+
+    def test_invalid_rows_are_rejected(self):
+        got = self.client.post(reverse("analysis-append", args=[self.dataset_id]),
+                               {"rows": [{"final location": "Wakad", "year": "soon", "total units": "many"}]},
+                               content_type="application/json")
+        self.assertEqual(got.status_code, 400)
+        self.assertIn("without a valid year", got.json()["error"])
+        self.assertIn("'total_units'", got.json()["error"])
+
+
+    def test_unexpected_failure_removes_the_new_delta(self):
+        rows = json.loads(generate_dataset(10, 2, years=(2025, 2025), seed=23).to_json(orient="records"))
+        with mock.patch("analysis.appends.append_rows", side_effect=RuntimeError("disk full")):
+            got = self.client.post(reverse("analysis-append", args=[self.dataset_id]), {"rows": rows},
+                                   content_type="application/json")
+        self.assertEqual(got.status_code, 500)
+        self.assertEqual(os.listdir(self.tmp.name), [os.path.basename(self.path)])
+
+    def test_datasets_dir_lookup_hashes_each_file_once(self):
+        with tempfile.TemporaryDirectory() as datasets:
+            path, digest, _ = store_bytes(b"final location,year\nWakad,2020\n", ".csv", datasets)
+            with override_settings(DATASETS_DIR=datasets), \
+                    mock.patch("analysis.cache.file_digest", wraps=analysis_cache.file_digest) as hashed:
+                for _ in range(3):
+                    self.assertEqual(find_dataset(digest, self.tmp.name), path)
+                    self.assertIsNone(find_dataset("0" * 64, self.tmp.name))
+            self.assertEqual(hashed.call_count, 1)
+
+class StreamingLoaderTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(ANALYSIS_SNAPSHOT_DIR=os.path.join(self.tmp.name, "snapshots"))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(get_dataset_cache().clear)
+        self.path = os.path.join(self.tmp.name, "large.csv")
+        generate_dataset(2000, 40, seed=5).to_csv(self.path, index=False)
+
+    def test_scan_matches_filtered_full_read(self):
+        for path in (self.path, SAMPLE_EXCEL_PATH):
+            full = normalize_dataset(read_raw_dataset(path))
+            for areas in (["wakad"], ["AUNDH", "baner"], ["zzz"]):
+                vocabulary = []
+                got = scan_dataset(path, areas, chunksize=97, vocabulary=vocabulary)
+                pd.testing.assert_frame_equal(got, _scan_filter(full, areas).reset_index(drop=True))
+                self.assertEqual(vocabulary, list(dict.fromkeys(full["_area_norm"])))
+
+        projected = scan_dataset(self.path, ["wakad"], columns=[], chunksize=97)
+        self.assertLess(len(projected.columns), len(scan_dataset(self.path, []).columns))
+        self.assertTrue({"area", "year", "_area_norm"} <= set(projected.columns))
+
+    @override_settings(ANALYSIS_STREAMING_MIN_BYTES=1)
+    def test_file_is_hashed_once_per_version(self):
+        with mock.patch("analysis.cache.file_digest", wraps=analysis_cache.file_digest) as digest:
+            first = streamed_dataset(self.path)
+            self.assertEqual(streamed_dataset(self.path).digest, first.digest)
+            self.assertEqual(digest.call_count, 1)
+            generate_dataset(2100, 40, seed=5).to_csv(self.path, index=False)
+            self.assertNotEqual(streamed_dataset(self.path).digest, first.digest)
+            self.assertEqual(digest.call_count, 2)
+
+    def test_streamed_query_matches_loaded_query(self):
+        queries = ("Analyze Wakad", "Analyze wakkad", "Compare Aundh and Baner over the last 3 years")
+        answers = {}
+        # streamed first: once the file is cached or snapshotted, queries load it instead
+        for streaming in (1, None):
+            for query in queries:
+                get_response_cache().clear()
+                with override_settings(ANALYSIS_STREAMING_MIN_BYTES=streaming):
+                    got = self.client.post(reverse("analysis-query"), {"query": query, "uploaded_path": self.path},
+                                           content_type="application/json")
+                self.assertEqual(got.status_code, 200, got.content)
+                self.assertEqual("scan;" in got["Server-Timing"], bool(streaming))
+                answers.setdefault(query, []).append(got.content)
+        for query, (streamed, loaded) in answers.items():
+            streamed, loaded = json.loads(streamed), json.loads(loaded)
+            # similar areas need every area of the dataset, so only loaded datasets list them
+            self.assertNotIn("similar_areas", streamed)
+            if loaded["type"] == "single":
+                self.assertIn("similar_areas", loaded)
+            loaded.pop("similar_areas", None)
+            self.assertEqual(streamed, loaded, query)
+
+
+class RankingTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(ANALYSIS_SNAPSHOT_DIR=os.path.join(self.tmp.name, "snapshots"))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(get_dataset_cache().clear)
+        self.path = os.path.join(self.tmp.name, "ranked.csv")
+        generate_dataset(6000, 300, seed=9).to_csv(self.path, index=False)
+
+    def test_parses_ranking_questions(self):
+        cases = {
+            "Which areas had the highest price growth over the last 5 years?": ("cagr", "desc", 10, 5, None),
+            "Top 10 areas by demand in 2023": ("demand", "desc", 10, None, 2023),
+            "bottom 3 localities by year-over-year price change": ("yoy", "asc", 3, None, None),
+        }
+        for query, expected in cases.items():
+            parsed = parse_query_text(query)
+            self.assertEqual(parsed["intent"], "rank", query)
+            got = tuple(parsed[k] for k in ("metric", "order", "limit", "last_n_years", "year"))
+            self.assertEqual(got, expected, query)
+
+    def test_area_intents_win_over_ranking_words(self):
+        cases = {
+            "analyze wakad, the best area": ("analyze", ["wakad"]),
+            "Give me analysis of Aundh, one of the top localities": ("analyze", ["aundh"]),
+            "Show price growth for Baner over the last 3 years, best of all areas": ("growth", ["baner"]),
+            "which areas behave like wakad, the top performer": ("analyze", ["wakad"]),
+            # the phrase after "analyze" / "for" is itself a ranking question
+            "analyze the top 5 areas by demand": ("rank", []),
+            "price growth for the best areas over the last 3 years": ("rank", []),
+        }
+        for query, expected in cases.items():
+            parsed = parse_query_text(query)
+            self.assertEqual((parsed["intent"], parsed["areas"]), expected, query)
+
+    def test_matches_per_area_reference(self):
+        df = get_dataset(self.path).df
+        matrix = area_matrix_for(df)
+        schema_price = detect_price_column(df)
+        rows = df[df["year"].between(2020, 2024)].copy()
+        rows["price"] = rows[schema_price].astype(float).mean(axis=1)
+        yearly = rows.groupby(["area", "year"], observed=True)["price"].mean().dropna()
+        yearly = yearly[yearly > 0]
+
+        def cagr(s):
+            s = s.droplevel("area")
+            span = s.index[-1] - s.index[0]
+            return (s.iloc[-1] / s.iloc[0]) ** (1 / span) - 1 if span else np.nan
+
+        expected = yearly.groupby(level="area", observed=True).apply(cagr).dropna().sort_values(ascending=False)
+        got = rank_areas(matrix, "cagr", "desc", 5, last_n_years=5)
+        self.assertEqual([r["area"] for r in got["results"]], expected.index[:5].tolist())
+        np.testing.assert_allclose([r["value"] for r in got["results"]], (expected.iloc[:5] * 100).round(2))
+
+        demand = detect_demand_column(df)
+        expected = df[df["year"] == 2023].groupby("area", observed=True)[demand].mean().dropna().sort_values()
+        got = rank_areas(matrix, "demand", "asc", 5, year=2023)
+        self.assertEqual([r["area"] for r in got["results"]], expected.index[:5].tolist())
+
+    def test_rank_endpoint(self):
+        url = reverse("analysis-rank")
+        bad = self.client.post(url, {"metric": "price", "uploaded_path": self.path}, content_type="application/json")
+        self.assertEqual(bad.status_code, 400)
+        got = self.client.post(url, {"metric": "yoy", "limit": 3, "uploaded_path": self.path},
+                               content_type="application/json")
+        self.assertEqual(got.status_code, 200, got.content)
+        self.assertEqual(got.json()["type"], "ranking")
+        self.assertEqual(len(got.json()["results"]), 3)
+        self.assertIn("rank;", got["Server-Timing"])
+
+
+class SimilarAreasTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(ANALYSIS_SNAPSHOT_DIR=os.path.join(self.tmp.name, "snapshots"))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(get_dataset_cache().clear)
+
+    def test_vectors_compare_shape_not_level(self):
+        price = np.array([[100, 110, 121, np.nan], [1000, 1100, 1210, np.nan], [300, 200, 100, 50.0]])
+        demand = np.array([[5, 6, 7, 8], [50, 60, 70, 80], [8, 7, 6, 5.0]])
+        vectors = trajectory_vectors(price, demand)
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0)
+        self.assertAlmostEqual(float(vectors[0] @ vectors[1]), 1.0, places=6)
+        self.assertLess(float(vectors[0] @ vectors[2]), 0)
+
+    def test_single_area_response_lists_nearest_areas(self):
+        path = os.path.join(self.tmp.name, "similar.csv")
+        df = generate_dataset(3000, 60, seed=4)
+        # a copy of Wakad's trajectory at twice the price and demand
+        twin = df[df["final location"] == "Wakad"].copy()
+        twin["final location"] = "Twin Nagar"
+        for col in ("flat - weighted average rate", "total sold - igr"):
+            twin[col] = twin[col] * 2
+        pd.concat([df, twin], ignore_index=True).to_csv(path, index=False)
+
+        got = self.client.post(reverse("analysis-query"), {"query": "Which localities behave like Wakad?",
+                                                           "uploaded_path": path}, content_type="application/json")
+        self.assertEqual(got.status_code, 200, got.content)
+        similar = got.json()["similar_areas"]
+        self.assertEqual(len(similar), 5)
+        self.assertEqual(similar[0]["area"], "Twin Nagar")
+        self.assertGreater(similar[0]["score"], 0.99)
+        self.assertNotIn("Wakad", [s["area"] for s in similar])
+        self.assertEqual([s["score"] for s in similar], sorted((s["score"] for s in similar), reverse=True))
+
+
+class StreamedQueryTests(SnapshotTestCase):
+    def events(self, response):
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    @override_settings(ANALYSIS_STREAM_TABLE_ROWS=2)
+    def test_events_reassemble_json_response(self):
+        for query in ("Analyze Wakad", "Compare Aundh and Wakad"):
+            full = self.client.post(reverse("analysis-query"), {"query": query}, content_type="application/json").json()
+            got = self.client.post(reverse("analysis-query-stream"), {"query": query}, content_type="application/json")
+            self.assertEqual(got["Content-Type"], "application/x-ndjson")
+            events = self.events(got)
+            names = [e["event"] for e in events]
+            self.assertEqual(names[:2], ["intent", "resolution"])
+            self.assertEqual(names[-1], "done")
+            self.assertIn("total", events[-1]["timings"])
+            self.assertLess(names.index("chart"), names.index("table"))
+            parts = full["results"] if full["type"] == "compare" else {full["area"]: full}
+            for area, part in parts.items():
+                mine = [e for e in events if e.get("area") == area]
+                self.assertEqual(next(e["summary"] for e in mine if e["event"] == "summary"), part["summary"])
+                self.assertEqual(next(e["chart"] for e in mine if e["event"] == "chart"), part["chart"])
+                pages = [e for e in mine if e["event"] == "table"]
+                self.assertGreater(len(pages), 1)
+                self.assertEqual(sum((p["table"] for p in pages), []), part["table"])
+                self.assertEqual(pages[-1]["table_page"]["next_cursor"], part["table_page"]["next_cursor"])
+
+    def test_errors_and_event_stream_format(self):
+        url = reverse("analysis-query-stream")
+        self.assertEqual(self.client.post(url, {}, content_type="application/json").status_code, 400)
+        bad = self.events(self.client.post(url, {"query": "Analyze Wakad", "table": {"columns": ["nope"]}},
+                                           content_type="application/json"))
+        self.assertEqual([e["event"] for e in bad], ["intent", "error", "done"])
+        self.assertEqual(bad[1]["status"], 400)
+        sse = self.client.post(url, {"query": "top 3 areas by demand"}, content_type="application/json",
+                               HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(sse["Content-Type"], "text/event-stream")
+        body = b"".join(sse.streaming_content).decode()
+        self.assertEqual(re.findall(r"^event: (\w+)$", body, re.M), ["intent", "resolution", "ranking", "done"])
+
+
+    def test_stalled_consumer_holds_no_admission_slot(self):
+        gate = get_admission_gate()
+        got = self.client.post(reverse("analysis-query-stream"), {"query": "Analyze Wakad"},
+                               content_type="application/json")
+        stream = iter(got.streaming_content)
+        first, second = json.loads(next(stream)), json.loads(next(stream))
+        self.assertEqual((first["event"], second["event"]), ("intent", "resolution"))
+        # the client stops reading here; the analysis is done and its slot free
+        self.assertEqual(gate.stats()["active"], 0)
+        rest = [json.loads(line) for line in stream]
+        self.assertEqual(rest[-1]["event"], "done")
+
+class CoalescingAndAdmissionTests(SnapshotTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp.name, "cold.csv")
+        generate_dataset(500, 10, seed=5).to_csv(self.path, index=False)
+
+    def test_concurrent_cold_loads_share_one_load(self):
+        cache, n = DatasetCache(), 8
+        loads = []
+
+        def loader(path, digest):
+            loads.append(path)
+            # hold the load until every other thread is waiting on it
+            deadline = time.monotonic() + 5
+            while cache.stats()["coalesced"] < n - 1 and time.monotonic() < deadline:
+                time.sleep(0.005)
+            return pd.read_csv(path)
+
+        got = []
+        threads = [threading.Thread(target=lambda: got.append(cache.get(self.path, loader))) for _ in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(cache.stats()["coalesced"], n - 1)
+        self.assertEqual(len({id(entry) for entry in got}), 1)
+
+    def test_gate_limits_active_and_queued(self):
+        gate = AdmissionGate(max_active=1, max_queued=1, timeout=0.05)
+        errors = []
+
+        def contend():
+            try:
+                with gate.admit():
+                    pass
+            except Saturated as e:
+                errors.append(e)
+
+        with gate.admit():
+            contend()  # re-entrant in the holding thread
+            self.assertEqual((gate.stats()["active"], errors), (1, []))
+            # another thread queues, then gives up after the timeout
+            t = threading.Thread(target=contend)
+            t.start()
+            t.join()
+        self.assertEqual(len(errors), 1)
+        self.assertGreaterEqual(errors[0].retry_after, 1)
+        self.assertEqual(gate.stats()["rejected"], 1)
+        contend()
+        self.assertEqual(gate.stats()["active"], 0)
+
+    def test_cold_query_on_full_gate_answers_503(self):
+        url = reverse("analysis-query")
+        self.assertEqual(self.client.post(url, {"query": "Analyze Wakad"}, content_type="application/json").status_code, 200)
+        gate = AdmissionGate(max_active=1, max_queued=0)
+        release, held = threading.Event(), threading.Event()
+
+        def hold():
+            with gate.admit():
+                held.set()
+                release.wait(5)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        self.addCleanup(holder.join)
+        self.addCleanup(release.set)
+        held.wait(5)
+        with mock.patch("analysis.views.get_admission_gate", return_value=gate):
+            got = self.client.post(url, {"query": "Analyze Wakad", "uploaded_path": self.path},
+                                   content_type="application/json")
+            self.assertEqual(got.status_code, 503)
+            self.assertIn("Retry-After", got)
+            # cached datasets and answers need no slot
+            warm = self.client.post(url, {"query": "Analyze Wakad"}, content_type="application/json")
+            self.assertEqual(warm.status_code, 200)
@@ -0,0 +1,143 @@
+# analysis/uploads.py
+import hashlib
+import os
+import tempfile
+
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+# default cap on a single uploaded dataset
+DEFAULT_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+
+class ContentAddressedUploadHandler(FileUploadHandler):
+    """
+    Stream an upload straight into ``save_dir`` while hashing it.
+
+    Chunks go to a hidden temp file next to the final location (so the
+    content-addressed rename is atomic) and into a sha256 as they arrive.
+    The size limit is enforced per chunk: once exceeded the temp file is
+    removed and parsing stops, without buffering the rest of the body.
+
+    Only the first file sent under ``field_name`` is stored; any other file
+    field is passed on to the next handler (with none, it is dropped), so no
+    temp file is left behind for a file the view never looks at.
+    """
+
+    def __init__(self, request=None, save_dir=None, max_bytes=DEFAULT_MAX_UPLOAD_BYTES, field_name="file"):
+        super().__init__(request)
+        self.save_dir = save_dir
+        self.max_bytes = max_bytes
+        self.accepted_field = field_name
+        self.exceeded = False
+        self.file = None
+        self._skipping = False
+        self._discarded = False
+        self._hash = None
+        self._size = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # the whole body is already too big: refuse before reading any of it
+        if self.max_bytes and content_length and content_length > self.max_bytes + 64 * 1024:
+            self.exceeded = True
+            return QueryDict(), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        self._skipping = field_name != self.accepted_field or self.file is not None
+        if self._skipping:
+            return
+        super().new_file(field_name, *args, **kwargs)
+        os.makedirs(self.save_dir, exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=self.save_dir, prefix=".upload-", delete=False)
+        self._discarded = False
+        self._hash = hashlib.sha256()
+        self._size = 0
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self._skipping:
+            return raw_data
+        self._size += len(raw_data)
+        if self.max_bytes and self._size > self.max_bytes:
+            self.exceeded = True
+            self._discard()
+            raise StopUpload(connection_reset=True)
+        self._hash.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self._skipping:
+            return None
+        self.file.flush()
+        self.file.seek(0)
+        uploaded = UploadedFile(
+            file=self.file,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+        uploaded.sha256 = self._hash.hexdigest()
+        uploaded.temporary_path = self.file.name
+        return uploaded
+
+    def upload_interrupted(self):
+        self._discard()
+
+    def _discard(self):
+        # keep self.file (closed): the multipart parser closes handler files itself
+        if self.file is not None and not self._discarded:
+            self._discarded = True
+            self.file.close()
+            try:
+                os.remove(self.file.name)
+            except FileNotFoundError:
+                pass
+
+
+def store_upload(uploaded, save_dir):
+    """
+    Move a streamed upload to ``<save_dir>/<sha256><ext>``.
+
+    Returns ``(path, digest, created)``; ``created`` is False when identical
+    bytes were uploaded before, in which case the new copy is dropped.
+    """
+    digest = uploaded.sha256
+    ext = os.path.splitext(uploaded.name or "")[1].lower()
+    final = os.path.join(save_dir, f"{digest}{ext}")
+    uploaded.close()
+    if os.path.exists(final):
+        os.remove(uploaded.temporary_path)
+        return final, digest, False
+    os.replace(uploaded.temporary_path, final)
+    return final, digest, True
+
+
+def store_bytes(data, ext, save_dir):
+    """
+    Write ``data`` to ``<save_dir>/<sha256><ext>`` (atomically, once).
+
+    Returns ``(path, digest, created)`` like ``store_upload``.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    final = os.path.join(save_dir, f"{digest}{ext}")
+    if os.path.exists(final):
+        return final, digest, False
+    os.makedirs(save_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=save_dir, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, final)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    return final, digest, True
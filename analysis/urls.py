@@ -1,8 +1,17 @@
 from django.urls import path
-from .views import UploadDatasetView, QueryAnalysisView
+from .views import (
+    UploadDatasetView, QueryAnalysisView, AsyncQueryAnalysisView, IngestJobView, BatchQueryView,
+    AppendRowsView, RankAreasView, StreamQueryAnalysisView,
+)
 
 urlpatterns = [
     path('upload/', UploadDatasetView.as_view(), name='analysis-upload'),
     path('query/', QueryAnalysisView.as_view(), name='analysis-query'),
+    path('query/stream/', StreamQueryAnalysisView.as_view(), name='analysis-query-stream'),
+    path('query/async/', AsyncQueryAnalysisView.as_view(), name='analysis-query-async'),
+    path('rank/', RankAreasView.as_view(), name='analysis-rank'),
+    path('batch/', BatchQueryView.as_view(), name='analysis-batch'),
+    path('jobs/<str:job_id>/', IngestJobView.as_view(), name='analysis-job'),
+    path('datasets/<str:dataset_id>/append/', AppendRowsView.as_view(), name='analysis-append'),
 ]
 
@@ -1,4 +1,5 @@
 # analysis/utils.py
+import logging
 import os
 import re
 from typing import Any, Dict, List
@@ -7,10 +8,23 @@ import numpy as np
 import pandas as pd
 from dateutil import parser
 
+from .cache import CachedDataset, derived_for, get_dataset_cache
+from .compact import compact_frame
+from .appends import is_append_manifest, read_appended_dataset
+from .aggregates import AreaYearCube, AreaYearMatrix, chart_from_yearly, yearly_price_demand, yearly_price_demand_groups
+from .index import AreaIndex, build_area_index
+from .metrics import timed
+from .parser import parse_query
+from .resolver import AreaResolver, build_area_resolver
+from .similarity import AreaSimilarity
+from .shared import get_shared_store, source_info
+
 # project base dir (two levels up from this file)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SAMPLE_EXCEL_PATH = os.path.join(BASE_DIR, "datasets", "realestate_data.xlsx")
 
+logger = logging.getLogger(__name__)
+
 # --------------------
 # Column normalization
 # --------------------
@@ -27,35 +41,87 @@ def _normalize_colname(c: str) -> str:
     s = s.replace(' ', '_')
     return s
 
+# Normalized source column names mapped onto the canonical 'area' / 'year' columns.
+# The user's list included "final location", so handle it explicitly.
+AREA_CANDIDATES = [
+    "final_location", "final_location", "final_location",  # explicit redundancy is harmless
+    "area", "locality", "location", "area_name", "place",
+    "neighbourhood", "neighborhood", "locality_name"
+]
+YEAR_CANDIDATES = ("yr", "year_covered", "reporting_year")
+
 def load_dataset(path: str = None) -> pd.DataFrame:
     """
     Load the dataset (xlsx or csv), normalize column names and map known columns
     from your provided schema to canonical names used by the rest of the code.
+
+    Parsed frames are shared through the process-wide dataset cache, so callers
+    must treat the returned frame as read-only.
+    """
+    return get_dataset(path).df
+
+@timed("load")
+def get_dataset(path: str = None, prepare: bool = True, admission=None) -> CachedDataset:
+    """
+    Return the cache entry (frame + fingerprint) for a dataset path.
+
+    ``admission`` (e.g. ``AdmissionGate.admit``) is entered around a cold
+    load, by the one thread that performs it; concurrent callers for the
+    same file just wait for that load.
     """
     path = path or SAMPLE_EXCEL_PATH
     if not os.path.exists(path):
         raise FileNotFoundError(f"Dataset not found at {path}")
+    loader = _load_via_snapshot
+    if admission is not None:
+        def loader(real, digest):
+            with admission():
+                return _load_via_snapshot(real, digest)
+    entry = get_dataset_cache().get(path, loader)
+    if prepare:
+        prepare_dataset(entry)
+    return entry
+
+def prepare_dataset(entry: CachedDataset) -> CachedDataset:
+    """Build the per-dataset lookup structures up front (no-op once built)."""
+    entry.derive("schema", DatasetSchema.detect)
+    entry.derive("area_index", build_area_index)
+    entry.derive("area_cube", _build_area_cube)
+    entry.derive("area_resolver", _build_area_resolver)
+    return entry
+
+def _load_via_snapshot(path: str, digest: str) -> pd.DataFrame:
+    """
+    Attach to the shared columnar snapshot for ``digest``; the first process
+    to need it builds it from ``path`` while the others wait and attach.
+    """
+    return get_shared_store().open(digest, lambda: read_dataset(path), source=source_info(path))
 
-    # load
-    if str(path).lower().endswith(".csv"):
-        df = pd.read_csv(path)
+def read_dataset(path: str) -> pd.DataFrame:
+    """Parse, normalize and compact a dataset file (or replay an append manifest), bypassing the cache."""
+    if is_append_manifest(path):
+        normalized = read_appended_dataset(path)
     else:
-        df = pd.read_excel(path, engine="openpyxl")
+        normalized = normalize_dataset(read_raw_dataset(path))
+    df, _ = compact_dataset(normalized, source=path)
+    return df
 
+def read_raw_dataset(path: str) -> pd.DataFrame:
+    """Parse a csv/xlsx file as-is (original column names, no canonical columns)."""
+    if str(path).lower().endswith(".csv"):
+        return pd.read_csv(path)
+    return pd.read_excel(path, engine="openpyxl")
+
+def normalize_dataset(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize column names and add the canonical 'area', '_area_norm' and 'year' columns."""
     # original columns -> normalized column names
     norm_map = {col: _normalize_colname(col) for col in df.columns}
     df = df.rename(columns=norm_map)
 
     # Map your known columns to canonical names
-    # The user's list included "final location", so handle it explicitly.
     # We look for normalized variants and map to 'area'
-    area_candidates = [
-        "final_location", "final_location", "final_location",  # explicit redundancy is harmless
-        "area", "locality", "location", "area_name", "place",
-        "neighbourhood", "neighborhood", "locality_name"
-    ]
     found_area = None
-    for cand in area_candidates:
+    for cand in AREA_CANDIDATES:
         if cand in df.columns:
             found_area = cand
             break
@@ -68,7 +134,7 @@ def load_dataset(path: str = None) -> pd.DataFrame:
     # Ensure year column exists and normalized name is 'year' (it already is in your list)
     if "year" not in df.columns:
         # try variants
-        for cand in ("yr", "year_covered", "reporting_year"):
+        for cand in YEAR_CANDIDATES:
             if cand in df.columns:
                 df = df.rename(columns={cand: "year"})
                 break
@@ -80,18 +146,96 @@ def load_dataset(path: str = None) -> pd.DataFrame:
     # demand-like columns: prefer total_sold_igr, total_sales_igr, then total_units
     # (we will detect these later dynamically)
 
+    # canonicalize the year once so cached frames never need to be mutated later
+    df = ensure_year_col(df)
     return df
 
+def compact_dataset(df: pd.DataFrame, source: str = None):
+    """
+    Shrink a normalized frame to compact dtypes (see ``analysis.compact``).
+
+    Returns ``(df, memory_report)``; the report is also logged.
+    """
+    df, report = compact_frame(df)
+    logger.info(
+        "dataset %s compacted: %d -> %d bytes (%.0f%%)",
+        source or "<frame>", report["bytes_before"], report["bytes_after"], report["ratio"] * 100,
+    )
+    return df, report
+
 # --------------------
 # Helpers
 # --------------------
 def normalize_area_text(s: str) -> str:
     return re.sub(r"\s+", " ", str(s).strip().lower())
 
-def filter_by_area(df: pd.DataFrame, areas: List[str]) -> pd.DataFrame:
-    """Return rows where normalized 'area' contains any substring in areas."""
+def area_index_for(df: pd.DataFrame) -> AreaIndex:
+    """Return the area index of a cached dataset frame (None for ad-hoc frames)."""
+    return derived_for(df, "area_index", build_area_index)
+
+def _build_area_cube(df: pd.DataFrame) -> AreaYearCube:
+    schema = schema_for(df)
+    return AreaYearCube.build(df, area_index_for(df), schema.price_cols, schema.demand_col)
+
+def area_cube_for(df: pd.DataFrame) -> AreaYearCube:
+    """Return the area x year aggregate cube of a cached dataset frame (None for ad-hoc frames)."""
+    return derived_for(df, "area_cube", _build_area_cube)
+
+def _build_area_matrix(df: pd.DataFrame) -> AreaYearMatrix:
+    index = area_index_for(df) or build_area_index(df)
+    cube = area_cube_for(df)
+    if cube is None:
+        schema = schema_for(df)
+        cube = AreaYearCube.build(df, index, schema.price_cols, schema.demand_col)
+    # display name of each area: its first row's 'area' value
+    first = df["area"].iloc[index.positions[index.offsets[:-1]]]
+    labels = [None if pd.isna(a) else str(a) for a in first.tolist()]
+    return AreaYearMatrix.from_cube(cube, len(index.vocab), labels)
+
+def area_matrix_for(df: pd.DataFrame) -> AreaYearMatrix:
+    """Return the dense area x year matrix of a dataset frame (built on the fly for ad-hoc frames)."""
+    return derived_for(df, "area_matrix", _build_area_matrix) or _build_area_matrix(df)
+
+def _build_area_similarity(df: pd.DataFrame) -> AreaSimilarity:
+    return AreaSimilarity(area_matrix_for(df))
+
+def area_similarity_for(df: pd.DataFrame) -> AreaSimilarity:
+    """Return the trajectory similarity vectors of a cached dataset frame (None for ad-hoc frames)."""
+    return derived_for(df, "area_similarity", _build_area_similarity)
+
+def _build_area_resolver(df: pd.DataFrame) -> AreaResolver:
+    return build_area_resolver(area_index_for(df))
+
+def area_resolver_for(df: pd.DataFrame) -> AreaResolver:
+    """Return the typo-tolerant area resolver of a cached dataset frame (None for ad-hoc frames)."""
+    return derived_for(df, "area_resolver", _build_area_resolver)
+
+@timed("resolve")
+def resolve_query_areas(df: pd.DataFrame, parsed: Dict[str, Any]):
+    """
+    Replace misspelled areas of a parsed query with the closest dataset areas.
+
+    Returns ``(parsed, resolutions)``; ``resolutions`` has one entry per area
+    (see ``AreaResolver.resolve``) and is None when ``df`` has no resolver.
+    """
+    return resolve_areas_with(area_resolver_for(df), parsed)
+
+def resolve_areas_with(resolver: AreaResolver, parsed: Dict[str, Any]):
+    """``resolve_query_areas`` against a given resolver (None: areas are left as typed)."""
+    if resolver is None or not parsed.get("areas"):
+        return parsed, None
+    resolutions = [resolver.resolve(normalize_area_text(a)) for a in parsed["areas"]]
+    areas = [a if r["method"] == "exact" else r["area"] for a, r in zip(parsed["areas"], resolutions)]
+    return dict(parsed, areas=areas), resolutions
+
+@timed("filter")
+def area_rows(df: pd.DataFrame, areas: List[str]) -> np.ndarray:
+    """Positions (for ``df.iloc``) of rows whose normalized 'area' contains any substring in areas."""
     if df is None or df.empty:
-        return df.iloc[0:0]
+        return np.array([], dtype=np.int64)
+    index = area_index_for(df)
+    if index is not None:
+        return index.rows(normalize_area_text(a) for a in areas)
     if "_area_norm" not in df.columns:
         df["_area_norm"] = df["area"].astype(str).apply(lambda s: re.sub(r"\s+", " ", s.strip().lower()))
     mask = pd.Series(False, index=df.index)
@@ -99,9 +243,18 @@ def filter_by_area(df: pd.DataFrame, areas: List[str]) -> pd.DataFrame:
         a = normalize_area_text(area)
         # Use regex escape to avoid special char issues
         mask = mask | df["_area_norm"].str.contains(re.escape(a), na=False)
-    return df[mask].copy()
+    return np.flatnonzero(mask.to_numpy())
+
+def filter_by_area(df: pd.DataFrame, areas: List[str]) -> pd.DataFrame:
+    """Return rows where normalized 'area' contains any substring in areas."""
+    if df is None or df.empty:
+        return df.iloc[0:0]
+    return df.iloc[area_rows(df, areas)].copy()
 
 def ensure_year_col(df: pd.DataFrame) -> pd.DataFrame:
+    if "year" in df.columns and _is_nullable_int(df["year"].dtype):
+        # already canonical (Int64, or a smaller nullable int in a cached frame): nothing to do
+        return df
     if "year" in df.columns:
         try:
             df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
@@ -116,6 +269,9 @@ def ensure_year_col(df: pd.DataFrame) -> pd.DataFrame:
         df["year"] = pd.NA
     return df
 
+def _is_nullable_int(dtype) -> bool:
+    return isinstance(dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(dtype)
+
 # --------------------
 # Column detectors
 # --------------------
@@ -165,15 +321,52 @@ def detect_demand_column(df: pd.DataFrame) -> str:
             return c
     return None
 
+
+class DatasetSchema:
+    """
+    The columns the analytics read, detected once per dataset.
+
+    ``price_cols`` / ``demand_col`` follow ``detect_price_column`` /
+    ``detect_demand_column``; ``measure_cols`` is every column that is
+    aggregated numerically (including the 'sold'/'sales' demand fallback).
+    """
+
+    def __init__(self, price_cols: List[str], demand_col: str, measure_cols: List[str]):
+        self.price_cols = price_cols
+        self.demand_col = demand_col
+        self.measure_cols = measure_cols
+
+    @classmethod
+    def detect(cls, df: pd.DataFrame) -> "DatasetSchema":
+        price_cols = detect_price_column(df)
+        demand_col = detect_demand_column(df)
+        measures = list(price_cols)
+        for c in [demand_col, "total_units"] + [c for c in df.columns if "sold" in c or "sales" in c]:
+            if c and c in df.columns and c not in measures:
+                measures.append(c)
+        return cls(price_cols, demand_col, measures)
+
+def schema_for(df: pd.DataFrame) -> DatasetSchema:
+    """The resolved schema of ``df``: memoized for cached datasets, detected for ad-hoc frames."""
+    return derived_for(df, "schema", DatasetSchema.detect) or DatasetSchema.detect(df)
+
 # --------------------
 # Chart and summary
 # --------------------
+@timed("chart")
 def chart_data_for_area(df: pd.DataFrame, area: str, last_n_years: int = None) -> Dict[str, Any]:
     """Return chart JSON with labels, price series and demand series for an area."""
     df = ensure_year_col(df)
+    cube = area_cube_for(df)
+    if cube is not None:
+        # answered from precomputed per-(area, year) sums and counts
+        yearly = cube.yearly(area_index_for(df).match(normalize_area_text(area)))
+        if yearly.empty:
+            return {"labels": [], "price": [], "demand": []}
+        return chart_from_yearly(yearly, last_n_years)
+
     # detect the columns to use
-    price_cols = detect_price_column(df)
-    demand_col = detect_demand_column(df)
+    schema = schema_for(df)
 
     df_area = filter_by_area(df, [area])
     # use only rows with year
@@ -181,81 +374,11 @@ def chart_data_for_area(df: pd.DataFrame, area: str, last_n_years: int = None) -
     if df_area.empty:
         return {"labels": [], "price": [], "demand": []}
 
-    # If we have multiple price columns, compute mean across them per group
-    def price_agg(group):
-        if not price_cols:
-            return np.nan
-        vals = []
-        for pc in price_cols:
-            if pc in group.columns:
-                v = pd.to_numeric(group[pc], errors="coerce")
-                vals.append(v)
-        if not vals:
-            return np.nan
-        stacked = pd.concat(vals, axis=1)
-        # mean across available columns (row-wise), then mean of that per year
-        return stacked.mean(axis=1).mean()
-
-    # Build grouped dataframe
-    agg_map = {}
-    if demand_col and demand_col in df_area.columns:
-        agg_map[demand_col] = "mean"
-    grouped = df_area.groupby("year").agg(agg_map).reset_index()
-    grouped = grouped.sort_values("year")
-
-    # compute price series per year using price_agg
-    price_series = []
-    for _, row in grouped.iterrows():
-        year = row["year"]
-        rows_for_year = df_area[df_area["year"] == year]
-        price_year = price_agg(rows_for_year)
-        price_series.append(round(float(price_year), 2) if not pd.isna(price_year) else None)
-
-    # demand series
-    demand_series = []
-    if demand_col and demand_col in grouped.columns:
-        # safe conversion: turn NaN -> None (replace np.nan with None) before listing
-        demand_series = (
-            grouped[demand_col]
-            .astype(float)
-            .round(2)
-            .where(lambda s: ~s.isna(), other=None)   # keep None for missing values
-            .tolist()
-        )
-    else:
-        # if we couldn't aggregate demand via map, try computing from df_area directly per year
-        for _, row in grouped.iterrows():
-            year = row["year"]
-            rows_for_year = df_area[df_area["year"] == year]
-            # try total_units
-            if "total_units" in rows_for_year.columns:
-                val = pd.to_numeric(rows_for_year["total_units"], errors="coerce").mean()
-            else:
-                # fallback: try sum/mean of any column containing 'sold' or 'sales'
-                sold_cols = [c for c in rows_for_year.columns if "sold" in c or "sales" in c]
-                if sold_cols:
-                    vals = []
-                    for sc in sold_cols:
-                        tmp = pd.to_numeric(rows_for_year[sc], errors="coerce")
-                        if not tmp.dropna().empty:
-                            vals.append(tmp.mean(skipna=True))
-                    val = np.nan if not vals else (sum(vals) / len(vals))
-                else:
-                    val = np.nan
-            demand_series.append(round(float(val), 2) if not pd.isna(val) else None)
-
-    # trim to last_n_years if requested
-    labels = grouped["year"].astype(str).tolist()
-    if last_n_years and labels:
-        last_year = int(labels[-1])
-        cutoff = last_year - (last_n_years - 1)
-        filtered_idx = [i for i, y in enumerate(labels) if int(y) >= cutoff]
-        labels = [labels[i] for i in filtered_idx]
-        price_series = [price_series[i] for i in filtered_idx]
-        demand_series = [demand_series[i] for i in filtered_idx]
-
-    return {"labels": labels, "price": price_series, "demand": demand_series}
+    # price (row-wise mean across price columns, then per-year mean) and demand in one groupby
+    yearly = yearly_price_demand(df_area, schema.price_cols, schema.demand_col)
+    return chart_from_yearly(yearly, last_n_years)
 
+@timed("parse")
 def parse_query_text(q: str) -> Dict[str, Any]:
     """
     Lightweight parser for sample queries.
@@ -264,54 +387,14 @@ def parse_query_text(q: str) -> Dict[str, Any]:
     - "Compare Ambegaon Budruk and Aundh demand trends"
     - "Compare Aundh with Wakad"
     - "Compare Aundh vs Wakad"
+    - "Compare Aundh, Wakad, Baner and Hinjewadi"
     - "Show price growth for Akurdi over the last 3 years"
     - "Analyze Wakad"
-    """
-    qlow = (q or "").lower()
-    # normalize whitespace a bit so regexes are easier
-    qlow = re.sub(r"\s+", " ", qlow).strip()
-
-    # 1) COMPARE intent
-    # allow: and / with / vs / versus
-    # allow extra trailing words like "demand trends", "price", "growth", etc.
-    cmp_match = re.search(
-        r"compare\s+([a-z0-9\s]+?)\s+"
-        r"(?:and|with|vs\.?|versus)\s+"
-        r"([a-z0-9\s]+?)"
-        r"(?:\s+(?:demand|price|growth|trend|trends).*)?$",
-        qlow,
-    )
-    if cmp_match:
-        a1 = cmp_match.group(1).strip()
-        a2 = cmp_match.group(2).strip()
-        return {"intent": "compare", "areas": [a1, a2]}
-
-    # 2) GROWTH intent: "price growth for X over the last N year(s)"
-    growth_match = re.search(
-        r"price growth for\s+([a-z0-9\s]+)\s+"
-        r"(?:over the last|in the last)\s+"
-        r"(\d+)\s+years?",
-        qlow,
-    )
-    if growth_match:
-        area = growth_match.group(1).strip()
-        n = int(growth_match.group(2))
-        return {"intent": "growth", "areas": [area], "last_n_years": n}
-
-    # 3) ANALYZE intent: "analyze X", "analysis of X"
-    analyze_match = re.search(r"analyz(?:e|is)\s+([a-z0-9\s]+)", qlow) or re.search(
-        r"analysis of\s+([a-z0-9\s]+)", qlow
-    )
-    if analyze_match:
-        area = analyze_match.group(1).strip()
-        return {"intent": "analyze", "areas": [area]}
-
-    # 4) Fallback: assume analyze + last word as area
-    words = re.findall(r"[a-z0-9]+", qlow)
-    if words:
-        return {"intent": "analyze", "areas": [" ".join(words[-1:])]}
 
-    return {"intent": "analyze", "areas": []}
+    Linear-time tokenizer + grammar with an input cap and a memo; see
+    ``analysis.parser``.
+    """
+    return parse_query(q)
 
 def build_mock_summary(df_area: pd.DataFrame, area: str) -> str:
     """
@@ -352,6 +435,110 @@ def build_mock_summary(df_area: pd.DataFrame, area: str) -> str:
         # mean across columns, then mean for that year
         year_price[int(year)] = float(stacked.mean(axis=1).mean())
 
+    # ---------------------------
+    # per-year demand aggregation
+    # ---------------------------
+    year_demand: Dict[int, float] = {}
+    if demand_col and demand_col in df_year.columns:
+        for year, grp in df_year.groupby("year"):
+            v = pd.to_numeric(grp[demand_col], errors="coerce")
+            if not v.dropna().empty:
+                year_demand[int(year)] = float(v.mean())
+    elif "total_units" in df_year.columns:
+        for year, grp in df_year.groupby("year"):
+            v = pd.to_numeric(grp["total_units"], errors="coerce")
+            if not v.dropna().empty:
+                year_demand[int(year)] = float(v.mean())
+
+    # ---------------------------
+    # basic metadata
+    # ---------------------------
+    try:
+        min_year = int(df_year["year"].min())
+        max_year = int(df_year["year"].max())
+    except Exception:
+        min_year = max_year = None
+
+    return _render_summary(area, year_price, year_demand, demand_col, min_year, max_year)
+
+@timed("summary")
+def summary_for_area(df: pd.DataFrame, area: str) -> str:
+    """
+    Build the rule-based summary for every row of ``df`` matching ``area``.
+
+    For cached datasets this is answered from the precomputed area x year
+    cube, so the cost does not depend on how many rows the area has.
+    """
+    cube = area_cube_for(df)
+    if cube is None:
+        return build_mock_summary(filter_by_area(df, [area]), area)
+
+    index = area_index_for(df)
+    ids = index.match(normalize_area_text(area))
+    return _summary_from_cube(area, cube, cube.yearly(ids), int(np.diff(index.offsets)[ids].sum()))
+
+def _summary_from_cube(area: str, cube: AreaYearCube, yearly: pd.DataFrame, n_rows: int) -> str:
+    """Summary text from an area's merged cube cells (``n_rows``: matched rows, with or without a year)."""
+    if not n_rows:
+        return f"No data found for '{area}'."
+    if yearly.empty:
+        return f"Data is available for '{area}', but year information is missing, so trends cannot be computed."
+
+    years = [int(y) for y in yearly.index]
+    year_price: Dict[int, float] = {}
+    if cube.price_cols:
+        year_price = dict(zip(years, yearly["price"].astype(float).tolist()))
+    year_demand = {
+        y: float(d)
+        for y, d, c in zip(years, yearly["demand"].tolist(), yearly["demand_count"].tolist())
+        if c > 0
+    }
+    return _render_summary(area, year_price, year_demand, cube.demand_col, min(years), max(years))
+
+@timed("compare")
+def compare_areas(df: pd.DataFrame, areas: List[str], last_n_years: int = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Chart, summary and matching row positions for every area of a compare.
+
+    Rows are matched against the area vocabulary once and labelled with the
+    area(s) they belong to; all yearly price/demand series then come out of
+    one grouped pass (cube cells for cached datasets, a (area, year) groupby
+    otherwise), so the cost barely grows with the number of areas.
+    Returns ``{area: {"chart": ..., "summary": ..., "rows": positions}}``.
+    """
+    df = ensure_year_col(df)
+    index = area_index_for(df)
+    if index is None:
+        if "_area_norm" not in df.columns:
+            df["_area_norm"] = df["area"].astype(str).apply(lambda s: re.sub(r"\s+", " ", s.strip().lower()))
+        index = AreaIndex(df["_area_norm"])
+    groups = [index.match(normalize_area_text(a)) for a in areas]
+    rows = [index.rows_for_ids(ids) for ids in groups]
+
+    cube = area_cube_for(df)
+    if cube is not None:
+        yearlies = cube.yearly_groups(groups)
+        summaries = [_summary_from_cube(a, cube, y, len(r)) for a, y, r in zip(areas, yearlies, rows)]
+    else:
+        schema = schema_for(df)
+        yearlies = yearly_price_demand_groups(df, rows, schema.price_cols, schema.demand_col)
+        summaries = [build_mock_summary(df.iloc[r].copy(), a) for a, r in zip(areas, rows)]
+
+    out = {}
+    for area, yearly, summary, r in zip(areas, yearlies, summaries, rows):
+        chart = chart_from_yearly(yearly, last_n_years) if not yearly.empty else {"labels": [], "price": [], "demand": []}
+        out[area] = {"chart": chart, "summary": summary, "rows": r}
+    return out
+
+def _render_summary(
+    area: str,
+    year_price: Dict[int, float],
+    year_demand: Dict[int, float],
+    demand_col: str,
+    min_year: int,
+    max_year: int,
+) -> str:
+    """Turn per-year price/demand aggregates into the summary text."""
     # overall price stats
     price_avg = None
     price_min = None
@@ -369,21 +556,6 @@ def build_mock_summary(df_area: pd.DataFrame, area: str) -> str:
         first_price = prices_sorted[0]
         last_price = prices_sorted[-1]
 
-    # ---------------------------
-    # per-year demand aggregation
-    # ---------------------------
-    year_demand: Dict[int, float] = {}
-    if demand_col and demand_col in df_year.columns:
-        for year, grp in df_year.groupby("year"):
-            v = pd.to_numeric(grp[demand_col], errors="coerce")
-            if not v.dropna().empty:
-                year_demand[int(year)] = float(v.mean())
-    elif "total_units" in df_year.columns:
-        for year, grp in df_year.groupby("year"):
-            v = pd.to_numeric(grp["total_units"], errors="coerce")
-            if not v.dropna().empty:
-                year_demand[int(year)] = float(v.mean())
-
     demand_avg = None
     demand_min = None
     demand_max = None
@@ -400,15 +572,6 @@ def build_mock_summary(df_area: pd.DataFrame, area: str) -> str:
         demand_min_year = years_d[int(np.nanargmin(vals_d))]
         demand_max_year = years_d[int(np.nanargmax(vals_d))]
 
-    # ---------------------------
-    # basic metadata
-    # ---------------------------
-    try:
-        min_year = int(df_year["year"].min())
-        max_year = int(df_year["year"].max())
-    except Exception:
-        min_year = max_year = None
-
     parts: List[str] = []
     parts.append(f"Summary for {area.title()}:")
 
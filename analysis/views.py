@@ -2,34 +2,491 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, parsers
+from rest_framework.renderers import JSONRenderer
 from django.conf import settings
+from concurrent.futures import ThreadPoolExecutor
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+import asyncio
+import json
 import os
 
-from .utils import (
-    load_dataset, parse_query_text, filter_by_area,
-    chart_data_for_area, build_mock_summary
-)
+from .admission import QUERY_FLIGHTS, get_admission_gate
+from .cache import body_etag, get_response_cache, response_cache_key
+from .executor import Saturated, get_query_executor
+from .jobs import get_ingest_queue, load_job_status
+from .metrics import collect_timings, render_metrics, server_timing_header, timed
+from .parser import MAX_QUERY_CHARS
+from .uploads import DEFAULT_MAX_UPLOAD_BYTES, ContentAddressedUploadHandler, store_upload
+
+# .utils / .tables (pandas, numpy, dateutil) are imported where they are used, so loading the
+# URLconf (every manage.py command runs the URL checks) stays cheap; see AnalysisConfig.ready().
+
+def _discard_failed_upload(job):
+    """Remove an upload whose ingestion failed so a corrected re-upload starts fresh."""
+    try:
+        os.remove(job.path)
+    except OSError:
+        pass
 
 class UploadDatasetView(APIView):
+    """
+    Store an uploaded dataset content-addressed (``<sha256><ext>`` in MEDIA_ROOT).
+
+    The file is hashed and size-checked while it streams in; re-uploading the
+    same bytes returns the existing ``uploaded_path`` / ``dataset_id``.
+    Parsing, normalization and index building run in the background; poll
+    ``status_url`` (``/api/analysis/jobs/<job_id>/``) for progress.
+    """
     parser_classes = [parsers.MultiPartParser, parsers.FormParser]
 
     def post(self, request, format=None):
+        # Save to upload dir defined in settings.MEDIA_ROOT
+        save_dir = getattr(settings, 'MEDIA_ROOT', None) or os.path.join(settings.BASE_DIR, 'uploaded_files')
+        max_bytes = getattr(settings, 'ANALYSIS_MAX_UPLOAD_BYTES', DEFAULT_MAX_UPLOAD_BYTES)
+        handler = ContentAddressedUploadHandler(request._request, save_dir=save_dir, max_bytes=max_bytes)
+        request._request.upload_handlers = [handler]
+
         f = request.FILES.get('file')
+        if handler.exceeded:
+            return Response(
+                {"error": f"Uploaded file exceeds the {max_bytes} byte limit."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
         if not f:
             return Response({"error": "No file uploaded under key 'file'."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Save to upload dir defined in settings.MEDIA_ROOT
+        full, digest, created = store_upload(f, save_dir)
+        # validate, normalize, snapshot and index in the background
+        job = get_ingest_queue().submit(full, digest, on_failure=_discard_failed_upload)
+
+        return Response(
+            {
+                "uploaded_path": full,
+                "dataset_id": digest,
+                "deduplicated": not created,
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": reverse('analysis-job', args=[job.id]),
+            },
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK,
+        )
+
+class AppendRowsView(APIView):
+    """
+    Append rows to a stored dataset: POST ``/api/analysis/datasets/<dataset_id>/append/``.
+
+    Send the delta as a csv/xlsx file under ``file`` (multipart) or as JSON
+    ``{"rows": [{"final location": "Wakad", "year": 2025, ...}, ...]}``, with the
+    dataset file's column headers. Rows are validated against the dataset's
+    normalized schema. The merged data gets a new ``dataset_id`` /
+    ``uploaded_path``; the old id keeps answering as before. Area lookups and
+    per-area/per-year aggregates are extended from the delta only.
+    """
+    parser_classes = [parsers.JSONParser, parsers.MultiPartParser, parsers.FormParser]
+
+    def post(self, request, dataset_id, format=None):
+        from .appends import AppendError, append_rows, find_dataset, store_delta_rows
+
         save_dir = getattr(settings, 'MEDIA_ROOT', None) or os.path.join(settings.BASE_DIR, 'uploaded_files')
-        os.makedirs(save_dir, exist_ok=True)
+        path = find_dataset(dataset_id, save_dir)
+        if path is None:
+            return Response({"error": "Unknown dataset id."}, status=status.HTTP_404_NOT_FOUND)
+
+        if (request.content_type or '').startswith('multipart/'):
+            max_bytes = getattr(settings, 'ANALYSIS_MAX_UPLOAD_BYTES', DEFAULT_MAX_UPLOAD_BYTES)
+            handler = ContentAddressedUploadHandler(request._request, save_dir=save_dir, max_bytes=max_bytes)
+            request._request.upload_handlers = [handler]
+            f = request.FILES.get('file')
+            if handler.exceeded:
+                return Response(
+                    {"error": f"Uploaded file exceeds the {max_bytes} byte limit."},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+            if not f:
+                return Response(*_error("No file uploaded under key 'file'."))
+            delta_path, _, created = store_upload(f, save_dir)
+        else:
+            rows = request.data.get('rows')
+            if not isinstance(rows, list) or not rows or not all(isinstance(r, dict) for r in rows):
+                return Response(*_error("Provide a non-empty 'rows' list of objects."))
+            delta_path, created = store_delta_rows(rows, save_dir)
+
+        try:
+            report = append_rows(path, delta_path, save_dir)
+        except AppendError as e:
+            if created:
+                os.remove(delta_path)
+            return Response(*_error(str(e)))
+        except Exception as e:
+            if created:
+                os.remove(delta_path)
+            return Response({"error": f"Failed to append rows: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(report, status=status.HTTP_201_CREATED)
+
+class IngestJobView(APIView):
+    """
+    GET the status, progress, per-stage timings and error of an ingestion job.
+    Jobs run by another worker process are answered from their status file.
+    """
+    def get(self, request, job_id, format=None):
+        job = get_ingest_queue().get(job_id)
+        state = job.as_dict() if job is not None else load_job_status(job_id)
+        if state is None:
+            return Response({"error": "Unknown job id."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(state)
+
+def _error(message, code=status.HTTP_400_BAD_REQUEST):
+    return {"error": message}, code
+
+def _dataset_path_from(body):
+    """Resolve the dataset path from a query payload; returns (path, error)."""
+    use_preloaded = bool(body.get('use_preloaded', True))
+    preloaded_path = body.get('preloaded_path')
+    uploaded_path = body.get('uploaded_path')
+
+    if uploaded_path:
+        return uploaded_path, None
+    if not use_preloaded:
+        return None, _error("No dataset provided and use_preloaded is false.")
+    return preloaded_path, None  # may be None and load_dataset will use SAMPLE_EXCEL_PATH
+
+def _table_options_from(body, params, columns=None):
+    """
+    Table options from the body's ``table`` object, falling back to the
+    ``columns`` / ``cursor`` / ``limit`` / ``table_format`` query parameters.
+    Returns (options, error). Without the dataset's ``columns`` the projected
+    columns are not checked (see ``_unknown_columns_error``).
+    """
+    data = body.get('table')
+    if data is None:
+        # 'format' is reserved by DRF for renderer selection, hence 'table_format'
+        data = {
+            'columns': params.get('columns'),
+            'cursor': params.get('cursor'),
+            'limit': params.get('limit'),
+            'format': params.get('table_format'),
+        }
+    if not isinstance(data, dict):
+        return None, _error("'table' must be an object.")
+    from .tables import TableOptions
+    try:
+        options = TableOptions.from_data(data, SINGLE_TABLE_ROWS)
+    except ValueError as e:
+        return None, _error(str(e))
+    if columns is not None:
+        error = _unknown_columns_error(options, columns)
+        if error is not None:
+            return None, error
+    return options, None
+
+def _unknown_columns_error(options, columns):
+    unknown = [c for c in options.columns or [] if c not in columns]
+    if unknown:
+        return _error(f"Unknown table columns: {', '.join(unknown)}")
+    return None
+
+def normalize_parsed(parsed):
+    """Canonical form of a parse_query_text result, used as the response cache key."""
+    from .utils import normalize_area_text
+    key = {
+        "intent": parsed.get('intent'),
+        "areas": [normalize_area_text(a) for a in parsed.get('areas', [])],
+        "last_n_years": parsed.get('last_n_years'),
+    }
+    if parsed.get('intent') == 'rank':
+        key.update((k, parsed.get(k)) for k in ('metric', 'order', 'limit', 'year'))
+    return key
+
+# rows returned in the table of a single-area / per-area compare response
+SINGLE_TABLE_ROWS = 1000
+COMPARE_TABLE_ROWS = 200
+
+class AreaResults:
+    """
+    Memoized per-area building blocks (chart, summary, table page) for one dataset.
+
+    Queries that mention the same area share the work; batch requests
+    prefetch every distinct unit across a thread pool before assembling.
+    """
+    def __init__(self, df, table_options=None):
+        from .tables import TableOptions
+        self.df = df
+        self.table_options = table_options or TableOptions()
+        self._charts = {}
+        self._summaries = {}
+        self._rows = {}
+        self._tables = {}
+        self._similar = {}
+
+    def chart(self, area, last_n=None):
+        key = (area, last_n)
+        if key not in self._charts:
+            from .utils import chart_data_for_area
+            self._charts[key] = chart_data_for_area(self.df, area, last_n_years=last_n)
+        return self._charts[key]
+
+    def summary(self, area):
+        if area not in self._summaries:
+            from .utils import summary_for_area
+            self._summaries[area] = summary_for_area(self.df, area)
+        return self._summaries[area]
+
+    def rows(self, area):
+        if area not in self._rows:
+            from .utils import area_rows
+            self._rows[area] = area_rows(self.df, [area])
+        return self._rows[area]
+
+    def table(self, area, default_limit=SINGLE_TABLE_ROWS):
+        """``(table, page_info)`` for one page of the area's matching rows."""
+        key = (area, default_limit)
+        if key not in self._tables:
+            from .tables import table_page
+            with timed("table"):
+                self._tables[key] = table_page(self.df, self.rows(area), self.table_options, default_limit)
+        return self._tables[key]
+
+    def table_pages(self, area, default_limit=SINGLE_TABLE_ROWS, page_rows=None):
+        """
+        The rows ``table`` returns for the area, as ``(table, page_info)``
+        pages of at most ``page_rows``; the last page's ``next_cursor`` is the
+        one ``table`` would return. Always yields at least one (maybe empty) page.
+        """
+        from .tables import TableOptions, table_page
+        rows = self.rows(area)
+        options = self.table_options
+        start = min(options.offset, len(rows))
+        stop = min(start + (options.limit or default_limit), len(rows))
+        page_rows = page_rows or default_limit
+        while True:
+            page = TableOptions(options.columns, start, max(min(page_rows, stop - start), 1), options.format)
+            with timed("table"):
+                out = table_page(self.df, rows, page, default_limit)
+            yield out
+            start += page.limit
+            if start >= stop:
+                return
+
+    def similar(self, area):
+        """Areas with the most similar price / demand trajectories (None when not available for this frame)."""
+        if area not in self._similar:
+            from .similarity import similar_areas
+            self._similar[area] = similar_areas(self.df, area)
+        return self._similar[area]
+
+    def compare(self, areas, last_n=None):
+        """Charts, summaries and rows of all compared areas from one grouped pass."""
+        missing = [a for a in areas if (a, last_n) not in self._charts or a not in self._summaries or a not in self._rows]
+        if missing:
+            from .utils import compare_areas
+            for a, res in compare_areas(self.df, list(dict.fromkeys(missing)), last_n_years=last_n).items():
+                self._charts.setdefault((a, last_n), res["chart"])
+                self._summaries.setdefault(a, res["summary"])
+                self._rows.setdefault(a, res["rows"])
+
+    def units(self, parsed):
+        """The (method, args) work units a parsed query needs."""
+        last_n = parsed.get('last_n_years')
+        areas = parsed.get('areas', [])
+        if parsed.get('intent') == 'compare' and len(areas) >= 2:
+            return [(self.compare, (tuple(areas), last_n))]
+        out = []
+        for a in areas:
+            out += [(self.chart, (a, last_n)), (self.summary, (a,)), (self.rows, (a,))]
+        if len(areas) == 1:
+            out.append((self.similar, (areas[0],)))
+        return out
+
+    def prefetch(self, parsed_queries, executor):
+        """Compute every distinct unit of ``parsed_queries`` once, in parallel."""
+        unique = {}
+        for parsed in parsed_queries:
+            for fn, args in self.units(parsed):
+                unique.setdefault((fn.__name__,) + args, (fn, args))
+        futures = [executor.submit(fn, *args) for fn, args in unique.values()]
+        for fut in futures:
+            try:
+                fut.result()
+            except Exception:
+                # surfaced again (per query) when the payload is assembled
+                pass
+
+def build_query_payload(df, parsed, results=None, resolutions=None):
+    """
+    Compute the response payload for a parsed query; returns (payload, http_status).
+
+    ``resolutions`` (from ``resolve_query_areas``) is echoed as ``resolution``
+    so clients can show which dataset areas a misspelled name was mapped to.
+    """
+    payload, code = _query_payload(df, parsed, results or AreaResults(df))
+    if resolutions is not None and code == status.HTTP_200_OK:
+        payload["resolution"] = resolutions
+    return payload, code
+
+def _query_payload(df, parsed, results):
+    intent = parsed.get('intent')
+    areas = parsed.get('areas', [])
+    last_n = parsed.get('last_n_years')
+
+    if intent == 'rank':
+        from .ranking import ranking_payload
+        return ranking_payload(df, parsed), status.HTTP_200_OK
+
+    if intent == 'compare' and len(areas) >= 2:
+        results.compare(areas, last_n)
+        out = {}
+        for a in areas:
+            table, page = results.table(a, COMPARE_TABLE_ROWS)
+            out[a] = {
+                "summary": results.summary(a),
+                "chart": results.chart(a, last_n),
+                "table": table,
+                "table_page": page
+            }
+        return {"type": "compare", "results": out}, status.HTTP_200_OK
+
+    area = areas[0] if areas else None
+    if not area:
+        return {"error": "Could not identify an area from the query."}, status.HTTP_400_BAD_REQUEST
+
+    table, page = results.table(area, SINGLE_TABLE_ROWS)
+    payload = {
+        "type": "single",
+        "area": area,
+        "summary": results.summary(area),
+        "chart": results.chart(area, last_n),
+        "table": table,
+        "table_page": page
+    }
+    similar = results.similar(area)
+    if similar is not None:
+        payload["similar_areas"] = similar
+    return payload, status.HTTP_200_OK
+
+def execute_query(body, params, parsed=None):
+    """
+    Run one chat query end to end: load, parse, cache lookup, compute, render.
+
+    Shared by the sync and async query views (and, with an already ``parsed``
+    intent instead of query text, by the ranking view). Returns
+    ``(http_status, rendered_json, etag, timings)``; ``etag`` is None for
+    errors and ``timings`` maps stage name to seconds (for Server-Timing).
+    Raises ``Saturated`` when a cold load or computation is not admitted.
+    """
+    with collect_timings() as timings:
+        with timed("total"):
+            code, rendered, etag = _execute_query(body, params, parsed)
+    return code, rendered, etag, dict(timings)
+
+def _open_dataset(dataset_path):
+    """
+    ``(streamed, dataset)`` for a query: large files that are not in memory
+    yet are scanned per query (``streamed`` is the ``StreamedDataset`` and
+    also the ``dataset``), everything else is the cached loaded dataset.
+    """
+    from .streaming import streamed_dataset
+    from .utils import SAMPLE_EXCEL_PATH, get_dataset
+    streamed = streamed_dataset(dataset_path or SAMPLE_EXCEL_PATH)
+    return streamed, streamed or get_dataset(dataset_path, admission=get_admission_gate().admit)
+
+def _dataset_columns(streamed, dataset):
+    return streamed.columns if streamed is not None else dataset.df.columns
+
+def _query_frame(streamed, dataset, parsed, table_options):
+    """``(df, parsed, resolutions)``: the frame to answer from and the query with its areas resolved."""
+    if streamed is not None:
+        return streamed.query_frame(parsed, table_options.columns)
+    from .utils import resolve_query_areas
+    parsed, resolutions = resolve_query_areas(dataset.df, parsed)
+    return dataset.df, parsed, resolutions
+
+def _execute_query(body, params, parsed=None):
+    from .utils import parse_query_text
+    query = body.get('query') or body.get('q') or ''
+    if parsed is None and not query:
+        return _rendered(_error("No query provided."))
+    if len(query) > MAX_QUERY_CHARS:
+        return _rendered(_error(f"Query is too long (at most {MAX_QUERY_CHARS} characters)."))
+
+    dataset_path, error = _dataset_path_from(body)
+    if error is not None:
+        return _rendered(error)
+
+    try:
+        streamed, dataset = _open_dataset(dataset_path)
+    except Saturated:
+        raise
+    except Exception as e:
+        return _rendered(_error(f"Failed to load dataset: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR))
+
+    table_options, error = _table_options_from(body, params, _dataset_columns(streamed, dataset))
+    if error is not None:
+        return _rendered(error)
+
+    if parsed is None:
+        parsed = parse_query_text(query)
+    cache = get_response_cache()
+    key = response_cache_key(dataset.digest, normalize_parsed(parsed), table=table_options.cache_key())
+    if cache is not None:
+        with timed("cache"):
+            hit = cache.get(key)
+        if hit is not None:
+            etag, rendered = hit
+            return status.HTTP_200_OK, rendered, etag
+
+    def compute():
+        with get_admission_gate().admit():
+            df, resolved, resolutions = _query_frame(streamed, dataset, parsed, table_options)
+            payload, code = build_query_payload(df, resolved, AreaResults(df, table_options), resolutions)
+            if code != status.HTTP_200_OK:
+                return _rendered((payload, code))
+            with timed("render"):
+                rendered = JSONRenderer().render(payload)
+        etag = body_etag(rendered)
+        if cache is not None:
+            cache.set(key, (etag, rendered))
+        return code, rendered, etag
 
-        import uuid
-        fn = f"{uuid.uuid4().hex}_{f.name}"
-        full = os.path.join(save_dir, fn)
-        with open(full, 'wb') as dest:
-            for chunk in f.chunks():
-                dest.write(chunk)
+    # identical uncached queries in flight at the same time are computed once
+    result, _ = QUERY_FLIGHTS.do(key, compute)
+    return result
 
-        return Response({"uploaded_path": full}, status=status.HTTP_201_CREATED)
+def _rendered(result):
+    payload, code = result
+    return code, JSONRenderer().render(payload), None
+
+def query_response(if_none_match, code, body, etag, timings=None):
+    """
+    HttpResponse for an ``execute_query`` result: 304 (no body) when the
+    client's If-None-Match matches the ETag, otherwise the rendered JSON.
+    Stage timings go out in a ``Server-Timing`` header.
+    """
+    if etag is not None and if_none_match:
+        tags = parse_etags(if_none_match)
+        if '*' in tags or any(t.removeprefix('W/') == etag for t in tags):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return _with_server_timing(response, timings)
+    response = HttpResponse(body, status=code, content_type='application/json')
+    if etag is not None:
+        response['ETag'] = etag
+    return _with_server_timing(response, timings)
+
+def _busy_response(saturated):
+    """503 for a request refused by admission control (or a full async pool)."""
+    response = JsonResponse({"error": "Server is busy, retry shortly."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = str(saturated.retry_after)
+    return response
+
+def _with_server_timing(response, timings):
+    if timings:
+        response['Server-Timing'] = server_timing_header(timings)
+    return response
 
 class QueryAnalysisView(APIView):
     """
@@ -38,63 +495,328 @@ class QueryAnalysisView(APIView):
       "query": "Analyze Wakad",
       "use_preloaded": true,
       "preloaded_path": null,
-      "uploaded_path": null
+      "uploaded_path": null,
+      "table": {"columns": ["year", "area"], "cursor": null, "limit": 100, "format": "records"}
+    }
+
+    ``table`` is optional: ``columns`` projects the table, ``cursor`` is the
+    ``table_page.next_cursor`` of a previous response, and ``format`` is
+    ``records`` (default) or ``columnar`` (names once, one array per column).
+
+    Misspelled areas ("Wakkad") are mapped to the closest dataset area; the
+    ``resolution`` list reports the mapping and its confidence per area.
+
+    Results are cached per (dataset fingerprint, parsed intent) and carry a
+    strong ETag; send it back in If-None-Match to get a 304 without a body.
+    Per-stage durations (load, parse, resolve, chart, summary, table, render,
+    total) are reported in the ``Server-Timing`` header.
+
+    Concurrent requests for a dataset that is still loading, or for the same
+    uncached answer, wait for the one load / computation in flight. When too
+    many analyses are running and queued the answer is 503 with Retry-After.
+    """
+    def post(self, request, format=None):
+        try:
+            code, body, etag, timings = execute_query(request.data, request.query_params)
+        except Saturated as e:
+            return _busy_response(e)
+        return query_response(request.META.get('HTTP_IF_NONE_MATCH'), code, body, etag, timings)
+
+class RankAreasView(APIView):
+    """
+    Rank every area of a dataset by one metric (the chat intent behind
+    "top 10 areas by demand in 2023" / "which areas had the highest price growth").
+
+    POST payload:
+    {
+      "metric": "cagr",        // "cagr" (price growth), "yoy" or "demand"
+      "order": "desc",         // or "asc"
+      "limit": 10,
+      "last_n_years": 5,       // optional period
+      "year": 2023,            // optional last year of the period
+      "use_preloaded": true, "preloaded_path": null, "uploaded_path": null
     }
+
+    Same response caching, ETag, Server-Timing and admission behaviour as the query view.
     """
     def post(self, request, format=None):
-        body = request.data
+        from .ranking import ranking_params
+        try:
+            parsed = ranking_params(request.data)
+        except ValueError as e:
+            return Response(*_error(str(e)))
+        try:
+            code, body, etag, timings = execute_query(request.data, request.query_params, parsed=parsed)
+        except Saturated as e:
+            return _busy_response(e)
+        return query_response(request.META.get('HTTP_IF_NONE_MATCH'), code, body, etag, timings)
+
+def _json_body(request):
+    """The request's JSON object body; returns (body, error_response)."""
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        return None, JsonResponse({"error": "Request body must be JSON."}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(body, dict):
+        return None, JsonResponse({"error": "Request body must be a JSON object."}, status=status.HTTP_400_BAD_REQUEST)
+    return body, None
+
+def _json_error(result):
+    payload, code = result
+    return JsonResponse(payload, status=code)
+
+# rows per ``table`` event of a streamed response (ANALYSIS_STREAM_TABLE_ROWS overrides)
+STREAM_TABLE_ROWS = 200
+
+def _sse_event(name, data):
+    return b"event: " + name.encode() + b"\ndata: " + JSONRenderer().render(data) + b"\n\n"
+
+def _ndjson_event(name, data):
+    return JSONRenderer().render({"event": name, **data}) + b"\n"
+
+def query_events(query, dataset_path, table_options):
+    """
+    A chat query as a sequence of ``(event, data)`` pairs: ``intent`` (the
+    parsed query, sent before the dataset is even loaded), ``resolution`` (areas as matched in the dataset), then
+    ``ranking`` or, per area, ``summary``, ``chart``, ``similar_areas`` and
+    ``table`` pages, and finally ``done`` with the stage timings in ms.
+    Failures after the first event end the stream with an ``error`` event
+    (``status`` 503 with ``retry_after`` when the analysis is not admitted).
+    """
+    with collect_timings() as timings:
+        with timed("total"):
+            yield from _query_events(query, dataset_path, table_options)
+    yield "done", {"timings": {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}}
+
+def _query_events(query, dataset_path, table_options):
+    from .utils import parse_query_text
+    parsed = parse_query_text(query)
+    yield "intent", parsed
+
+    try:
+        streamed, dataset = _open_dataset(dataset_path)
+    except Saturated as e:
+        yield "error", _busy_event(e)
+        return
+    except Exception as e:
+        yield "error", {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "error": f"Failed to load dataset: {str(e)}"}
+        return
+    error = _unknown_columns_error(table_options, _dataset_columns(streamed, dataset))
+    if error is not None:
+        payload, code = error
+        yield "error", {"status": code, **payload}
+        return
+
+    # everything is computed while holding the slot and sent after releasing
+    # it, so a slow client never keeps a heavy-analysis slot busy
+    try:
+        with get_admission_gate().admit():
+            df, parsed, resolutions = _query_frame(streamed, dataset, parsed, table_options)
+            events = list(_result_events(df, parsed, AreaResults(df, table_options)))
+    except Saturated as e:
+        yield "error", _busy_event(e)
+        return
+    except Exception as e:
+        yield "error", {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "error": f"Failed to analyze query: {str(e)}"}
+        return
+    yield "resolution", {"areas": parsed.get('areas', []), "resolution": resolutions}
+    yield from events
+
+def _busy_event(saturated):
+    return {"status": status.HTTP_503_SERVICE_UNAVAILABLE, "error": "Server is busy, retry shortly.",
+            "retry_after": saturated.retry_after}
+
+def _result_events(df, parsed, results):
+    """The parts of ``_query_payload``'s response, one event each, cheapest first."""
+    areas = parsed.get('areas', [])
+    last_n = parsed.get('last_n_years')
+    if parsed.get('intent') == 'rank':
+        from .ranking import ranking_payload
+        yield "ranking", ranking_payload(df, parsed)
+        return
+
+    if parsed.get('intent') == 'compare' and len(areas) >= 2:
+        results.compare(areas, last_n)
+        default_limit = COMPARE_TABLE_ROWS
+    elif areas:
+        areas = areas[:1]
+        default_limit = SINGLE_TABLE_ROWS
+    else:
+        yield "error", {"status": status.HTTP_400_BAD_REQUEST, "error": "Could not identify an area from the query."}
+        return
+
+    for a in areas:
+        yield "summary", {"area": a, "summary": results.summary(a)}
+    for a in areas:
+        yield "chart", {"area": a, "chart": results.chart(a, last_n)}
+    if len(areas) == 1:
+        similar = results.similar(areas[0])
+        if similar is not None:
+            yield "similar_areas", {"area": areas[0], "similar_areas": similar}
+    page_rows = getattr(settings, 'ANALYSIS_STREAM_TABLE_ROWS', STREAM_TABLE_ROWS)
+    for a in areas:
+        for table, page in results.table_pages(a, default_limit, page_rows):
+            yield "table", {"area": a, "table": table, "table_page": page}
+
+class StreamQueryAnalysisView(View):
+    """
+    Streaming variant of ``QueryAnalysisView`` (same payload): the answer is
+    sent part by part while it is computed, see ``query_events``.
+
+    The response is newline-delimited JSON (``{"event": "summary", "area":
+    ..., "summary": ...}`` per line), or Server-Sent Events (``event:`` /
+    ``data:`` frames) when the request accepts ``text/event-stream``.
+    Requests that are invalid before any work starts get a plain JSON 400.
+    Streamed answers bypass the response cache and carry no ETag; the stage
+    timings come in the final ``done`` event instead of Server-Timing.
+    """
+    http_method_names = ['post', 'options']
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    def post(self, request):
+        body, error = _json_body(request)
+        if error is not None:
+            return error
         query = body.get('query') or body.get('q') or ''
         if not query:
-            return Response({"error": "No query provided."}, status=status.HTTP_400_BAD_REQUEST)
+            return _json_error(_error("No query provided."))
+        if len(query) > MAX_QUERY_CHARS:
+            return _json_error(_error(f"Query is too long (at most {MAX_QUERY_CHARS} characters)."))
+        dataset_path, error = _dataset_path_from(body)
+        if error is None:
+            table_options, error = _table_options_from(body, request.GET)
+        if error is not None:
+            return _json_error(error)
 
-        use_preloaded = bool(body.get('use_preloaded', True))
-        preloaded_path = body.get('preloaded_path')
-        uploaded_path = body.get('uploaded_path')
-
-        dataset_path = None
-        if uploaded_path:
-            dataset_path = uploaded_path
-        elif not use_preloaded:
-            return Response({"error": "No dataset provided and use_preloaded is false."}, status=status.HTTP_400_BAD_REQUEST)
+        if 'text/event-stream' in request.META.get('HTTP_ACCEPT', ''):
+            encode, content_type = _sse_event, 'text/event-stream'
         else:
-            dataset_path = preloaded_path  # may be None and load_dataset will use SAMPLE_EXCEL_PATH
+            encode, content_type = _ndjson_event, 'application/x-ndjson'
+        events = (encode(name, data) for name, data in query_events(query, dataset_path, table_options))
+        response = StreamingHttpResponse(events, content_type=content_type)
+        response['Cache-Control'] = 'no-cache'
+        # ask nginx-style proxies not to buffer the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+class AsyncQueryAnalysisView(View):
+    """
+    Async variant of ``QueryAnalysisView`` for ASGI deployments (same payload).
+
+    The event loop only parses the request and writes the response; dataset
+    loading and the pandas work run in a bounded thread pool. When the pool
+    and its queue are full the request is refused at once with 503 +
+    Retry-After, and a computation exceeding ANALYSIS_QUERY_TIMEOUT answers 504.
+    """
+    http_method_names = ['post', 'options']
 
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    async def post(self, request):
+        body, error = _json_body(request)
+        if error is not None:
+            return error
+
+        timeout = getattr(settings, 'ANALYSIS_QUERY_TIMEOUT', 30)
         try:
-            df = load_dataset(dataset_path)
+            code, rendered, etag, timings = await get_query_executor().run(execute_query, body, request.GET, timeout=timeout)
+        except Saturated as e:
+            return _busy_response(e)
+        except asyncio.TimeoutError:
+            return JsonResponse({"error": f"Query did not finish within {timeout}s."}, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        return query_response(request.META.get('HTTP_IF_NONE_MATCH'), code, rendered, etag, timings)
+
+def _batch_query_error(query):
+    """Why a batch item is rejected without being parsed, or None."""
+    if not isinstance(query, str) or not query.strip():
+        return "No query provided."
+    if len(query) > MAX_QUERY_CHARS:
+        return f"Query is too long (at most {MAX_QUERY_CHARS} characters)."
+    return None
+
+class BatchQueryView(APIView):
+    """
+    Run many chat queries against one dataset in a single request.
+
+    POST payload:
+    {
+      "queries": ["Analyze Wakad", "Compare Aundh and Wakad", ...],
+      "use_preloaded": true,
+      "preloaded_path": null,
+      "uploaded_path": null
+    }
+
+    The dataset is loaded once, every distinct area is computed once across a
+    thread pool, and results come back in request order with per-query errors.
+    """
+    def post(self, request, format=None):
+        with collect_timings() as timings:
+            with timed("total"):
+                response = self._run(request.data)
+        return _with_server_timing(response, timings)
+
+    def _run(self, body):
+        queries = body.get('queries')
+        if not isinstance(queries, list) or not queries:
+            return Response(*_error("Provide a non-empty 'queries' list."))
+        max_queries = getattr(settings, 'ANALYSIS_BATCH_MAX_QUERIES', 100)
+        if len(queries) > max_queries:
+            return Response(*_error(f"At most {max_queries} queries per batch."))
+
+        dataset_path, error = _dataset_path_from(body)
+        if error is not None:
+            return Response(*error)
+        try:
+            # one admission slot covers the load and the whole fan-out
+            with get_admission_gate().admit():
+                return self._answer(queries, dataset_path)
+        except Saturated as e:
+            return _busy_response(e)
+
+    def _answer(self, queries, dataset_path):
+        from .utils import get_dataset, parse_query_text, resolve_query_areas
+        try:
+            df = get_dataset(dataset_path).df
+        except Saturated:
+            raise
         except Exception as e:
             return Response({"error": f"Failed to load dataset: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        parsed = parse_query_text(query)
-        intent = parsed.get('intent')
-        areas = parsed.get('areas', [])
-        last_n = parsed.get('last_n_years')
+        # empty and over-long queries are rejected before any parsing or prefetching
+        rejected = [_batch_query_error(q) for q in queries]
+        parsed_queries = [
+            (None, None) if error else resolve_query_areas(df, parse_query_text(q))
+            for q, error in zip(queries, rejected)
+        ]
+        results = AreaResults(df)
+        # pool threads do not see this request's timings; the whole fan-out counts as "compute"
+        with timed("compute"), ThreadPoolExecutor(max_workers=getattr(settings, 'ANALYSIS_BATCH_WORKERS', 4)) as executor:
+            results.prefetch([p for p, _ in parsed_queries if p], executor)
+
+        out = []
+        for query, error, (parsed, resolutions) in zip(queries, rejected, parsed_queries):
+            if error:
+                out.append({"query": query, "status": status.HTTP_400_BAD_REQUEST, "error": error})
+                continue
+            try:
+                payload, code = build_query_payload(df, parsed, results, resolutions)
+            except Exception as e:
+                payload, code = {"error": f"Failed to analyze query: {str(e)}"}, status.HTTP_500_INTERNAL_SERVER_ERROR
+            out.append({"query": query, "status": code, **payload})
+        return Response({"results": out})
+
+class MetricsView(View):
+    """
+    Prometheus text exposition of the in-process metrics: per-stage latency
+    histograms plus dataset, response and parser cache counters. Each worker
+    process reports its own numbers.
+    """
+    http_method_names = ['get']
 
-        if intent == 'compare' and len(areas) >= 2:
-            results = {}
-            for a in areas:
-                chart = chart_data_for_area(df, a, last_n_years=last_n)
-                filtered = filter_by_area(df, [a]).head(200)
-                summary = build_mock_summary(filtered, a)
-                results[a] = {
-                    "summary": summary,
-                    "chart": chart,
-                    "table": filtered.fillna('').to_dict(orient='records')
-                }
-            return Response({"type": "compare", "results": results})
-
-        area = areas[0] if areas else None
-        if not area:
-            return Response({"error": "Could not identify an area from the query."}, status=status.HTTP_400_BAD_REQUEST)
-
-        filtered_df = filter_by_area(df, [area]).head(1000)
-        chart = chart_data_for_area(df, area, last_n_years=last_n)
-        summary = build_mock_summary(filtered_df, area)
-        table_json = filtered_df.fillna('').to_dict(orient='records')
-
-        return Response({
-            "type": "single",
-            "area": area,
-            "summary": summary,
-            "chart": chart,
-            "table": table_json
-        })
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,105 @@
+# analysis/warmup.py
+"""
+Process warm-up: load and index the datasets under ``DATASETS_DIR`` and run a
+few representative queries through the normal query path, so the first real
+request after a deploy or worker restart does not pay for imports, parsing
+and index building.
+
+Opt in with ``ANALYSIS_WARMUP`` (see ``AnalysisConfig.ready``).
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DATASET_EXTENSIONS = (".xlsx", ".xls", ".csv")
+# commands that serve requests; every other manage.py command skips the warm-up
+SERVER_COMMANDS = ("runserver",)
+
+
+def dataset_paths(datasets_dir: Optional[str] = None) -> List[str]:
+    """Dataset files directly inside ``datasets_dir`` (default ``settings.DATASETS_DIR``), sorted."""
+    if datasets_dir is None:
+        from django.conf import settings
+        datasets_dir = getattr(settings, 'DATASETS_DIR', None)
+    if not datasets_dir or not os.path.isdir(datasets_dir):
+        return []
+    return sorted(
+        os.path.join(datasets_dir, name)
+        for name in os.listdir(datasets_dir)
+        if name.lower().endswith(DATASET_EXTENSIONS) and not name.startswith(("~$", "."))
+    )
+
+
+def representative_queries(df, n_areas: int = 3) -> List[str]:
+    """Analyze / growth / compare queries over the first areas of a dataset."""
+    areas = [str(a) for a in df["area"].dropna().unique()[:n_areas]]
+    if not areas:
+        return []
+    queries = [f"Analyze {areas[0]}", f"Show price growth for {areas[0]} over the last 3 years"]
+    if len(areas) >= 2:
+        queries.append("Compare " + ", ".join(areas[:-1]) + f" and {areas[-1]}")
+    return queries
+
+
+def warm_up(paths: Optional[List[str]] = None, queries: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Load, index and query every dataset in ``paths`` (default: ``dataset_paths()``).
+
+    ``queries`` replaces the generated ``representative_queries``. Failures
+    are logged and reported, never raised. Returns one report per dataset.
+    """
+    from .views import execute_query
+
+    reports = []
+    for path in dataset_paths() if paths is None else paths:
+        report: Dict[str, Any] = {"path": path}
+        t0 = time.perf_counter()
+        try:
+            from .utils import get_dataset
+            df = get_dataset(path).df
+            report["load_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+            report["queries"] = {}
+            for q in queries if queries is not None else representative_queries(df):
+                code, _, _, timings = execute_query({"query": q, "preloaded_path": path}, {})
+                report["queries"][q] = {"status": code, "ms": round(timings.get("total", 0.0) * 1000, 3)}
+        except Exception as e:
+            logger.warning("warm-up of %s failed: %s", path, e)
+            report["error"] = str(e)
+        report["total_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        logger.info("warmed up %s in %.1f ms", path, report["total_ms"])
+        reports.append(report)
+    return reports
+
+
+def should_warm_up(argv: Optional[List[str]] = None, environ: Optional[Dict[str, str]] = None) -> bool:
+    """
+    False for management commands other than ``runserver`` (migrate, test, shell, ...)
+    and for the autoreloader's parent process; True for WSGI/ASGI servers.
+    """
+    argv = sys.argv if argv is None else argv
+    environ = os.environ if environ is None else environ
+    program = os.path.basename(argv[0]) if argv else ""
+    if program not in ("manage.py", "django-admin", "django-admin.py") and not (
+        program == "__main__.py" and "django" in argv[0]
+    ):
+        return True
+    command = argv[1] if len(argv) > 1 else ""
+    if command not in SERVER_COMMANDS:
+        return False
+    # with the autoreloader only the child process (RUN_MAIN=true) serves requests
+    return "--noreload" in argv or environ.get("RUN_MAIN") == "true"
+
+
+def start_warm_up(mode) -> Optional[threading.Thread]:
+    """Run ``warm_up()`` now (``True``) or in a daemon thread (``"background"``)."""
+    if mode == "background":
+        thread = threading.Thread(target=warm_up, name="analysis-warmup", daemon=True)
+        thread.start()
+        return thread
+    warm_up()
+    return None
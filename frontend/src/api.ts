@@ -1,4 +1,5 @@
 import axios from "axios";
+import type { QueryEvent } from "./types";
 
 const BASE = import.meta.env.VITE_API_BASE_URL || "http://127.0.0.1:8000";
 
@@ -21,3 +22,28 @@ export async function uploadFile(file: File) {
   });
   return res.data;
 }
+
+// POST a chat query to the streaming endpoint and call onEvent for each
+// NDJSON event as it arrives (fetch, not axios: axios buffers the whole body).
+export async function streamQuery(payload: any, onEvent: (e: QueryEvent) => void) {
+  const res = await fetch(`${BASE}/api/analysis/query/stream/`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(payload),
+  });
+  if (!res.ok || !res.body) throw new Error(`Query failed with status ${res.status}`);
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffered += decoder.decode(value, { stream: !done });
+    const lines = buffered.split("\n");
+    buffered = lines.pop() ?? "";
+    for (const line of lines) {
+      if (line.trim()) onEvent(JSON.parse(line));
+    }
+    if (done) break;
+  }
+}
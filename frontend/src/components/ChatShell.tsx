@@ -2,8 +2,8 @@
 import { useEffect, useRef, useState } from "react";
 import MessageList from "./MessageList";
 import ChatInput from "./ChatInput";
-import { postQuery } from "../api";
-import type { SingleResponse, CompareResponse } from "../types";
+import { streamQuery } from "../api";
+import type { SingleResponse, CompareResponse, QueryEvent } from "../types";
 
 type ChatMessage = {
   role: "user" | "bot";
@@ -39,21 +39,66 @@ export default function ChatShell() {
 
     try {
       const payload = { query: text, use_preloaded: true };
-      const res = await postQuery(payload);
+      let intent = "";
+      let single: SingleResponse | null = null;
+      let compare: CompareResponse | null = null;
 
-      // remove placeholder & add real response
-      setMessages((prev) => {
-        const copy = prev.slice(0, -1); // drop last placeholder
-
-        if (res.type === "compare") {
-          const compareRes = res as CompareResponse;
-          copy.push({ role: "bot", compare: compareRes });
+      // replace the placeholder (or the partial answer so far), keeping the chart toggle
+      const show = (msg: ChatMessage) =>
+        setMessages((prev) => {
+          const copy = prev.slice(0, -1);
+          copy.push({ ...msg, showChart: prev[prev.length - 1]?.showChart ?? false });
+          return copy;
+        });
+      const emptyPart = (area: string): SingleResponse => ({
+        type: "single",
+        area,
+        summary: "",
+        chart: { labels: [], price: [], demand: [] },
+        table: [],
+      });
+      // apply a streamed part of one area's answer and re-render
+      const update = (area: string, change: (part: SingleResponse) => Partial<SingleResponse>) => {
+        if (compare) {
+          const part = compare.results[area] ?? emptyPart(area);
+          compare = { ...compare, results: { ...compare.results, [area]: { ...part, ...change(part) } } };
+          show({ role: "bot", compare });
         } else {
-          const singleRes = res as SingleResponse;
-          copy.push({ role: "bot", single: singleRes, showChart: false });
+          const part = single ?? emptyPart(area);
+          single = { ...part, ...change(part) };
+          show({ role: "bot", single });
         }
+      };
 
-        return copy;
+      await streamQuery(payload, (e: QueryEvent) => {
+        switch (e.event) {
+          case "intent":
+            intent = e.intent;
+            break;
+          case "resolution":
+            if (intent === "compare" && e.areas.length >= 2) {
+              compare = { type: "compare", results: {}, resolution: e.resolution ?? undefined };
+            }
+            break;
+          case "ranking":
+            show({ role: "bot", text: e.summary });
+            break;
+          case "summary":
+            update(e.area, () => ({ summary: e.summary }));
+            break;
+          case "chart":
+            update(e.area, () => ({ chart: e.chart }));
+            break;
+          case "similar_areas":
+            update(e.area, () => ({ similar_areas: e.similar_areas }));
+            break;
+          case "table":
+            update(e.area, (part) => ({ table: [...part.table, ...e.table], table_page: e.table_page }));
+            break;
+          case "error":
+            show({ role: "bot", text: e.error });
+            break;
+        }
       });
     } catch (err) {
       console.error(err);
@@ -6,15 +6,74 @@ export type ChartSeries = {
 
 export type TableRow = { [k: string]: any };
 
+export type TablePage = {
+  total_rows: number;
+  offset: number;
+  limit: number;
+  next_cursor: string | null;
+};
+
+export type AreaResolution = {
+  query: string;
+  area: string;
+  matches: string[];
+  match_count: number;
+  confidence: number;
+  method: "exact" | "fuzzy" | "none";
+};
+
 export type SingleResponse = {
   type: "single";
   area: string;
   summary: string;
   chart: ChartSeries;
   table: TableRow[];
+  table_page?: TablePage;
+  resolution?: AreaResolution[];
+  similar_areas?: SimilarArea[];
+};
+
+export type SimilarArea = {
+  area: string;
+  score: number;
 };
 
 export type CompareResponse = {
   type: "compare";
   results: Record<string, SingleResponse>;
+  resolution?: AreaResolution[];
 };
+
+export type RankedArea = {
+  rank: number;
+  area: string;
+  value: number;
+  from_year?: number;
+  to_year?: number;
+  from_price?: number;
+  to_price?: number;
+  rows?: number;
+};
+
+export type RankingResponse = {
+  type: "ranking";
+  metric: "cagr" | "yoy" | "demand";
+  order: "desc" | "asc";
+  limit: number;
+  years: [number, number] | null;
+  ranked_areas: number;
+  results: RankedArea[];
+  summary: string;
+};
+
+// one line of /api/analysis/query/stream/
+export type QueryEvent =
+  | { event: "intent"; intent: string; areas: string[]; last_n_years?: number }
+  | { event: "resolution"; areas: string[]; resolution: AreaResolution[] | null }
+  | { event: "summary"; area: string; summary: string }
+  | { event: "chart"; area: string; chart: ChartSeries }
+  | { event: "similar_areas"; area: string; similar_areas: SimilarArea[] }
+  | { event: "table"; area: string; table: TableRow[]; table_page: TablePage }
+  | ({ event: "ranking" } & RankingResponse)
+  | { event: "error"; status: number; error: string }
+  | { event: "done"; timings: Record<string, number> };
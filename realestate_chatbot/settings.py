@@ -97,9 +97,63 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'uploaded_files')  # this is where uploads are saved
 
+# Batch query endpoint: max queries per request and threads used to compute them
+ANALYSIS_BATCH_MAX_QUERIES = 100
+ANALYSIS_BATCH_WORKERS = 4
+
+# Largest dataset upload accepted; enforced while the upload streams in
+ANALYSIS_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# Background workers that parse/normalize/index uploaded datasets (per process; job status is
+# also written under <ANALYSIS_SNAPSHOT_DIR>/jobs/ so any worker can answer /api/analysis/jobs/<id>/)
+ANALYSIS_INGEST_WORKERS = 2
+
+# Async query endpoint (ASGI): computation threads, extra queued requests before
+# answering 503, and seconds before a query answers 504
+ANALYSIS_ASYNC_WORKERS = 4
+ANALYSIS_ASYNC_MAX_PENDING = 32
+ANALYSIS_QUERY_TIMEOUT = 30
+
+# Admission control for heavy analyses (cold dataset loads, scans, uncached queries):
+# how many run at once, how many more may queue, and seconds a queued one waits before 503
+ANALYSIS_MAX_ACTIVE_ANALYSES = 4
+ANALYSIS_MAX_QUEUED_ANALYSES = 16
+ANALYSIS_ADMISSION_TIMEOUT = 10
+
 # Preloaded dataset folder (optional reference)
 DATASETS_DIR = os.path.join(BASE_DIR, 'datasets')
 
+# Load, index and query the DATASETS_DIR files when a server process starts:
+# False (off), True (before serving) or "background" (in a daemon thread)
+ANALYSIS_WARMUP = False
+
+# In-process cache of parsed datasets (preloaded + uploaded), LRU-evicted by size
+ANALYSIS_DATASET_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Memory-mapped column snapshots shared by all worker processes (default <MEDIA_ROOT>/snapshots);
+# a tmpfs such as /dev/shm keeps the shared copy in RAM
+# ANALYSIS_SNAPSHOT_DIR = '/dev/shm/realestate-snapshots'
+
+# Files at least this large (bytes) that are not cached or snapshotted yet are answered by
+# scanning them in chunks, keeping only the rows and columns each query needs (None: off)
+ANALYSIS_STREAMING_MIN_BYTES = None
+
+# Minimum similarity (0-1) for mapping a misspelled area onto a dataset area
+ANALYSIS_AREA_MIN_CONFIDENCE = 0.6
+
+# Areas with the most similar price / demand trajectories listed in single-area responses (0: off)
+ANALYSIS_SIMILAR_AREAS = 5
+
+# Table rows per 'table' event of /api/analysis/query/stream/
+ANALYSIS_STREAM_TABLE_ROWS = 200
+
+# Cache of rendered query responses keyed on (dataset fingerprint, parsed intent).
+# BACKEND: "locmem" (per-process LRU), "django" (uses CACHES[ALIAS]) or a dotted class path.
+ANALYSIS_RESPONSE_CACHE = {
+    "BACKEND": "locmem",
+    "MAX_ENTRIES": 1024,
+}
+
 # CORS settings for local development
 CORS_ALLOW_ALL_ORIGINS = True
 
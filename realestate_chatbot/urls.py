@@ -1,9 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from analysis.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
     # Analysis API endpoints (upload, query)
     path('api/analysis/', include('analysis.urls')),
+
+    # Prometheus scrape target (default metrics path)
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]